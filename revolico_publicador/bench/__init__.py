@@ -0,0 +1 @@
+# Benchmark offline (servidores locales y Excel sintético)
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import argparse
+import random
+from pathlib import Path
+
+import pandas as pd
+
+from bench.servidores import CATEGORIAS, MONEDAS
+from utils.csv_parser import REQUIRED_COLUMNS, guardar
+from utils.localidades import MUNICIPIOS_POR_PROVINCIA
+
+
+def generar(
+    filas: int, path: str | Path, *, fotos_distintas: int = 500, fotos_por_anuncio: int = 1, semilla: int = 1
+) -> Path:
+    """Genera un ``anuncios.xlsx`` sintético y válido de ``filas`` filas.
+
+    Las fotos son URLs de Drive con ``fotos_distintas`` FILE_ID distintos, de modo
+    que parte de las descargas son aciertos de caché como en una hoja real. Cada
+    anuncio lleva ``fotos_por_anuncio`` URLs separadas por saltos de línea.
+    """
+    rnd = random.Random(semilla)
+    provincias = list(MUNICIPIOS_POR_PROVINCIA)
+    registros = []
+    for i in range(filas):
+        categoria = rnd.choice(list(CATEGORIAS))
+        provincia = rnd.choice(provincias)
+        registros.append(
+            {
+                "Categoria": categoria,
+                "Subcategoria": rnd.choice(CATEGORIAS[categoria]),
+                "Fotos": "\n".join(
+                    f"https://drive.google.com/uc?id=BENCH{rnd.randrange(max(1, fotos_distintas)):06d}"
+                    for _ in range(max(1, fotos_por_anuncio))
+                ),
+                "Precio": rnd.randrange(1, 2000) * 10,
+                "Moneda": rnd.choice(MONEDAS),
+                "Titulo": f"Anuncio de prueba {i}",
+                "Descripcion": f"Descripción sintética del anuncio {i}. " * rnd.randint(1, 8),
+                "Provincia": provincia,
+                "Municipio": rnd.choice(MUNICIPIOS_POR_PROVINCIA[provincia]),
+                "Telefono": 50000000 + rnd.randrange(10_000_000),
+                "Email": f"vendedor{i}@example.com",
+                "Publicado": "N",
+                "Link": None,
+            }
+        )
+    out = Path(path)
+    guardar(pd.DataFrame(registros, columns=REQUIRED_COLUMNS), out)
+    return out
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Genera un anuncios.xlsx sintético para el benchmark")
+    parser.add_argument("salida", type=str, help="Ruta del .xlsx a generar")
+    parser.add_argument("--filas", type=int, default=1000, help="Número de anuncios")
+    parser.add_argument("--fotos-distintas", type=int, default=500, help="FILE_ID distintos entre todas las filas")
+    parser.add_argument("--fotos-por-anuncio", type=int, default=1, help="URLs en la columna Fotos de cada fila")
+    parser.add_argument("--semilla", type=int, default=1)
+    args = parser.parse_args()
+    generar(
+        args.filas,
+        args.salida,
+        fotos_distintas=args.fotos_distintas,
+        fotos_por_anuncio=args.fotos_por_anuncio,
+        semilla=args.semilla,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
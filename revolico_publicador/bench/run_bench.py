@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from bench.generar_excel import generar
+from bench.servidores import ConfigDrive, ConfigFormulario, servidor_drive, servidor_formulario
+from utils.metricas import percentiles
+
+try:  # pragma: no cover - solo Unix
+    import resource
+except Exception:  # pragma: no cover
+    resource = None
+
+PROYECTO = Path(__file__).resolve().parent.parent
+
+
+def _rss_pico_propio_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    # ru_maxrss: KB en Linux, bytes en macOS
+    escala = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / escala
+
+
+def _medir_excel(path: str) -> Dict[str, object]:
+    # Corre en un proceso limpio para que el pico de memoria sea solo el de pandas/openpyxl
+    sys.path.insert(0, str(PROYECTO))
+    from utils import cache_hoja
+    from utils.csv_parser import cargar_anuncios, guardar, iterar_pendientes
+
+    # Sin caché Parquet todavía: openpyxl en streaming y luego carga completa. Las dos
+    # crean la caché, así que se borra entre medias para medir la carga desde el Excel
+    t0 = time.perf_counter()
+    filas = sum(len(lote) for lote in iterar_pendientes(path, tamano=1000))
+    streaming = time.perf_counter() - t0
+    cache_hoja.ruta_cache(path).unlink(missing_ok=True)
+
+    t0 = time.perf_counter()
+    df = cargar_anuncios(path)
+    carga = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    cargar_anuncios(path)
+    carga_cache = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    sum(len(lote) for lote in iterar_pendientes(path, tamano=1000))
+    streaming_cache = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    guardar(df, Path(path).with_name("guardado.xlsx"))
+    guardado = time.perf_counter() - t0
+    return {
+        "filas": filas,
+        "cargar_anuncios_s": carga,
+        "iterar_pendientes_s": streaming,
+        "cargar_anuncios_cache_s": carga_cache,
+        "iterar_pendientes_cache_s": streaming_cache,
+        "guardar_s": guardado,
+        "rss_pico_mb": _rss_pico_propio_mb(),
+    }
+
+
+def _vm_hwm_mb(pid: int) -> Optional[float]:
+    # Pico de RSS de un proceso en curso (Linux)
+    try:
+        for linea in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if linea.startswith("VmHWM:"):
+                return int(linea.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+def _etapas_cliente(logs: Path) -> Dict[str, Dict[str, float]]:
+    # Registros por anuncio que escribe main.py (utils.metricas)
+    etapas: Dict[str, List[float]] = {}
+    for archivo in logs.glob("metricas_*.jsonl"):
+        for linea in archivo.read_text(encoding="utf-8").splitlines():
+            try:
+                registro = json.loads(linea)
+            except ValueError:
+                continue
+            for nombre, segundos in registro.get("etapas", {}).items():
+                etapas.setdefault(nombre, []).append(segundos)
+            etapas.setdefault("anuncio", []).append(registro.get("total", 0.0))
+    return {nombre: percentiles(valores) for nombre, valores in sorted(etapas.items())}
+
+
+def _ejecutar_publicador(
+    excel: Path, trabajo: Path, form_url: str, drive_url: str, extra: List[str]
+) -> Dict[str, object]:
+    env = dict(os.environ)
+    env.update(
+        {
+            "REVOLICO_FORM_URL": f"{form_url}/publicar",
+            "REVOLICO_AD_URL_PATTERN": r"127\.0\.0\.1:\d+/item/",
+            "DRIVE_DOWNLOAD_URL": f"{drive_url}/uc",
+            "IMAGES_DIR": str(trabajo / "imagenes"),
+            "DUPLICADOS_PATH": str(trabajo / "publicados.jsonl"),
+            "LOGS_DIR": str(trabajo / "logs"),
+            "PAUSA_LARGA_CADA": "0",
+        }
+    )
+    cmd = [
+        sys.executable,
+        "main.py",
+        "--excel", str(excel),
+        "--headless", "true",
+        "--delay-min", "0",
+        "--delay-max", "0",
+        "--pausa-imagen", "0",
+        *extra,
+    ]
+    t0 = time.perf_counter()
+    # stdin cerrado: un captcha simulado no bloquea esperando Enter (la fila cuenta como error)
+    proc = subprocess.Popen(cmd, cwd=PROYECTO, env=env, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
+    rss: Optional[float] = None
+    while proc.poll() is None:
+        rss = _vm_hwm_mb(proc.pid) or rss
+        time.sleep(0.2)
+    return {"codigo_salida": proc.returncode, "duracion_s": time.perf_counter() - t0, "rss_pico_mb": rss}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Benchmark offline: formulario y Drive locales, Excel sintético",
+        epilog="Los argumentos no reconocidos se pasan a main.py (p. ej. --async, --prefetch 8).",
+    )
+    parser.add_argument("--filas", type=int, default=1000, help="Filas del Excel sintético (1k-100k)")
+    parser.add_argument("--fotos-distintas", type=int, default=500, help="FILE_ID distintos")
+    parser.add_argument("--fotos-por-anuncio", type=int, default=1, help="Fotos de cada anuncio")
+    parser.add_argument("--latencia-form", type=float, default=0.05, help="Latencia máxima del formulario por petición (s)")
+    parser.add_argument("--tasa-error", type=float, default=0.02, help="Fracción de envíos con mensaje de error")
+    parser.add_argument("--tasa-captcha", type=float, default=0.0, help="Fracción de envíos que devuelven captcha")
+    parser.add_argument("--latencia-drive", type=float, default=0.02, help="Latencia máxima de Drive por petición (s)")
+    parser.add_argument("--tam-foto-kb", type=int, default=200, help="Tamaño de cada foto servida (KB)")
+    parser.add_argument("--solo-excel", action="store_true", help="Medir solo carga/guardado del Excel (sin navegador)")
+    parser.add_argument("--trabajo", type=str, default=None, help="Directorio de trabajo (por defecto, uno temporal)")
+    parser.add_argument("--salida", type=str, default=None, help="Escribir el informe en JSON")
+    args, extra = parser.parse_known_args()
+
+    trabajo = Path(args.trabajo or tempfile.mkdtemp(prefix="bench_revolico_"))
+    trabajo.mkdir(parents=True, exist_ok=True)
+    excel = trabajo / "anuncios.xlsx"
+
+    t0 = time.perf_counter()
+    generar(args.filas, excel, fotos_distintas=args.fotos_distintas, fotos_por_anuncio=args.fotos_por_anuncio)
+    informe: Dict[str, object] = {"filas": args.filas, "generar_excel_s": time.perf_counter() - t0}
+
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        informe["excel"] = pool.submit(_medir_excel, str(excel)).result()
+
+    if not args.solo_excel:
+        form = ConfigFormulario(
+            latencia_max=args.latencia_form, tasa_error=args.tasa_error, tasa_captcha=args.tasa_captcha
+        )
+        drive = ConfigDrive(latencia_max=args.latencia_drive, tam_foto=args.tam_foto_kb * 1024)
+        form_srv, form_url = servidor_formulario(form)
+        drive_srv, drive_url = servidor_drive(drive)
+        try:
+            ejecucion = _ejecutar_publicador(excel, trabajo, form_url, drive_url, extra)
+        finally:
+            form_srv.shutdown()
+            drive_srv.shutdown()
+
+        envios = sorted(form.stats.envios_ok)
+        duracion = float(ejecucion["duracion_s"])  # type: ignore[arg-type]
+        ejecucion["publicados"] = len(envios)
+        ejecucion["anuncios_por_minuto"] = len(envios) / duracion * 60 if duracion else 0.0
+        if len(envios) > 1:
+            # Régimen estable: sin arranque del navegador ni compactación final
+            ejecucion["anuncios_por_minuto_estable"] = (len(envios) - 1) / (envios[-1] - envios[0]) * 60
+        ejecucion["por_anuncio_s"] = percentiles([b - a for a, b in zip(envios, envios[1:])])
+        ejecucion["etapas_cliente_s"] = _etapas_cliente(trabajo / "logs")
+        ejecucion["etapas_servidor_s"] = {
+            tipo: percentiles(t) for tipo, t in {**form.stats.tiempos, **drive.stats.tiempos}.items()
+        }
+        ejecucion["mb_subidos"] = form.stats.bytes_recibidos / (1024 * 1024)
+        ejecucion["mb_descargados"] = drive.stats.bytes_enviados / (1024 * 1024)
+        informe["publicacion"] = ejecucion
+
+    texto = json.dumps(informe, indent=2, ensure_ascii=False)
+    print(texto)
+    if args.salida:
+        Path(args.salida).write_text(texto, encoding="utf-8")
+    print(f"Directorio de trabajo: {trabajo}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
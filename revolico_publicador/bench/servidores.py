@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import html
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from utils.localidades import MUNICIPIOS_POR_PROVINCIA
+
+CATEGORIAS = {"Ropa": ["Zapatos", "Camisas"], "Hogar": ["Muebles", "Electrodomésticos"], "Autos": ["Piezas", "Motos"]}
+MONEDAS = ["CUP", "USD", "MLC", "EUR"]
+
+
+@dataclass
+class Estadisticas:
+    """Tiempos de servicio por tipo de petición, registrados por los servidores."""
+
+    tiempos: Dict[str, List[float]] = field(default_factory=dict)
+    # Instante (time.time) de cada envío con éxito
+    envios_ok: List[float] = field(default_factory=list)
+    bytes_recibidos: int = 0
+    bytes_enviados: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def anotar(self, tipo: str, segundos: float) -> None:
+        with self._lock:
+            self.tiempos.setdefault(tipo, []).append(segundos)
+
+
+def _opciones(valores: List[str]) -> str:
+    return "".join(f"<option>{html.escape(v)}</option>" for v in valores)
+
+
+def pagina_formulario(captcha: bool = False, aviso: str = "") -> str:
+    # Mismos name/data-testid que CAMPOS_SELECTORES, FOTOS_SELECTOR y SUBMIT_SELECTOR
+    subcategorias = [s for subs in CATEGORIAS.values() for s in subs]
+    municipios = sorted({m for ms in MUNICIPIOS_POR_PROVINCIA.values() for m in ms})
+    return f"""<!doctype html><html><head><meta charset="utf-8"><title>Nuevo anuncio</title></head><body>
+{aviso}
+{'<div class="g-recaptcha"></div>' if captcha else ''}
+<form method="post" action="/publicar" enctype="multipart/form-data">
+<select name="category">{_opciones(list(CATEGORIAS))}</select>
+<select name="subcategory">{_opciones(subcategorias)}</select>
+<input type="file" name="image" multiple>
+<input name="title"><textarea name="description"></textarea>
+<input name="price"><select name="currency">{_opciones(MONEDAS)}</select>
+<select name="province">{_opciones(list(MUNICIPIOS_POR_PROVINCIA))}</select>
+<select name="municipality">{_opciones(municipios)}</select>
+<input name="phone"><input name="email">
+<button type="submit">Enviar</button>
+</form></body></html>"""
+
+
+def _iniciar(handler: type, estado: object) -> Tuple[ThreadingHTTPServer, str]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    server.estado = estado  # type: ignore[attr-defined]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+class _Base(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: object) -> None:  # noqa: A002 - silencio
+        pass
+
+    def _responder(self, status: int, body: bytes, content_type: str, extra: Dict[str, str] | None = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (extra or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@dataclass
+class ConfigFormulario:
+    latencia_min: float = 0.0
+    latencia_max: float = 0.0
+    tasa_error: float = 0.0
+    tasa_captcha: float = 0.0
+    stats: Estadisticas = field(default_factory=Estadisticas)
+    _n: int = 0
+
+
+class _FormularioHandler(_Base):
+    def _latencia(self, cfg: ConfigFormulario) -> None:
+        if cfg.latencia_max > 0:
+            time.sleep(random.uniform(cfg.latencia_min, cfg.latencia_max))
+
+    def do_GET(self) -> None:  # noqa: N802
+        cfg: ConfigFormulario = self.server.estado  # type: ignore[attr-defined]
+        t0 = time.perf_counter()
+        ruta = urlsplit(self.path).path
+        if ruta.startswith("/item/"):
+            body = f"<html><body><h1>Anuncio publicado</h1><p>{html.escape(ruta)}</p></body></html>"
+            self._responder(200, body.encode(), "text/html; charset=utf-8")
+        elif ruta == "/publicar":
+            self._latencia(cfg)
+            self._responder(200, pagina_formulario().encode(), "text/html; charset=utf-8")
+            cfg.stats.anotar("form_get", time.perf_counter() - t0)
+        else:
+            self._responder(404, b"", "text/plain")
+
+    def do_POST(self) -> None:  # noqa: N802
+        cfg: ConfigFormulario = self.server.estado  # type: ignore[attr-defined]
+        t0 = time.perf_counter()
+        length = int(self.headers.get("Content-Length", "0"))
+        self.rfile.read(length)
+        with cfg.stats._lock:
+            cfg.stats.bytes_recibidos += length
+            cfg._n += 1
+            n = cfg._n
+        self._latencia(cfg)
+        azar = random.random()
+        if azar < cfg.tasa_captcha:
+            self._responder(200, pagina_formulario(captcha=True).encode(), "text/html; charset=utf-8")
+            cfg.stats.anotar("submit_captcha", time.perf_counter() - t0)
+        elif azar < cfg.tasa_captcha + cfg.tasa_error:
+            aviso = '<div class="error">Error: revise los datos del anuncio</div>'
+            self._responder(200, pagina_formulario(aviso=aviso).encode(), "text/html; charset=utf-8")
+            cfg.stats.anotar("submit_error", time.perf_counter() - t0)
+        else:
+            self._responder(303, b"", "text/plain", {"Location": f"/item/{n}"})
+            cfg.stats.anotar("submit_ok", time.perf_counter() - t0)
+            with cfg.stats._lock:
+                cfg.stats.envios_ok.append(time.time())
+
+
+def servidor_formulario(cfg: ConfigFormulario) -> Tuple[ThreadingHTTPServer, str]:
+    """Arranca el formulario de prueba en un puerto libre; devuelve (servidor, url base)."""
+    return _iniciar(_FormularioHandler, cfg)
+
+
+@dataclass
+class ConfigDrive:
+    latencia_min: float = 0.0
+    latencia_max: float = 0.0
+    tam_foto: int = 200 * 1024
+    # Fracción de archivos que muestran la página de confirmación de Drive
+    tasa_aviso: float = 0.1
+    stats: Estadisticas = field(default_factory=Estadisticas)
+
+
+_ID_RE = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+class _DriveHandler(_Base):
+    def do_GET(self) -> None:  # noqa: N802
+        cfg: ConfigDrive = self.server.estado  # type: ignore[attr-defined]
+        t0 = time.perf_counter()
+        parts = urlsplit(self.path)
+        qs = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        file_id = qs.get("id", "")
+        if cfg.latencia_max > 0:
+            time.sleep(random.uniform(cfg.latencia_min, cfg.latencia_max))
+        if parts.path == "/uc" and _ID_RE.match(file_id):
+            con_aviso = random.Random(file_id).random() < cfg.tasa_aviso
+            if con_aviso and "confirm" not in qs:
+                # Página de aviso de antivirus con el formulario de confirmación
+                body = (
+                    '<html><body><form id="download-form" action="/uc" method="get">'
+                    f'<input type="hidden" name="id" value="{file_id}">'
+                    '<input type="hidden" name="export" value="download">'
+                    '<input type="hidden" name="confirm" value="t">'
+                    "</form></body></html>"
+                )
+                self._responder(200, body.encode(), "text/html; charset=utf-8")
+                cfg.stats.anotar("drive_aviso", time.perf_counter() - t0)
+            else:
+                self._responder(302, b"", "text/plain", {"Location": f"/descarga/{file_id}"})
+                cfg.stats.anotar("drive_redireccion", time.perf_counter() - t0)
+        elif parts.path.startswith("/descarga/"):
+            file_id = parts.path.rsplit("/", 1)[-1]
+            # Contenido determinista por FILE_ID: la misma foto siempre tiene el mismo SHA-1
+            body = random.Random(file_id).randbytes(cfg.tam_foto)
+            disposition = f'attachment; filename="foto_{file_id}.jpg"'
+            self._responder(200, body, "image/jpeg", {"Content-Disposition": disposition})
+            with cfg.stats._lock:
+                cfg.stats.bytes_enviados += len(body)
+            cfg.stats.anotar("drive_descarga", time.perf_counter() - t0)
+        else:
+            self._responder(404, b"", "text/plain")
+
+
+def servidor_drive(cfg: ConfigDrive) -> Tuple[ThreadingHTTPServer, str]:
+    """Arranca el servidor de fotos estilo Drive; ``<url>/uc`` sustituye a DRIVE_DOWNLOAD_URL."""
+    return _iniciar(_DriveHandler, cfg)
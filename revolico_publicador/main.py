@@ -1,62 +1,59 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
+import functools
+import itertools
 import logging
+import multiprocessing
 import os
 import signal
-import sys
 import time
 import random
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List
+from logging.handlers import QueueListener
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, Iterator, List
 
+import pandas as pd
 from colorama import Fore, Style, init as colorama_init
 from dotenv import load_dotenv
 from tqdm import tqdm
 
-from utils.csv_parser import cargar_anuncios, guardar, marcar_publicado, particionar
-from utils.drive_downloader import descargar
-from utils.publicador import CaptchaDetected, Publicador
+from utils.anuncio import Anuncio, desde_df, separar_fotos
+from utils.csv_parser import cargar_anuncios, compactar, iterar_pendientes, marcar_publicado
+from utils.drive_downloader import configurar_sesion, descargar
+from utils.duplicados import IndiceDuplicados, huella_anuncio, huellas, sha1_fotos
+from utils.formulario import CaptchaDetected, PublicadorConfig
+from utils.image_cache import ImageCache
+from utils.logs import EVENTO_PUBLICADO, configurar_logging, detener_logging, volcar_logs
+from utils.metricas import METRICAS
+from utils.perfilado import PERFIL
+from utils.imagenes import PreprocesadoConfig, Preprocesador, disponible as pillow_disponible
+from utils.prefetch import ImagePrefetcher, ResultadoDescarga, unir_descargas_async
+from utils.progreso import ProgresoJournal, huella_fila, ruta_journal
+from utils.reintentos import INCIERTO, TRANSITORIO, ColaReintentos, ErrorPermanente, clasificar
+from utils.validacion import ResultadoValidacion, escribir_rechazos, pendientes, validar
+
+if TYPE_CHECKING:
+    from utils.publicador import Publicador
+    from utils.publicador_async import PublicadorAsync
 
 # Init colorama for Windows compatibility
 colorama_init(autoreset=True)
 
 # Logging setup
-LOGS_DIR = Path(__file__).parent / "logs"
+LOGS_DIR = Path(os.getenv("LOGS_DIR", Path(__file__).parent / "logs"))
 LOGS_DIR.mkdir(parents=True, exist_ok=True)
 ERROR_LOG_PATH = LOGS_DIR / "errores.log"
 PUBLISHED_LOG_PATH = LOGS_DIR / f"published_{datetime.now():%Y%m%d}.log"
+RECHAZOS_PATH = LOGS_DIR / f"rechazos_{datetime.now():%Y%m%d_%H%M%S}.csv"
 
 LOGGER = logging.getLogger("revolico_publicador")
 LOGGER.setLevel(logging.DEBUG)
-
-_formatter = logging.Formatter("%(asctime)s | %(levelname)s | %(message)s", datefmt="%Y-%m-%d %H:%M")
-
-_console = logging.StreamHandler(sys.stdout)
-_console.setLevel(logging.INFO)
-_console.setFormatter(_formatter)
-
-_err_file = logging.FileHandler(ERROR_LOG_PATH, encoding="utf-8")
-_err_file.setLevel(logging.WARNING)
-_err_file.setFormatter(_formatter)
-
-_published_file = logging.FileHandler(PUBLISHED_LOG_PATH, encoding="utf-8")
-_published_file.setLevel(logging.INFO)
-_published_file.setFormatter(_formatter)
-
-class _PublishedOnlyFilter(logging.Filter):
-    def filter(self, record: logging.LogRecord) -> bool:  # pragma: no cover - simple filter
-        try:
-            return str(record.getMessage()).startswith("Publicado:")
-        except Exception:
-            return False
-
-_published_file.addFilter(_PublishedOnlyFilter())
-
-LOGGER.addHandler(_console)
-LOGGER.addHandler(_err_file)
-LOGGER.addHandler(_published_file)
+# Listener de la cola de logging; lo arranca main() (utils.logs.configurar_logging)
+_LOG_LISTENER: QueueListener | None = None
 
 # Graceful shutdown flag
 _SHOULD_STOP = False
@@ -71,81 +68,542 @@ def _signal_handler(signum: int, frame) -> None:  # type: ignore[no-untyped-def]
 signal.signal(signal.SIGINT, _signal_handler)
 
 
-def _sleep_controls(index_in_batch: int) -> None:
-    # 60s cada 20 anuncios
-    if index_in_batch > 0 and index_in_batch % 20 == 0:
-        LOGGER.info("Pausa anti-bloqueo: 60s")
-        time.sleep(60)
+def _volcar_logs() -> None:
+    # Fin de lote: escribir en disco lo que esté en los búferes de los archivos de log
+    if _LOG_LISTENER is not None:
+        volcar_logs(_LOG_LISTENER)
 
 
-def _download_image_if_needed(url: str, images_dir: Path) -> Path | None:
-    try:
-        return descargar(url, images_dir)
-    except Exception as e:  # noqa: BLE001
-        LOGGER.warning(f"Fallo al descargar imagen: {e}")
-        return None
+# Pausa anti-bloqueo: PAUSA_LARGA_SEGUNDOS cada PAUSA_LARGA_CADA anuncios (0 = desactivada)
+PAUSA_LARGA_CADA = int(os.getenv("PAUSA_LARGA_CADA", "20"))
+PAUSA_LARGA_SEGUNDOS = float(os.getenv("PAUSA_LARGA_SEGUNDOS", "60"))
 
 
-def _build_anuncio_dict(row: Dict[str, object]) -> Dict[str, object]:
-    keys = [
-        "Categoria",
-        "Subcategoria",
-        "Fotos",
-        "Precio",
-        "Moneda",
-        "Titulo",
-        "Descripcion",
-        "Provincia",
-        "Municipio",
-        "Telefono",
-        "Email",
-    ]
-    return {k: row.get(k) for k in keys}
-
-
-def process_lote(df_lote, df_total, images_dir: Path, publicador: Publicador) -> None:
-    df_lote = df_lote.copy()
-    for i, (idx, row) in enumerate(tqdm(df_lote.iterrows(), total=len(df_lote), desc="Publicando")):
-        if _SHOULD_STOP:
-            break
-        if str(row.get("Publicado", "")).upper() == "S":
-            continue
+def _pausa_larga(index_in_batch: int) -> bool:
+    return PAUSA_LARGA_CADA > 0 and PAUSA_LARGA_SEGUNDOS > 0 and index_in_batch > 0 and index_in_batch % PAUSA_LARGA_CADA == 0
+
+
+def _sleep_controls(index_in_batch: int) -> None:
+    # 60s cada 20 anuncios por defecto
+    if _pausa_larga(index_in_batch):
+        LOGGER.info(f"Pausa anti-bloqueo: {PAUSA_LARGA_SEGUNDOS:g}s")
+        time.sleep(PAUSA_LARGA_SEGUNDOS)
+
+
+async def _sleep_controls_async(index_in_batch: int) -> None:
+    if _pausa_larga(index_in_batch):
+        LOGGER.info(f"Pausa anti-bloqueo: {PAUSA_LARGA_SEGUNDOS:g}s")
+        await asyncio.sleep(PAUSA_LARGA_SEGUNDOS)
+
+
+def _obtener_imagen(
+    url: str,
+    images_dir: Path,
+    cache: ImageCache | None = None,
+    preprocesador: Preprocesador | None = None,
+) -> Path:
+    # Corre en los hilos del prefetcher: descarga (o caché) y, si procede, preprocesado
+    path = descargar(url, images_dir, cache=cache)
+    return preprocesador.procesar(path) if preprocesador is not None else path
+
+
+async def _obtener_imagen_async(
+    url: str,
+    images_dir: Path,
+    cache: ImageCache | None,
+    preprocesador: Preprocesador | None,
+    limite: asyncio.Semaphore,
+) -> Path:
+    # Mismos hilos de trabajo que descargar_async, pero perfilados con --profile cpu
+    async with limite:
+        path = await asyncio.to_thread(PERFIL.envolver(descargar), url, images_dir, cache=cache)
+        if preprocesador is not None:
+            path = await asyncio.to_thread(PERFIL.envolver(preprocesador.procesar), path)
+        return path
+
+
+def _local_images(idx: object, resultados: List[ResultadoDescarga]) -> List[Path | None]:
+    # Un fallo solo descarta su foto: el anuncio se publica con las demás
+    paths: List[Path | None] = []
+    for n, resultado in enumerate(resultados, start=1):
+        if resultado.error is not None:
+            LOGGER.warning(f"Fallo al descargar imagen {n}/{len(resultados)} (fila idx={idx}): {resultado.error}")
+        paths.append(resultado.path if resultado.error is None else None)
+    return paths
+
+
+def _validar_lote(df_lote, informe: Path) -> ResultadoValidacion:
+    # Las filas rechazadas nunca llegan al navegador
+    validacion = validar(pendientes(df_lote))
+    if not validacion.rechazos.empty:
+        escribir_rechazos(validacion.rechazos, informe)
+        LOGGER.warning(f"{len(validacion.rechazos)} filas rechazadas por validación (detalle en {informe.name})")
+    return validacion
+
+
+def _extra(evento: str, idx: int, titulo: str, inicio: float | None = None, link: str | None = None) -> Dict[str, object]:
+    # Campos estructurados del registro (enrutado del log de publicados y log JSON)
+    extra: Dict[str, object] = {"evento": evento, "fila": int(idx), "titulo": titulo, "link": link}
+    if inicio is not None:
+        extra["duracion"] = round(time.perf_counter() - inicio, 3)
+    return extra
+
+
+def _comprobar_duplicado(
+    idx: int, indice: IndiceDuplicados | None, anuncio: Anuncio, titulo: str
+) -> tuple[str | None, bool]:
+    # Se comprueba con las fotos ya descargadas: la huella incluye el SHA-1 de su contenido
+    if indice is None:
+        return None, False
+    huella = huella_anuncio(anuncio, sha1_fotos(anuncio.fotos_a_subir()))
+    previo = indice.buscar(huella)
+    if previo is None:
+        return huella, False
+    cuando = datetime.fromtimestamp(float(previo["ts"])).strftime("%Y-%m-%d %H:%M")  # type: ignore[arg-type]
+    link = f" {previo['link']}" if previo.get("link") else ""
+    LOGGER.info(f"Duplicado omitido: {titulo} (ya publicado el {cuando}{link})", extra=_extra("duplicado", idx, titulo))
+    return huella, True
+
+
+def _medir_espera(filas: Iterator) -> Iterator:
+    # Tiempo bloqueado esperando la siguiente fila (la foto aún se está descargando)
+    while True:
+        t0 = time.perf_counter()
         try:
-            anuncio = _build_anuncio_dict(row.to_dict())
-
-            # Descargar imagen si hay URL
-            foto_url = str(row.get("Fotos", "") or "").strip()
-            local_image: Path | None = None
-            if foto_url:
-                local_image = _download_image_if_needed(foto_url, images_dir)
-                if local_image is not None:
-                    anuncio["Fotos"] = str(local_image)
-                else:
-                    anuncio["Fotos"] = None
+            item = next(filas)
+        except StopIteration:
+            return
+        yield time.perf_counter() - t0, item
+
+
+def _fallo(
+    anuncio: Anuncio, df_lote, error: Exception, reintentos: ColaReintentos | None, inicio: float
+) -> str | None:
+    # Transitorio: vuelve a la cola con espera exponencial. Devuelve el motivo si el fallo es definitivo.
+    # Un fallo tras el envío nunca se reintenta: el anuncio pudo quedar publicado
+    idx = anuncio.fila
+    titulo = anuncio.titulo or ""
+    extra = _extra("error", idx, titulo, inicio)
+    clase = clasificar(error)
+    if clase == TRANSITORIO:
+        if reintentos is None:
+            LOGGER.warning(f"Error en fila idx={idx} título='{titulo}': {error}", extra=extra)
+            return None
+        espera = reintentos.programar(idx, (anuncio, df_lote))
+        if espera is not None:
+            METRICAS.contar("reintento")
+            LOGGER.warning(
+                f"Error en fila idx={idx} título='{titulo}': {error} (reintento en {espera:g}s)", extra=extra
+            )
+            return None
+        motivo = f"{reintentos.intentos(idx)} intentos fallidos: {error}"
+    elif clase == INCIERTO:
+        motivo = f"{error} (comprueba en Revolico si se publicó antes de volver a intentarlo)"
+    else:
+        motivo = str(error)
+    LOGGER.warning(f"Fallo definitivo en fila idx={idx} título='{titulo}': {motivo}", extra=extra)
+    return motivo
+
+
+def _registrar_fallido(df_lote, idx: int, titulo: str, motivo: str, journal: ProgresoJournal | None) -> None:
+    # El motivo queda en el diario de progreso y en el informe de rechazos
+    if journal is not None:
+        journal.registrar(idx, huella_fila(df_lote.loc[idx]), estado="fallido", motivo=motivo)
+    escribir_rechazos(pd.DataFrame({"fila": [idx + 2], "Titulo": [titulo], "motivos": [motivo]}), RECHAZOS_PATH)
+
+
+def _publicar_anuncio(
+    anuncio: Anuncio,
+    df_lote,
+    publicador: Publicador,
+    n: int,
+    journal: ProgresoJournal | None = None,
+    indice: IndiceDuplicados | None = None,
+    reintentos: ColaReintentos | None = None,
+    espera: float | None = None,
+) -> None:
+    idx = anuncio.fila
+    titulo = anuncio.titulo or ""
+    inicio = time.perf_counter()
+    with METRICAS.anuncio(idx, titulo) as registro:
+        if espera is not None:
+            METRICAS.registrar("espera_imagen", espera)
+        try:
+            huella, duplicado = _comprobar_duplicado(idx, indice, anuncio, titulo)
+            if duplicado:
+                registro["estado"] = "duplicado"
+                if journal is not None:
+                    journal.registrar(idx, huella_fila(df_lote.loc[idx]), estado="duplicado")
+                return
 
             # Publicar con captcha handling
             while True:
                 try:
-                    ok = publicador.publicar(anuncio)
+                    with PERFIL.navegador():
+                        ok = publicador.publicar(anuncio)
                     if ok:
-                        titulo = str(row.get("Titulo", "")).strip()
-                        LOGGER.info(f"Publicado: {titulo}")
-                        marcar_publicado(df_total, idx)
+                        LOGGER.info(
+                            f"Publicado: {titulo}",
+                            extra=_extra(EVENTO_PUBLICADO, idx, titulo, inicio, publicador.ultimo_link),
+                        )
+                        registro["estado"] = "publicado"
+                        with METRICAS.etapa("journal"):
+                            marcar_publicado(df_lote, idx, journal=journal, link=publicador.ultimo_link)
+                            if indice is not None and huella is not None:
+                                indice.registrar(huella, link=publicador.ultimo_link, titulo=titulo)
                         break
                     else:
-                        raise RuntimeError("El formulario reportó error de validación o estado desconocido")
+                        raise ErrorPermanente("El formulario reportó error de validación")
                 except CaptchaDetected:
                     LOGGER.warning("CAPTCHA DETECTADO – PAUSADO")
-                    input("Resuelve el captcha en el navegador abierto y pulsa Enter para reintentar...")
+                    METRICAS.contar("captcha")
+                    with METRICAS.etapa("captcha_pausa"):
+                        input("Resuelve el captcha en el navegador abierto y pulsa Enter para reintentar...")
                     continue
 
             # Sleep aleatorio 3-7s entre cada anuncio
-            time.sleep(random.uniform(publicador.config.delay_min, publicador.config.delay_max))
-            _sleep_controls(i + 1)
+            with METRICAS.etapa("pausa"):
+                time.sleep(random.uniform(publicador.config.delay_min, publicador.config.delay_max))
+                _sleep_controls(n)
         except Exception as e:  # noqa: BLE001
-            titulo = str(row.get("Titulo", "")).strip()
-            LOGGER.warning(f"Error en fila idx={idx} título='{titulo}': {e}")
+            motivo = _fallo(anuncio, df_lote, e, reintentos, inicio)
+            if motivo is not None:
+                _registrar_fallido(df_lote, idx, titulo, motivo, journal)
+
+
+def process_lote(
+    df_lote,
+    publicador: Publicador,
+    prefetcher: ImagePrefetcher,
+    journal: ProgresoJournal | None = None,
+    anuncios=None,
+    indice: IndiceDuplicados | None = None,
+    reintentos: ColaReintentos | None = None,
+) -> None:
+    # Filas a publicar (ya validadas y normalizadas si se indican); el estado se marca en df_lote
+    if anuncios is None:
+        anuncios = pendientes(df_lote)
+    # Las fotos de las próximas filas se descargan en segundo plano mientras se publica
+    lista = desde_df(anuncios)
+    filas = prefetcher.iterar((anuncio, anuncio.lista_fotos()) for anuncio in lista)
+    medidas = _medir_espera(filas)
+    n = 0
+    for espera, (anuncio, resultados) in tqdm(medidas, total=len(lista), desc="Publicando"):
+        if _SHOULD_STOP:
+            break
+        # Imágenes ya descargadas (o en curso) por el prefetcher
+        if resultados:
+            anuncio = anuncio.con_fotos(_local_images(anuncio.fila, resultados))
+        n += 1
+        _publicar_anuncio(anuncio, df_lote, publicador, n, journal, indice, reintentos, espera)
+        # Reintentos ya vencidos, intercalados con las filas nuevas
+        for previo, df_previo in reintentos.listos() if reintentos is not None else ():
+            if _SHOULD_STOP:
+                break
+            n += 1
+            _publicar_anuncio(previo, df_previo, publicador, n, journal, indice, reintentos)
+    # Cancela las descargas anticipadas si se interrumpió el lote
+    filas.close()
+
+
+def _vaciar_reintentos(
+    reintentos: ColaReintentos,
+    publicador: Publicador,
+    journal: ProgresoJournal | None = None,
+    indice: IndiceDuplicados | None = None,
+) -> None:
+    # Sin filas nuevas solo quedan reintentos: se espera a que venzan (en pasos cortos para atender Ctrl-C)
+    n = 0
+    while len(reintentos) and not _SHOULD_STOP:
+        espera = reintentos.proximo() or 0.0
+        if espera > 0:
+            time.sleep(min(espera, 1.0))
             continue
+        for anuncio, df_lote in reintentos.listos():
+            if _SHOULD_STOP:
+                break
+            n += 1
+            _publicar_anuncio(anuncio, df_lote, publicador, n, journal, indice, reintentos)
+
+
+async def _publicar_anuncio_async(
+    anuncio: Anuncio,
+    df_lote,
+    publicador: PublicadorAsync,
+    n: int,
+    en_segundo_plano: Callable[..., None],
+    journal: ProgresoJournal | None = None,
+    indice: IndiceDuplicados | None = None,
+    reintentos: ColaReintentos | None = None,
+) -> None:
+    idx = anuncio.fila
+    titulo = anuncio.titulo or ""
+    inicio = time.perf_counter()
+    with METRICAS.anuncio(idx, titulo) as registro:
+        try:
+            huella, duplicado = _comprobar_duplicado(idx, indice, anuncio, titulo)
+            if duplicado:
+                registro["estado"] = "duplicado"
+                if journal is not None:
+                    en_segundo_plano(journal.registrar, idx, huella_fila(df_lote.loc[idx]), estado="duplicado")
+                return
+
+            while True:
+                try:
+                    with PERFIL.navegador():
+                        ok = await publicador.publicar(anuncio)
+                    if ok:
+                        LOGGER.info(
+                            f"Publicado: {titulo}",
+                            extra=_extra(EVENTO_PUBLICADO, idx, titulo, inicio, publicador.ultimo_link),
+                        )
+                        registro["estado"] = "publicado"
+                        link = publicador.ultimo_link
+                        marcar_publicado(df_lote, idx, link=link)
+                        if journal is not None:
+                            en_segundo_plano(journal.registrar, idx, huella_fila(df_lote.loc[idx]), link=link)
+                        if indice is not None and huella is not None:
+                            en_segundo_plano(indice.registrar, huella, link=link, titulo=titulo)
+                        break
+                    else:
+                        raise ErrorPermanente("El formulario reportó error de validación")
+                except CaptchaDetected:
+                    LOGGER.warning("CAPTCHA DETECTADO – PAUSADO")
+                    METRICAS.contar("captcha")
+                    with METRICAS.etapa("captcha_pausa"):
+                        await asyncio.to_thread(
+                            input, "Resuelve el captcha en el navegador abierto y pulsa Enter para reintentar..."
+                        )
+                    continue
+
+            with METRICAS.etapa("pausa"):
+                await asyncio.sleep(random.uniform(publicador.config.delay_min, publicador.config.delay_max))
+                await _sleep_controls_async(n)
+        except Exception as e:  # noqa: BLE001
+            motivo = _fallo(anuncio, df_lote, e, reintentos, inicio)
+            if motivo is not None:
+                en_segundo_plano(_registrar_fallido, df_lote, idx, titulo, motivo, journal)
+
+
+async def process_lote_async(
+    df_lote,
+    publicador: PublicadorAsync,
+    obtener_imagen: Callable[[str], Awaitable[Path]],
+    journal: ProgresoJournal | None = None,
+    profundidad: int = 4,
+    anuncios=None,
+    indice: IndiceDuplicados | None = None,
+    reintentos: ColaReintentos | None = None,
+) -> None:
+    """Equivalente asíncrono de ``process_lote``.
+
+    Las fotos de las ``profundidad`` filas siguientes y las escrituras del diario
+    avanzan como tareas mientras el navegador espera; el ritmo entre anuncios es
+    el mismo que en la versión síncrona.
+    """
+    if anuncios is None:
+        anuncios = pendientes(df_lote)
+    filas = desde_df(anuncios)
+    imagenes: Dict[int, asyncio.Future] = {}
+    escrituras: List[asyncio.Task] = []
+
+    def programar(j: int) -> None:
+        if j in imagenes or j >= len(filas):
+            return
+        urls = filas[j].lista_fotos()
+        if urls:
+            # Todas las fotos del anuncio a la vez (el semáforo de obtener_imagen limita el total)
+            imagenes[j] = asyncio.gather(*(obtener_imagen(url) for url in urls), return_exceptions=True)
+
+    def en_segundo_plano(fn: Callable, *args: object, **kwargs: object) -> None:
+        escrituras.append(asyncio.create_task(asyncio.to_thread(PERFIL.envolver(fn), *args, **kwargs)))
+
+    n = 0
+    try:
+        for i, anuncio in enumerate(tqdm(filas, desc="Publicando")):
+            if _SHOULD_STOP:
+                break
+            for j in range(i, i + profundidad + 1):
+                programar(j)
+            tarea = imagenes.pop(i, None)
+            if tarea is not None:
+                with METRICAS.etapa("espera_imagen"):
+                    salidas = await tarea
+                resultados = [
+                    ResultadoDescarga(error=r) if isinstance(r, BaseException) else ResultadoDescarga(path=r)
+                    for r in salidas
+                ]
+                anuncio = anuncio.con_fotos(_local_images(anuncio.fila, resultados))
+            n += 1
+            await _publicar_anuncio_async(anuncio, df_lote, publicador, n, en_segundo_plano, journal, indice, reintentos)
+            for previo, df_previo in reintentos.listos() if reintentos is not None else ():
+                if _SHOULD_STOP:
+                    break
+                n += 1
+                await _publicar_anuncio_async(
+                    previo, df_previo, publicador, n, en_segundo_plano, journal, indice, reintentos
+                )
+    finally:
+        for tarea in imagenes.values():
+            tarea.cancel()
+        # El progreso del lote queda en disco antes de continuar
+        await asyncio.gather(*escrituras, return_exceptions=True)
+
+
+async def _vaciar_reintentos_async(
+    reintentos: ColaReintentos,
+    publicador: PublicadorAsync,
+    journal: ProgresoJournal | None = None,
+    indice: IndiceDuplicados | None = None,
+) -> None:
+    escrituras: List[asyncio.Task] = []
+
+    def en_segundo_plano(fn: Callable, *args: object, **kwargs: object) -> None:
+        escrituras.append(asyncio.create_task(asyncio.to_thread(PERFIL.envolver(fn), *args, **kwargs)))
+
+    n = 0
+    try:
+        while len(reintentos) and not _SHOULD_STOP:
+            espera = reintentos.proximo() or 0.0
+            if espera > 0:
+                await asyncio.sleep(min(espera, 1.0))
+                continue
+            for anuncio, df_lote in reintentos.listos():
+                if _SHOULD_STOP:
+                    break
+                n += 1
+                await _publicar_anuncio_async(
+                    anuncio, df_lote, publicador, n, en_segundo_plano, journal, indice, reintentos
+                )
+    finally:
+        await asyncio.gather(*escrituras, return_exceptions=True)
+
+
+async def _publicar_async(
+    lotes: Iterator,
+    opciones_publicador: Dict[str, object],
+    obtener_imagen: Callable[[str], Awaitable[Path]],
+    journal: ProgresoJournal,
+    profundidad: int,
+    indice: IndiceDuplicados | None = None,
+    reintentos: ColaReintentos | None = None,
+) -> None:
+    from utils.publicador_async import PublicadorAsync
+
+    publicador = await PublicadorAsync.crear(**opciones_publicador)
+    try:
+        lote_idx = 0
+        while not _SHOULD_STOP:
+            df_lote = await asyncio.to_thread(next, lotes, None)
+            if df_lote is None:
+                break
+            lote_idx += 1
+            LOGGER.info(Fore.CYAN + Style.BRIGHT + f"Procesando lote {lote_idx} (size={len(df_lote)})")
+            with PERFIL.fase(f"lote {lote_idx}"):
+                validacion = await asyncio.to_thread(_validar_lote, df_lote, RECHAZOS_PATH)
+                await process_lote_async(
+                    df_lote, publicador, obtener_imagen, journal, profundidad, validacion.anuncios, indice, reintentos
+                )
+            LOGGER.info(Fore.GREEN + Style.BRIGHT + f"Lote {lote_idx} completado (progreso en {journal.path.name})")
+            LOGGER.info(METRICAS.resumen_lote())
+            _volcar_logs()
+        if reintentos is not None and len(reintentos) and not _SHOULD_STOP:
+            LOGGER.info(f"Reintentando {len(reintentos)} filas fallidas")
+            await _vaciar_reintentos_async(reintentos, publicador, journal, indice)
+    finally:
+        if publicador.filtro is not None:
+            LOGGER.info(publicador.filtro.resumen())
+        try:
+            await publicador.cerrar()
+        except Exception:
+            pass
+
+
+def _lista_env(nombre: str) -> tuple[str, ...] | None:
+    valor = os.getenv(nombre)
+    if valor is None:
+        return None
+    return tuple(v.strip() for v in valor.split(",") if v.strip())
+
+
+def _opciones_bloqueo() -> Dict[str, object]:
+    # Listas separadas por comas; si la variable no existe se usan los valores por defecto
+    opciones: Dict[str, object] = {}
+    for env, campo in (
+        ("BLOCK_RESOURCE_TYPES", "bloquear_tipos"),
+        ("BLOCK_DOMAINS", "bloquear_dominios"),
+        ("ALLOW_URL_PATTERNS", "permitir"),
+    ):
+        valor = _lista_env(env)
+        if valor is not None:
+            opciones[campo] = valor
+    return opciones
+
+
+def _compactar_journal(excel_path: Path, journal: ProgresoJournal) -> None:
+    try:
+        with METRICAS.etapa("guardar", por_anuncio=False), PERFIL.fase("guardar"):
+            n = compactar(excel_path, journal)
+        if n:
+            LOGGER.info(Fore.GREEN + Style.BRIGHT + f"Progreso guardado en el Excel ({n} filas publicadas)")
+    except Exception as e:  # noqa: BLE001
+        LOGGER.warning(f"No se pudo compactar el diario de progreso (se conserva en {journal.path}): {e}")
+    finally:
+        journal.cerrar()
+
+
+def _duplicados_hoja(anuncios, cache: ImageCache, indice: IndiceDuplicados | None) -> tuple[Dict[int, str], int]:
+    # Fotos: SHA-1 si ya está en la caché; si no, su URL (misma URL = misma foto dentro de la hoja).
+    # El índice guarda el SHA-1 de las fotos publicadas: solo se consulta para las filas cuyas
+    # fotos están todas en la caché. Devuelve los motivos y cuántas filas no se pudieron consultar
+    urls = anuncios["Fotos"].fillna("").map(separar_fotos)
+    fotos = urls.map(lambda us: "+".join(cache.sha1(u) or ImageCache.clave(u) for u in us))
+    en_cache = urls.map(lambda us: all(cache.sha1(u) is not None for u in us))
+    claves = huellas(anuncios, fotos)
+    repetida = claves.duplicated(keep="first")
+    primera = {h: idx for idx, h in claves[~repetida].items()}
+    repetidas = claves[repetida]
+    motivos = {idx: f"Duplicado de la fila {int(primera[h]) + 2}" for idx, h in repetidas.items()}
+    if indice is None:
+        return motivos, 0
+    consultables = claves[en_cache & ~claves.index.isin(motivos)]
+    for h, entry in indice.filtrar(consultables.unique()).items():
+        cuando = datetime.fromtimestamp(float(entry["ts"])).strftime("%Y-%m-%d")  # type: ignore[arg-type]
+        for idx in claves.index[claves == h]:
+            motivos[idx] = f"Ya publicado el {cuando}"
+    return motivos, int((~en_cache).sum())
+
+
+def _validar_hoja(excel_path: Path, journal: ProgresoJournal, cache: ImageCache, indice: IndiceDuplicados | None) -> int:
+    # Solo pandas: este modo no abre el navegador ni importa Playwright
+    df = pendientes(cargar_anuncios(excel_path, journal=journal))
+    validacion = validar(df)
+    duplicados, sin_comprobar = _duplicados_hoja(validacion.anuncios, cache, indice)
+    rechazos = validacion.rechazos
+    if duplicados:
+        extra = {
+            "fila": [idx + 2 for idx in duplicados],
+            "Titulo": validacion.anuncios.loc[list(duplicados), "Titulo"].to_numpy(),
+            "motivos": list(duplicados.values()),
+        }
+        rechazos = pd.concat([rechazos, pd.DataFrame(extra)], ignore_index=True).sort_values("fila")
+    LOGGER.info(
+        f"Filas pendientes: {len(df)} | válidas: {len(validacion.anuncios) - len(duplicados)} | "
+        f"rechazadas: {len(validacion.rechazos)} | duplicadas: {len(duplicados)}"
+    )
+    if sin_comprobar:
+        LOGGER.info(
+            f"{sin_comprobar} filas con fotos que aún no están en la caché no se comprobaron contra el índice "
+            "de publicados (se comprobarán al publicar, tras descargarlas)"
+        )
+    if rechazos.empty:
+        return 0
+    escribir_rechazos(rechazos, RECHAZOS_PATH)
+    motivos = rechazos["motivos"].str.replace(r" (de la fila|el) .*$", "", regex=True).str.split("; ").explode().value_counts()
+    for motivo, n in motivos.items():
+        LOGGER.info(f"  {motivo}: {n}")
+    LOGGER.warning(f"Informe de rechazos: {RECHAZOS_PATH}")
+    return 1
 
 
 def main() -> int:
@@ -156,54 +614,238 @@ def main() -> int:
     parser.add_argument("--headless", type=str, default="false", help="Ejecutar en modo headless (true/false)")
     parser.add_argument("--delay-min", type=int, default=3, help="Delay mínimo entre anuncios (s)")
     parser.add_argument("--delay-max", type=int, default=7, help="Delay máximo entre anuncios (s)")
+    parser.add_argument("--pausa-campo-min", type=float, default=0.0, help="Pausa mínima entre campos del formulario (s)")
+    parser.add_argument("--pausa-campo-max", type=float, default=0.0, help="Pausa máxima entre campos; 0 rellena los campos en bloque")
+    parser.add_argument("--pausa-imagen", type=float, default=2.0, help="Espera tras adjuntar la foto (s)")
+    parser.add_argument("--sin-bloqueo", action="store_true", help="No bloquear fuentes, imágenes ni scripts de anuncios/trackers en el formulario")
+    parser.add_argument("--perfil", type=str, default=os.getenv("BROWSER_PROFILE_DIR"), help="Directorio de perfil persistente de Chromium (cookies, caché HTTP y service workers)")
+    parser.add_argument("--storage-state", type=str, default=os.getenv("BROWSER_STORAGE_STATE"), help="JSON de storage_state (cookies/localStorage) a cargar y guardar")
+    parser.add_argument("--reset-en-sitio", action="store_true", help="Tras publicar, limpiar el formulario cargado en lugar de volver a navegar")
     parser.add_argument("--excel", type=str, default=str(Path(__file__).parent / "anuncios.xlsx"), help="Ruta al Excel de anuncios")
+    parser.add_argument("--prefetch", type=int, default=4, help="Filas por delante cuyas fotos se descargan en segundo plano")
+    parser.add_argument("--prefetch-workers", type=int, default=2, help="Descargas simultáneas del prefetcher")
+    parser.add_argument("--preprocesar", action="store_true", help="Redimensionar y recomprimir las fotos antes de subirlas (requiere Pillow)")
+    parser.add_argument("--preprocesar-workers", type=int, default=1, help="Procesos dedicados al preprocesado de fotos (0 = en los hilos de descarga)")
+    parser.add_argument("--async", dest="asincrono", action="store_true", help="Usar el motor asíncrono (playwright.async_api)")
+    parser.add_argument("--compactar", action="store_true", help="Volcar el diario de progreso al Excel y salir")
+    parser.add_argument("--reintentos", type=int, default=2, help="Reintentos por fila ante fallos transitorios dentro de la ejecución (0 = ninguno)")
+    parser.add_argument("--permitir-duplicados", action="store_true", help="No omitir anuncios ya publicados dentro de la ventana de duplicados")
+    parser.add_argument("--sin-metricas", action="store_true", help="No medir tiempos por etapa ni exportar métricas")
+    parser.add_argument("--validate", action="store_true", help="Validar la hoja completa sin abrir el navegador y salir")
+    parser.add_argument(
+        "--profile",
+        choices=("cpu", "mem", "all"),
+        action="append",
+        default=[],
+        help="Perfilar la ejecución: cpu (cProfile, logs/perfil_*.prof), mem (tracemalloc por lote, logs/memoria_*.txt) o all",
+    )
+    parser.add_argument("--profile-top", type=int, default=25, help="Entradas en los resúmenes de --profile")
+    parser.add_argument(
+        "--log-json",
+        nargs="?",
+        const=str(LOGS_DIR / f"eventos_{datetime.now():%Y%m%d}.jsonl"),
+        default=None,
+        help="Escribir además un log JSON por líneas (por defecto logs/eventos_YYYYMMDD.jsonl)",
+    )
 
     args = parser.parse_args()
+    global _LOG_LISTENER
+    _LOG_LISTENER = configurar_logging(
+        LOGGER, ERROR_LOG_PATH, PUBLISHED_LOG_PATH, json_path=Path(args.log_json) if args.log_json else None
+    )
+    PERFIL.configurar(
+        LOGS_DIR,
+        cpu=bool({"cpu", "all"} & set(args.profile)),
+        memoria=bool({"mem", "all"} & set(args.profile)),
+        top=args.profile_top,
+    )
+    PERFIL.iniciar()
+    try:
+        return _ejecutar(args)
+    finally:
+        resumen = PERFIL.detener()
+        if resumen:
+            LOGGER.info(resumen)
+        detener_logging(_LOG_LISTENER)
+        _LOG_LISTENER = None
+
+
+def _ejecutar(args: argparse.Namespace) -> int:
     headless = str(args.headless).strip().lower() in {"true", "1", "yes"}
 
     excel_path = Path(args.excel)
     images_dir = Path(os.getenv("IMAGES_DIR", Path(__file__).parent / "data/imagenes"))
 
-    df = cargar_anuncios(excel_path)
+    cache = ImageCache(
+        images_dir,
+        max_bytes=int(os.getenv("IMAGES_CACHE_MAX_MB", "500")) * 1024 * 1024,
+        max_age_seconds=float(os.getenv("IMAGES_CACHE_MAX_DIAS", "30")) * 24 * 3600,
+        revalidate_seconds=float(os.getenv("IMAGES_CACHE_REVALIDAR_HORAS", "24")) * 3600,
+    )
+    journal = ProgresoJournal(ruta_journal(excel_path))
+
+    if args.compactar:
+        n = compactar(excel_path, journal)
+        journal.cerrar()
+        LOGGER.info(f"Diario compactado en el Excel ({n} filas publicadas)")
+        return 0
+
+    # Huellas de lo ya publicado (persistente entre ejecuciones y hojas)
+    indice: IndiceDuplicados | None = None
+    if not args.permitir_duplicados:
+        indice = IndiceDuplicados(
+            os.getenv("DUPLICADOS_PATH", Path(__file__).parent / "data/publicados.jsonl"),
+            ventana_dias=float(os.getenv("DUPLICADOS_VENTANA_DIAS", "30")),
+        )
+
+    if args.validate:
+        try:
+            return _validar_hoja(excel_path, journal, cache, indice)
+        finally:
+            journal.cerrar()
+            if indice is not None:
+                indice.cerrar()
+
+    from utils.publicador import Publicador
 
-    # Filtrar donde Publicado = 'N'
-    mask_no = df["Publicado"].astype(str).str.upper().ne("S")
-    pendientes = df[mask_no]
+    # Solo filas con Publicado != 'S', leídas en streaming lote a lote
+    lotes = iterar_pendientes(excel_path, tamano=args.lote, journal=journal)
+    primer_lote = next(lotes, None)
 
-    if len(pendientes) == 0:
+    if primer_lote is None:
         LOGGER.info("No hay anuncios pendientes de publicar.")
+        _compactar_journal(excel_path, journal)
+        if indice is not None:
+            indice.cerrar()
         return 0
 
-    lotes = particionar(pendientes, tamano=args.lote)
+    if args.sin_metricas:
+        METRICAS.activo = False
+    else:
+        METRICAS.configurar(
+            jsonl=LOGS_DIR / f"metricas_{datetime.now():%Y%m%d}.jsonl",
+            prometheus=os.getenv("METRICAS_PROM_PATH", LOGS_DIR / "revolico_publicador.prom"),
+        )
 
     form_url = os.getenv("REVOLICO_FORM_URL", "https://www.revolico.com/publicar")
-    publicador = Publicador(headless=headless, delay_min=args.delay_min, delay_max=args.delay_max, base_url=form_url)
+    if args.perfil and not args.sin_bloqueo:
+        LOGGER.info("Con --perfil no se bloquean recursos: interceptar peticiones anularía la caché HTTP del perfil")
+    opciones_publicador: Dict[str, object] = dict(
+        headless=headless,
+        delay_min=args.delay_min,
+        delay_max=args.delay_max,
+        base_url=form_url,
+        pausa_campo_min=args.pausa_campo_min,
+        pausa_campo_max=args.pausa_campo_max,
+        pausa_imagen=args.pausa_imagen,
+        patron_url_anuncio=os.getenv("REVOLICO_AD_URL_PATTERN", PublicadorConfig.patron_url_anuncio),
+        bloquear_recursos=not args.sin_bloqueo,
+        perfil_dir=args.perfil,
+        storage_state=args.storage_state,
+        reset_en_sitio=args.reset_en_sitio,
+        **_opciones_bloqueo(),
+    )
+    configurar_sesion(
+        pool_size=max(args.prefetch_workers, int(os.getenv("DOWNLOAD_POOL_SIZE", "8"))),
+        reintentos=int(os.getenv("DOWNLOAD_HTTP_RETRIES", "2")),
+    )
+    preprocesador: Preprocesador | None = None
+    if args.preprocesar:
+        if pillow_disponible():
+            config = PreprocesadoConfig(
+                max_dim=int(os.getenv("IMAGES_MAX_DIM", "1600")),
+                formato=os.getenv("IMAGES_FORMATO", "JPEG").upper(),
+                max_bytes=int(os.getenv("IMAGES_MAX_KB", "4096")) * 1024,
+            )
+            # spawn: hacer fork de un proceso con hilos (prefetcher, logs, Playwright) puede bloquear a los hijos
+            pool = (
+                ProcessPoolExecutor(max_workers=args.preprocesar_workers, mp_context=multiprocessing.get_context("spawn"))
+                if args.preprocesar_workers > 0
+                else None
+            )
+            preprocesador = Preprocesador(config, pool)
+        else:
+            LOGGER.warning("Pillow no está instalado: las fotos se subirán sin preprocesar")
+    profundidad = args.prefetch
+    max_en_vuelo = int(os.getenv("PREFETCH_MAX_MB", "100")) * 1024 * 1024
+    todos_los_lotes = itertools.chain([primer_lote], lotes)
+    reintentos: ColaReintentos = ColaReintentos(
+        max_intentos=max(0, args.reintentos) + 1,
+        base=float(os.getenv("REINTENTOS_BASE_SEGUNDOS", "30")),
+        maximo=float(os.getenv("REINTENTOS_MAX_SEGUNDOS", "300")),
+    )
 
     exit_code = 0
+    prefetcher: ImagePrefetcher | None = None
+    publicador: Publicador | None = None
     try:
-        for lote_idx, df_lote in enumerate(lotes, start=1):
-            if _SHOULD_STOP:
-                break
-            LOGGER.info(Fore.CYAN + Style.BRIGHT + f"Procesando lote {lote_idx}/{len(lotes)} (size={len(df_lote)})")
-            process_lote(df_lote, df, images_dir, publicador)
-            guardar(df, excel_path)
-            LOGGER.info(Fore.GREEN + Style.BRIGHT + f"Progreso guardado tras lote {lote_idx}")
+        if args.asincrono:
+            limite = asyncio.Semaphore(args.prefetch_workers)
+            obtener_async = unir_descargas_async(
+                functools.partial(
+                    _obtener_imagen_async, images_dir=images_dir, cache=cache, preprocesador=preprocesador, limite=limite
+                )
+            )
+            asyncio.run(
+                _publicar_async(
+                    todos_los_lotes, opciones_publicador, obtener_async, journal, profundidad, indice, reintentos
+                )
+            )
+        else:
+            publicador = Publicador(**opciones_publicador)
+            prefetcher = ImagePrefetcher(
+                PERFIL.envolver(
+                    functools.partial(_obtener_imagen, images_dir=images_dir, cache=cache, preprocesador=preprocesador)
+                ),
+                workers=args.prefetch_workers,
+                profundidad=profundidad,
+                max_bytes_en_vuelo=max_en_vuelo,
+            )
+            for lote_idx, df_lote in enumerate(todos_los_lotes, start=1):
+                if _SHOULD_STOP:
+                    break
+                LOGGER.info(Fore.CYAN + Style.BRIGHT + f"Procesando lote {lote_idx} (size={len(df_lote)})")
+                with PERFIL.fase(f"lote {lote_idx}"):
+                    validacion = _validar_lote(df_lote, RECHAZOS_PATH)
+                    process_lote(df_lote, publicador, prefetcher, journal, validacion.anuncios, indice, reintentos)
+                LOGGER.info(Fore.GREEN + Style.BRIGHT + f"Lote {lote_idx} completado (progreso en {journal.path.name})")
+                LOGGER.info(METRICAS.resumen_lote())
+                _volcar_logs()
+            if len(reintentos) and not _SHOULD_STOP:
+                LOGGER.info(f"Reintentando {len(reintentos)} filas fallidas")
+                _vaciar_reintentos(reintentos, publicador, journal, indice)
     except Exception as e:  # noqa: BLE001
         LOGGER.exception(f"Fallo inesperado: {e}")
         exit_code = 1
     finally:
+        if prefetcher is not None:
+            prefetcher.cerrar()
+        if preprocesador is not None:
+            preprocesador.cerrar()
+        if publicador is not None:
+            if publicador.filtro is not None:
+                LOGGER.info(publicador.filtro.resumen())
+            try:
+                publicador.cerrar()
+            except Exception:
+                pass
+        # Liberar el Excel (abierto en modo lectura) antes de reescribirlo
+        lotes.close()
+        _compactar_journal(excel_path, journal)
+        if indice is not None:
+            indice.cerrar()
+        METRICAS.cerrar()
+        # Aplicar límites de la caché de imágenes (LRU por tamaño y antigüedad)
         try:
-            publicador.cerrar()
-        except Exception:
-            pass
-        # Limpiar caché de imágenes
-        try:
-            for p in images_dir.glob("*"):
-                if p.is_file():
-                    p.unlink(missing_ok=True)
-            LOGGER.info("Caché de imágenes limpiada")
+            removed = cache.desalojar()
+            LOGGER.info(f"Caché de imágenes depurada ({removed} archivos eliminados)")
         except Exception:
-            LOGGER.warning("No se pudo limpiar la caché de imágenes")
+            LOGGER.warning("No se pudo depurar la caché de imágenes")
+            # Al menos guardar el índice con las fotos descargadas en esta ejecución
+            try:
+                cache.cerrar()
+            except Exception:
+                pass
 
     return exit_code
 
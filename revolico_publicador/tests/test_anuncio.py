@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pandas as pd
+
+from utils.anuncio import Anuncio, desde_df
+from utils.csv_parser import categorizar
+from utils.progreso import CONTENT_COLUMNS
+
+
+def test_desde_df_normaliza_celdas_y_conserva_el_indice():
+    fila = {c: None for c in CONTENT_COLUMNS}
+    fila.update({"Categoria": "Compra/Venta", "Titulo": " T ", "Precio": 100.0, "Telefono": float("nan")})
+    df = categorizar(pd.DataFrame([fila, {**fila, "Titulo": ""}], index=[4, 7]))
+    anuncios = desde_df(df)
+    assert [a.fila for a in anuncios] == [4, 7]
+    assert anuncios[0] == Anuncio(4, categoria="Compra/Venta", titulo="T", precio="100")
+    assert anuncios[1].titulo is None
+    assert anuncios[0].valor("Precio") == "100"
+
+
+def test_fotos_locales_no_se_vuelven_a_separar():
+    # Regresión: una ruta con "," o ";" no debe partirse en varias fotos
+    anuncio = Anuncio(0, fotos="https://x/a.jpg; https://x/b.jpg")
+    assert anuncio.fotos_a_subir() == ["https://x/a.jpg", "https://x/b.jpg"]
+    local = anuncio.con_fotos([Path("/tmp/fotos, 2024/a.jpg"), None])
+    assert local.fotos_a_subir() == [str(Path("/tmp/fotos, 2024/a.jpg"))]
+    assert local.fotos == anuncio.fotos
+
+
+def test_sin_fotos_descargadas_no_se_sube_ninguna():
+    anuncio = Anuncio(0, fotos="https://x/a.jpg").con_fotos([None])
+    assert anuncio.fotos_a_subir() == []
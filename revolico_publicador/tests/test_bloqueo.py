@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import pytest
+
+from utils.bloqueo import FiltroRecursos
+
+
+@pytest.mark.parametrize(
+    "url, tipo, esperado",
+    [
+        ("https://www.revolico.com/img/logo.png", "image", "abort"),
+        ("https://www.revolico.com/fonts/a.woff2", "font", "abort"),
+        ("https://www.revolico.com/static/app.js", "script", None),
+        ("https://www.revolico.com/static/app.css", "stylesheet", None),
+        ("https://www.googletagmanager.com/gtm.js", "script", "stub"),
+        ("https://securepubads.g.doubleclick.net/tag.js", "script", "stub"),
+        ("https://stats.g.doubleclick.net/collect", "xhr", "stub"),
+        ("https://notdoubleclick.net/app.js", "script", None),
+        ("https://www.google.com/recaptcha/api.js", "script", None),
+        ("https://www.gstatic.com/recaptcha/releases/x/logo.png", "image", None),
+        ("data:image/png;base64,AAAA", "image", None),
+        ("blob:https://www.revolico.com/1234", "image", None),
+    ],
+)
+def test_decidir(url, tipo, esperado):
+    assert FiltroRecursos().decidir(url, tipo) == esperado
+
+
+def test_listas_configurables():
+    filtro = FiltroRecursos(tipos=("media",), dominios=("example.com",), permitidos=("example.com/ok",))
+    assert filtro.decidir("https://www.revolico.com/a.png", "image") is None
+    assert filtro.decidir("https://cdn.example.com/a.js", "script") == "stub"
+    assert filtro.decidir("https://cdn.example.com/ok/a.js", "script") is None
+
+
+def test_cuenta_bloqueadas_y_bytes_estimados():
+    filtro = FiltroRecursos()
+    filtro.decidir("https://www.revolico.com/a.png", "image")
+    filtro.decidir("https://www.revolico.com/b.png", "image")
+    filtro.decidir("https://www.googletagmanager.com/gtm.js", "script")
+    filtro.decidir("https://www.revolico.com/app.js", "script")
+    assert filtro.bloqueadas == {"image": 2, "script": 1}
+    assert filtro.bytes_estimados > 0
+    assert "Peticiones bloqueadas: 3 (image=2, script=1)" in filtro.resumen()
+    assert "estimado" in filtro.resumen()
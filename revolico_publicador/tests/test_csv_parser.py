@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import pandas as pd
+import pytest
+
+from utils import cache_hoja
+from utils.csv_parser import REQUIRED_COLUMNS, cargar_anuncios, guardar, iterar_pendientes
+from utils.progreso import ProgresoJournal, huella_fila
+
+
+def _fila(i: int, publicado: str = "N") -> dict:
+    return {
+        "Categoria": "Compra/Venta",
+        "Subcategoria": "Celulares",
+        "Fotos": None,
+        "Precio": 100 + i,
+        "Moneda": "USD",
+        "Titulo": f"T{i}",
+        "Descripcion": f"Descripción {i}",
+        "Provincia": "La Habana",
+        "Municipio": "Playa",
+        "Telefono": 52000000 + i,
+        "Email": None,
+        "Publicado": publicado,
+        "Link": None,
+    }
+
+
+def _hoja(tmp_path, filas):
+    path = tmp_path / "anuncios.xlsx"
+    guardar(pd.DataFrame(filas, columns=REQUIRED_COLUMNS), path)
+    return path
+
+
+def _pendientes(path, journal, tamano=100):
+    return [t for lote in iterar_pendientes(path, tamano=tamano, journal=journal) for t in lote["Titulo"]]
+
+
+@pytest.fixture(params=[False, True], ids=["openpyxl", "parquet"])
+def con_cache(request, monkeypatch):
+    if request.param and not cache_hoja.disponible():
+        pytest.skip("pyarrow no instalado")
+    if not request.param:
+        monkeypatch.setattr(cache_hoja, "valida", lambda _: False)
+    return request.param
+
+
+def _publicar(path, journal, *indices):
+    df = cargar_anuncios(path)
+    for idx in indices:
+        journal.registrar(idx, huella_fila(df.loc[idx]))
+
+
+def test_filas_publicadas_en_el_excel_se_omiten(tmp_path, con_cache):
+    path = _hoja(tmp_path, [_fila(0, "S"), _fila(1), _fila(2, "s")])
+    if con_cache:
+        cargar_anuncios(path)
+    assert _pendientes(path, None) == ["T1"]
+
+
+def test_lotes_respetan_tamano_e_indices(tmp_path, con_cache):
+    path = _hoja(tmp_path, [_fila(i) for i in range(5)])
+    if con_cache:
+        cargar_anuncios(path)
+    lotes = list(iterar_pendientes(path, tamano=2))
+    assert [len(l) for l in lotes] == [2, 2, 1]
+    assert list(lotes[-1].index) == [4]
+
+
+def test_borrar_fila_anterior_a_publicadas(tmp_path, con_cache):
+    # Regresión: al borrar T0, T2 y T3 (ya publicadas) suben una fila y no deben volver a la cola
+    filas = [_fila(i) for i in range(5)]
+    path = _hoja(tmp_path, filas)
+    journal = ProgresoJournal(tmp_path / "p.jsonl", fsync=False)
+    _publicar(path, journal, 0, 2, 3)
+    path = _hoja(tmp_path, filas[1:])
+    if con_cache:
+        cargar_anuncios(path)
+
+    esperado = [t for t in cargar_anuncios(path, journal=journal).query("Publicado != 'S'")["Titulo"]]
+    assert esperado == ["T1", "T4"]
+    assert _pendientes(path, journal, tamano=2) == esperado
+
+
+def test_insertar_fila_antes_de_publicadas(tmp_path, con_cache):
+    filas = [_fila(i) for i in range(4)]
+    path = _hoja(tmp_path, filas)
+    journal = ProgresoJournal(tmp_path / "p.jsonl", fsync=False)
+    _publicar(path, journal, 1, 2)
+    path = _hoja(tmp_path, [_fila(9)] + filas)
+    if con_cache:
+        cargar_anuncios(path)
+    assert _pendientes(path, journal) == ["T9", "T0", "T3"]
+
+
+def test_contenido_repetido_se_empareja_una_vez(tmp_path, con_cache):
+    # Dos filas idénticas y una sola publicación registrada: la otra sigue pendiente
+    path = _hoja(tmp_path, [_fila(0), _fila(1), _fila(1)])
+    journal = ProgresoJournal(tmp_path / "p.jsonl", fsync=False)
+    _publicar(path, journal, 2)
+    path = _hoja(tmp_path, [_fila(1), _fila(1)])
+    if con_cache:
+        cargar_anuncios(path)
+    assert _pendientes(path, journal) == ["T1"]
+
+
+def test_compactar_conserva_tipos_de_celda(tmp_path):
+    # Regresión: Telefono mixto (números y texto) no debe convertirse en texto al compactar
+    from openpyxl import load_workbook
+
+    from utils.csv_parser import compactar, marcar_publicado
+
+    filas = [_fila(0), _fila(1), _fila(2)]
+    filas[1]["Telefono"] = "5 200 0001"
+    path = _hoja(tmp_path, filas)
+    journal = ProgresoJournal(tmp_path / "p.jsonl", fsync=False)
+    for idx in (0, 2):
+        df = cargar_anuncios(path)
+        marcar_publicado(df, idx, journal=journal, link=f"https://example.com/{idx}")
+        assert compactar(path, journal) == 1
+
+    ws = load_workbook(path).worksheets[0]
+    cabecera = [c.value for c in ws[1]]
+    telefonos = [ws.cell(row=r, column=cabecera.index("Telefono") + 1).value for r in (2, 3, 4)]
+    assert telefonos == [52000000, "5 200 0001", 52000002]
+    assert [ws.cell(row=r, column=cabecera.index("Publicado") + 1).value for r in (2, 3, 4)] == ["S", "N", "S"]
+    assert ws.cell(row=4, column=cabecera.index("Link") + 1).value == "https://example.com/2"
+    assert _pendientes(path, journal) == ["T1"]
+
+
+def test_marcar_publicado_con_link_en_columna_vacia(tmp_path, con_cache):
+    from utils.csv_parser import marcar_publicado
+
+    path = _hoja(tmp_path, [_fila(0), _fila(1)])
+    if con_cache:
+        cargar_anuncios(path)
+    for df in (cargar_anuncios(path), next(iterar_pendientes(path))):
+        marcar_publicado(df, 1, link="https://example.com/1")
+        assert df.loc[1, "Link"] == "https://example.com/1"
+        assert df.loc[1, "Publicado"] == "S"
+
+
+def test_compactar_conserva_fallidas_y_no_toca_el_excel_sin_publicadas(tmp_path):
+    from utils.csv_parser import compactar, marcar_publicado
+
+    path = _hoja(tmp_path, [_fila(0), _fila(1)])
+    journal = ProgresoJournal(tmp_path / "p.jsonl", fsync=False)
+    df = cargar_anuncios(path)
+    journal.registrar(1, huella_fila(df.loc[1]), estado="fallido", motivo="sin respuesta")
+    mtime = path.stat().st_mtime_ns
+    assert compactar(path, journal) == 0
+    assert path.stat().st_mtime_ns == mtime
+
+    marcar_publicado(df, 0, journal=journal)
+    assert compactar(path, journal) == 1
+    entradas = journal.entradas()
+    assert list(entradas) == [1]
+    assert entradas[1]["estado"] == "fallido" and entradas[1]["motivo"] == "sin respuesta"
+
+
+def test_recorrido_con_openpyxl_deja_la_cache(tmp_path):
+    if not cache_hoja.disponible():
+        pytest.skip("pyarrow no instalado")
+    filas = [_fila(0, "S"), _fila(1), _fila(2)]
+    filas[2]["Telefono"] = "5 200 0002"
+    path = _hoja(tmp_path, filas)
+    huellas = [huella_fila(row) for _, row in cargar_anuncios(path).iterrows()]
+    cache_hoja.ruta_cache(path).unlink()
+
+    assert _pendientes(path, None) == ["T1", "T2"]
+    assert cache_hoja.valida(path)
+    assert _pendientes(path, None) == ["T1", "T2"]
+    assert [huella_fila(row) for _, row in cargar_anuncios(path).iterrows()] == huellas
+
+
+def test_recorrido_interrumpido_no_deja_cache(tmp_path):
+    if not cache_hoja.disponible():
+        pytest.skip("pyarrow no instalado")
+    path = _hoja(tmp_path, [_fila(i) for i in range(5)])
+    lotes = iterar_pendientes(path, tamano=2)
+    next(lotes)
+    lotes.close()
+    assert not cache_hoja.ruta_cache(path).exists()
+    assert not cache_hoja.ruta_cache(path).with_name(cache_hoja.ruta_cache(path).name + ".tmp").exists()
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import hashlib
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from bench.servidores import ConfigDrive, servidor_drive
+from utils import drive_downloader
+from utils.drive_downloader import ArchivoDemasiadoGrande, MAX_FILE_SIZE_BYTES, descargar, extraer_drive_id
+from utils.image_cache import ImageCache
+
+
+def _contenido(path: str) -> bytes:
+    return hashlib.sha256(path.encode()).digest() * 4096
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+        pass
+
+    def do_GET(self) -> None:  # noqa: N802
+        if self.path == "/grande.jpg":
+            self.send_response(200)
+            self.send_header("Content-Length", str(MAX_FILE_SIZE_BYTES + 1))
+            self.end_headers()
+            return
+        body = _contenido(self.path)
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        # Cuerpo en dos mitades para que las descargas concurrentes se solapen
+        self.wfile.write(body[: len(body) // 2])
+        self.wfile.flush()
+        time.sleep(0.01)
+        self.wfile.write(body[len(body) // 2 :])
+
+
+@pytest.fixture(scope="module")
+def servidor():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_descarga_sin_cache_usa_el_nombre_del_archivo(servidor, tmp_path):
+    path = descargar(f"{servidor}/x/foto.jpg", tmp_path)
+    assert path == tmp_path / "foto.jpg"
+    assert path.read_bytes() == _contenido("/x/foto.jpg")
+    assert [p.name for p in tmp_path.iterdir()] == ["foto.jpg"]
+
+
+def test_mismo_nombre_en_urls_distintas_no_se_mezcla_en_la_cache(servidor, tmp_path):
+    # Regresión: .../a1/photo.jpg y .../a2/photo.jpg compartían el nombre final antes de entrar en la caché
+    cache = ImageCache(tmp_path / "cache")
+    urls = [f"{servidor}/a{i}/photo.jpg" for i in range(24)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        paths = list(pool.map(lambda u: descargar(u, tmp_path / "cache", cache=cache), urls))
+    for url, path in zip(urls, paths):
+        esperado = _contenido(url[len(servidor) :])
+        assert path.read_bytes() == esperado
+        assert path.stem == hashlib.sha1(esperado).hexdigest()
+        assert path.suffix == ".jpg"
+
+
+def test_rechaza_archivos_grandes_por_content_length(servidor, tmp_path):
+    with pytest.raises(ArchivoDemasiadoGrande):
+        descargar(f"{servidor}/grande.jpg", tmp_path)
+    assert list(tmp_path.iterdir()) == []
+
+
+_ID = "1AbCdEfGhIjK"
+_URLS_DRIVE = [
+    f"https://drive.google.com/uc?id={_ID}",
+    f"https://drive.google.com/open?id={_ID}",
+    f"https://drive.google.com/file/d/{_ID}/view?usp=sharing",
+]
+
+
+@pytest.mark.parametrize("url", _URLS_DRIVE + [f"https://docs.google.com/uc?export=download&id={_ID}"])
+def test_extraer_drive_id(url):
+    assert extraer_drive_id(url) == _ID
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        f"https://example.com/redir?u=drive.google.com&id={_ID}",
+        f"https://drive.google.com.example.com/uc?id={_ID}",
+        f"https://example.com/file/d/{_ID}/view",
+        f"ftp://drive.google.com/uc?id={_ID}",
+        "https://drive.google.com/uc?id=corto",
+    ],
+)
+def test_extraer_drive_id_rechaza_otros_hosts(url):
+    assert extraer_drive_id(url) is None
+
+
+@pytest.fixture
+def drive(monkeypatch):
+    # Sustituto local de Drive de bench/: con tasa_aviso=1 siempre muestra la página de confirmación
+    cfg = ConfigDrive(tam_foto=4096, tasa_aviso=1.0)
+    server, url = servidor_drive(cfg)
+    monkeypatch.setattr(drive_downloader, "DRIVE_DOWNLOAD_URL", f"{url}/uc")
+    yield cfg
+    server.shutdown()
+
+
+@pytest.mark.parametrize("url", _URLS_DRIVE)
+def test_descarga_de_drive_supera_la_confirmacion(drive, tmp_path, url):
+    path = descargar(url, tmp_path)
+    assert path == tmp_path / f"{_ID}.jpg"
+    assert path.read_bytes() == random.Random(_ID).randbytes(drive.tam_foto)
+    assert len(drive.stats.tiempos["drive_aviso"]) == 1
+    assert len(drive.stats.tiempos["drive_descarga"]) == 1
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import json
+import time
+
+import pandas as pd
+
+from utils.duplicados import IndiceDuplicados, huellas, sha1_foto
+from utils.progreso import CONTENT_COLUMNS
+
+_SHA1 = "0123456789abcdef0123456789abcdef01234567"
+
+
+def _df(*filas: dict) -> pd.DataFrame:
+    base = {c: None for c in CONTENT_COLUMNS}
+    base.update({"Titulo": "Teléfono", "Descripcion": "Casi nuevo", "Precio": "100", "Telefono": "52000000"})
+    return pd.DataFrame([{**base, **f} for f in filas])
+
+
+def test_huella_ignora_tildes_mayusculas_y_espacios():
+    claves = huellas(_df({}, {"Titulo": "  TELEFONO "}, {"Titulo": "Telefono", "Precio": "90"}))
+    assert claves[0] == claves[1]
+    assert claves[0] != claves[2]
+
+
+def test_huella_distingue_la_foto():
+    df = _df({}, {})
+    claves = huellas(df, pd.Series(["a" * 40, "b" * 40], index=df.index))
+    assert claves[0] != claves[1]
+
+
+def test_sha1_foto_usa_el_nombre_de_la_cache(tmp_path):
+    variante = tmp_path / f"{_SHA1}.800q85.jpg"
+    assert sha1_foto(variante) == _SHA1  # no se lee el archivo (ni existe)
+    otra = tmp_path / "foto.jpg"
+    otra.write_bytes(b"x")
+    assert sha1_foto(otra) == "11f6ad8ec52a2984abaafd7c3b516503785c2072"
+    assert sha1_foto(tmp_path / "no_existe.jpg") == ""
+    assert sha1_foto(None) == ""
+
+
+def test_indice_persiste_y_descarta_lo_caducado(tmp_path):
+    path = tmp_path / "publicados.jsonl"
+    with path.open("w", encoding="utf-8") as f:
+        f.write(json.dumps({"huella": "vieja", "ts": time.time() - 40 * 24 * 3600}) + "\n")
+    indice = IndiceDuplicados(path, ventana_dias=30)
+    indice.registrar("nueva", fila=3)
+    assert indice.contiene("nueva")
+    assert not indice.contiene("vieja")
+    assert set(indice.filtrar(["nueva", "vieja", "otra"])) == {"nueva"}
+    indice.cerrar()
+
+    assert [json.loads(line)["huella"] for line in path.read_text(encoding="utf-8").splitlines()] == ["nueva"]
+    indice = IndiceDuplicados(path, ventana_dias=30)
+    assert indice.buscar("nueva")["fila"] == 3
+    indice.cerrar()
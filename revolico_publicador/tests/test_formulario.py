@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import pytest
+
+from utils.anuncio import Anuncio
+from utils.formulario import CAMPOS_SELECTORES, CaptchaDetected, PublicadorBase, PublicadorConfig, plan_relleno
+
+_LAYOUT = {"Categoria": "select", "Titulo": "input", "Descripcion": "textarea", "Telefono": "input"}
+
+
+def test_plan_relleno_separa_selects_y_texto_en_un_lote():
+    anuncio = Anuncio(0, categoria="Compra/Venta", titulo="T", descripcion="D", email="a@b.cu")
+    selects, lotes = plan_relleno(PublicadorConfig(), _LAYOUT, anuncio)
+    assert selects == [(CAMPOS_SELECTORES["Categoria"], "Compra/Venta")]
+    # Email no está en el layout y Telefono está vacío: no se rellenan
+    assert lotes == [{"Titulo": [CAMPOS_SELECTORES["Titulo"], "T"], "Descripcion": [CAMPOS_SELECTORES["Descripcion"], "D"]}]
+
+
+def test_plan_relleno_con_pausa_un_lote_por_campo():
+    anuncio = Anuncio(0, titulo="T", descripcion="D")
+    _, lotes = plan_relleno(PublicadorConfig(pausa_campo_max=1.0), _LAYOUT, anuncio)
+    assert [list(lote) for lote in lotes] == [["Titulo"], ["Descripcion"]]
+
+
+def test_registrar_resultado():
+    base = PublicadorBase()
+    assert base._registrar_resultado({"estado": "exito", "link": "https://revolico.com/item/1"})
+    assert base.ultimo_link == "https://revolico.com/item/1"
+    assert not base._registrar_resultado({"estado": "error"})
+    assert not base._registrar_resultado(None)
+    with pytest.raises(CaptchaDetected):
+        base._registrar_resultado({"estado": "captcha"})
+
+
+def test_layout_se_invalida_al_cambiar_de_url():
+    base = PublicadorBase()
+    base._guardar_layout("https://x/publicar", _LAYOUT)
+    assert base._layout_vigente("https://x/publicar") == _LAYOUT
+    assert base._layout_vigente("https://x/otra") is None
+
+
+def test_sin_filtro_con_perfil_persistente():
+    assert PublicadorBase().filtro is not None
+    assert PublicadorBase(perfil_dir="perfil").filtro is None
+    assert PublicadorBase(bloquear_recursos=False).filtro is None
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+
+from utils.image_cache import INDEX_FILENAME, ImageCache
+
+
+def _guardar(cache: ImageCache, tmp_path, nombre: str, tamano: int = 100):
+    path = tmp_path / f"{nombre}.jpg"
+    contenido = nombre.encode() * tamano
+    path.write_bytes(contenido[:tamano])
+    sha1 = hashlib.sha1(contenido[:tamano]).hexdigest()
+    return sha1, cache.guardar(f"https://example.com/{nombre}.jpg", path, sha1)
+
+
+def _indice(cache: ImageCache) -> dict:
+    return json.loads((cache.directorio / INDEX_FILENAME).read_text(encoding="utf-8"))
+
+
+def test_desalojar_expulsa_los_menos_usados_por_tamano(tmp_path):
+    cache = ImageCache(tmp_path / "cache", max_bytes=250, revalidate_seconds=None)
+    rutas = {n: _guardar(cache, tmp_path, n)[1] for n in ("a", "b", "c")}
+    # "a" se usa después que "b": la víctima es "b"
+    time.sleep(0.01)
+    assert cache.obtener("https://example.com/a.jpg") == rutas["a"]
+
+    assert cache.desalojar() == 1
+    assert not rutas["b"].exists()
+    assert rutas["a"].exists() and rutas["c"].exists()
+    assert cache.obtener("https://example.com/b.jpg") is None
+    assert "https://example.com/b.jpg" not in _indice(cache)["claves"]
+
+
+def test_desalojar_expulsa_por_antiguedad(tmp_path):
+    cache = ImageCache(tmp_path / "cache", max_age_seconds=60)
+    sha1_viejo, viejo = _guardar(cache, tmp_path, "viejo")
+    _, nuevo = _guardar(cache, tmp_path, "nuevo")
+    cache._blobs[sha1_viejo].creado -= 120
+    # La variante procesada de la foto se va con ella
+    variante = viejo.with_name(f"{sha1_viejo}.800q85{viejo.suffix}")
+    variante.write_bytes(b"x")
+
+    assert cache.obtener("https://example.com/viejo.jpg") is None
+    assert cache.desalojar() == 2
+    assert not viejo.exists() and not variante.exists()
+    assert nuevo.exists()
+
+
+def test_desalojar_limpia_huerfanos(tmp_path):
+    cache = ImageCache(tmp_path / "cache")
+    _, foto = _guardar(cache, tmp_path, "foto")
+    huerfano = cache.directorio / ("0" * 40 + ".jpg")
+    huerfano.write_bytes(b"x")
+    parcial = cache.directorio / "descarga.part"
+    parcial.write_bytes(b"x")
+
+    assert cache.desalojar() == 2
+    assert sorted(p.name for p in cache.directorio.iterdir()) == sorted([foto.name, INDEX_FILENAME])
+
+
+def test_indice_se_escribe_por_tandas_y_al_cerrar(tmp_path):
+    cache = ImageCache(tmp_path / "cache", persistir_cada=3)
+    _guardar(cache, tmp_path, "a")
+    _guardar(cache, tmp_path, "b")
+    assert not (cache.directorio / INDEX_FILENAME).exists()
+    _guardar(cache, tmp_path, "c")
+    assert len(_indice(cache)["claves"]) == 3
+
+    _guardar(cache, tmp_path, "d")
+    assert len(_indice(cache)["claves"]) == 3
+    cache.cerrar()
+    assert len(_indice(cache)["claves"]) == 4
+    assert ImageCache(tmp_path / "cache").obtener("https://example.com/d.jpg") is not None
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import json
+import logging
+
+from utils.logs import EVENTO_PUBLICADO, configurar_logging, detener_logging, volcar_logs
+
+
+def test_archivos_por_nivel_y_evento(tmp_path):
+    logger = logging.getLogger("test_logs.archivos")
+    logger.setLevel(logging.INFO)
+    errores, publicados, eventos = tmp_path / "errores.log", tmp_path / "published.log", tmp_path / "eventos.jsonl"
+    listener = configurar_logging(logger, errores, publicados, json_path=eventos)
+    try:
+        logger.info("Lote 1")
+        logger.info("Publicado: T1", extra={"evento": EVENTO_PUBLICADO, "fila": 3, "titulo": "T1"})
+        logger.warning("Fallo al descargar imagen")
+    finally:
+        detener_logging(listener)
+
+    assert "Fallo al descargar imagen" in errores.read_text(encoding="utf-8")
+    assert "Publicado: T1" not in errores.read_text(encoding="utf-8")
+    (linea,) = publicados.read_text(encoding="utf-8").splitlines()
+    assert linea.endswith("Publicado: T1")
+    registros = [json.loads(line) for line in eventos.read_text(encoding="utf-8").splitlines()]
+    assert [r["mensaje"] for r in registros] == ["Lote 1", "Publicado: T1", "Fallo al descargar imagen"]
+    assert registros[1]["evento"] == EVENTO_PUBLICADO and registros[1]["fila"] == 3
+    assert "fila" not in registros[0]
+
+
+def test_buffer_se_vuelca_al_pedirlo_o_ante_un_error(tmp_path):
+    logger = logging.getLogger("test_logs.buffer")
+    logger.setLevel(logging.INFO)
+    errores, publicados = tmp_path / "errores.log", tmp_path / "published.log"
+    listener = configurar_logging(logger, errores, publicados, buffer=100)
+    try:
+        logger.info("Publicado: T1", extra={"evento": EVENTO_PUBLICADO})
+        logger.error("Error publicando")
+        listener.stop()
+        # El ERROR vacía su búfer enseguida; el de publicados espera a volcar_logs
+        assert "Error publicando" in errores.read_text(encoding="utf-8")
+        assert not publicados.exists() or publicados.read_text(encoding="utf-8") == ""
+        volcar_logs(listener)
+        assert "Publicado: T1" in publicados.read_text(encoding="utf-8")
+        listener.start()
+    finally:
+        detener_logging(listener)
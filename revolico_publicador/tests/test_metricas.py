@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+from utils.metricas import Metricas, percentiles
+
+
+def test_percentiles_nearest_rank():
+    assert percentiles([]) == {"n": 0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+    p = percentiles([float(i) for i in range(1, 101)])
+    assert (p["n"], p["p50"], p["p95"], p["max"]) == (100, 50.0, 95.0, 100.0)
+
+
+def test_registro_por_anuncio_y_exportacion(tmp_path):
+    metricas = Metricas()
+    metricas.configurar(jsonl=tmp_path / "m.jsonl", prometheus=tmp_path / "m.prom")
+    with metricas.anuncio(7, "T") as registro:
+        metricas.registrar("goto", 0.5)
+        metricas.registrar("goto", 0.25)
+        metricas.contar("cache_hit")
+        metricas.contar("global", por_anuncio=False)
+        registro["estado"] = "publicado"
+    metricas.registrar("guardar", 1.0)  # fuera de un anuncio: solo en los totales
+    assert "goto" in metricas.resumen_lote()
+    assert metricas.resumen_lote() == "Sin mediciones en el lote"
+    metricas.cerrar()
+
+    (linea,) = (tmp_path / "m.jsonl").read_text(encoding="utf-8").splitlines()
+    registro = json.loads(linea)
+    assert registro["fila"] == 7 and registro["estado"] == "publicado"
+    assert registro["etapas"] == {"goto": 0.75}
+    assert registro["contadores"] == {"cache_hit": 1}
+    prom = (tmp_path / "m.prom").read_text(encoding="utf-8")
+    assert 'revolico_etapa_segundos_count{etapa="goto"} 2' in prom
+    assert 'revolico_eventos_total{evento="anuncios_publicado"} 1' in prom
+    assert 'revolico_eventos_total{evento="global"} 1' in prom
+
+
+def test_tareas_asyncio_no_mezclan_sus_registros():
+    metricas = Metricas()
+    registros = []
+
+    async def publicar(idx: int) -> None:
+        with metricas.anuncio(idx) as registro:
+            await asyncio.sleep(0.01 * (2 - idx))
+            metricas.registrar("envio", float(idx + 1))
+            registros.append(registro)
+
+    async def principal() -> None:
+        await asyncio.gather(publicar(0), publicar(1))
+
+    asyncio.run(principal())
+    assert {r["fila"]: r["etapas"] for r in registros} == {0: {"envio": 1.0}, 1: {"envio": 2.0}}
+
+
+def test_desactivada_no_mide():
+    metricas = Metricas()
+    metricas.activo = False
+    metricas.registrar("goto", 1.0)
+    metricas.contar("x")
+    assert metricas.resumen_lote() == "Sin mediciones en el lote"
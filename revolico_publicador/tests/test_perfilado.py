@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import cProfile
+import threading
+
+from utils import perfilado
+from utils.perfilado import Perfilador
+
+
+def _en_hilo(fn):
+    salida = []
+    hilo = threading.Thread(target=lambda: salida.append(fn(2)))
+    hilo.start()
+    hilo.join()
+    return salida
+
+
+def test_envolver_perfila_hilos_de_trabajo(tmp_path):
+    perfil = Perfilador()
+    perfil.configurar(tmp_path, cpu=True)
+    perfil.iniciar()
+    try:
+        doble = perfil.envolver(lambda x: x * 2)
+        assert _en_hilo(doble) == [4]
+        assert doble(3) == 6  # en el hilo principal no se crea un segundo perfil
+    finally:
+        resumen = perfil.detener()
+    assert "Hilos de trabajo (descargas, preprocesado, escrituras): 2 llamadas" in resumen
+    assert (tmp_path / perfil.ruta_prof.name).exists()
+
+
+def test_envolver_sin_segundo_perfilador(tmp_path, monkeypatch):
+    # Python 3.12+: un segundo cProfile activo lanza ValueError; la función debe ejecutarse igual
+    class Ocupado(cProfile.Profile):
+        def enable(self, *args, **kwargs):
+            raise ValueError("Another profiling tool is already active")
+
+    perfil = Perfilador()
+    perfil.configurar(tmp_path, cpu=True)
+    perfil.iniciar()
+    try:
+        monkeypatch.setattr(perfilado.cProfile, "Profile", Ocupado)
+        doble = perfil.envolver(lambda x: x * 2)
+        assert _en_hilo(doble) == [4]
+        assert _en_hilo(doble) == [4]
+    finally:
+        monkeypatch.undo()
+        resumen = perfil.detener()
+    assert "2 llamadas" in resumen
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import threading
+from collections import Counter
+from pathlib import Path
+
+from utils.prefetch import ImagePrefetcher, unir_descargas_async
+
+_DRIVE = "https://drive.google.com/uc?id=1AbCdEfGhIjK"
+
+
+def test_filas_con_la_misma_foto_comparten_descarga():
+    llamadas: Counter = Counter()
+    liberar = threading.Event()
+
+    def descargar(url: str) -> Path:
+        llamadas[url] += 1
+        liberar.wait(5)
+        return Path(url.rsplit("/", 1)[-1])
+
+    filas = [
+        (0, [_DRIVE, "https://x/a.jpg"]),
+        (1, ["https://drive.google.com/open?id=1AbCdEfGhIjK"]),  # misma clave de caché que _DRIVE
+        (2, ["https://x/a.jpg"]),
+    ]
+    prefetcher = ImagePrefetcher(descargar, workers=4, profundidad=3)
+    try:
+        it = prefetcher.iterar(filas)
+        threading.Timer(0.2, liberar.set).start()
+        resultados = {item: [r.path for r in res] for item, res in it}
+    finally:
+        prefetcher.cerrar()
+    assert sum(llamadas.values()) == 2
+    assert resultados[1] == resultados[0][:1]
+    assert resultados[2] == resultados[0][1:]
+
+
+def test_unir_descargas_async():
+    llamadas: Counter = Counter()
+
+    async def descargar(url: str) -> Path:
+        llamadas[url] += 1
+        await asyncio.sleep(0.05)
+        return Path(url)
+
+    async def principal() -> list:
+        obtener = unir_descargas_async(descargar)
+        a = asyncio.gather(obtener(_DRIVE), obtener("https://x/a.jpg"))
+        b = asyncio.gather(obtener("https://drive.google.com/open?id=1AbCdEfGhIjK"))
+        b.cancel()  # cancelar un anuncio no cancela la descarga que comparte con otro
+        with contextlib.suppress(asyncio.CancelledError):
+            await b
+        return await a
+
+    assert asyncio.run(principal()) == [Path(_DRIVE), Path("https://x/a.jpg")]
+    assert sum(llamadas.values()) == 2
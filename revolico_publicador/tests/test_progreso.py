@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from utils.progreso import ProgresoJournal, huella_fila, resolver_publicadas
+
+
+def test_huella_ignora_tipo_y_espacios_de_celda():
+    assert huella_fila({"Titulo": " T1 ", "Precio": 100.0}) == huella_fila({"Titulo": "T1", "Precio": "100"})
+    assert huella_fila({"Titulo": None}) == huella_fila({"Titulo": float("nan")})
+    assert huella_fila({"Titulo": "T1"}) != huella_fila({"Titulo": "T2"})
+
+
+def test_journal_ultima_entrada_por_fila_y_linea_truncada(tmp_path):
+    journal = ProgresoJournal(tmp_path / "p.jsonl", fsync=False)
+    journal.registrar(0, "h0", estado="fallido", motivo="timeout")
+    journal.registrar(0, "h0", link="https://example.com/0")
+    journal.registrar(1, "h1", estado="fallido", motivo="timeout")
+    journal.cerrar()
+    with (tmp_path / "p.jsonl").open("a", encoding="utf-8") as f:
+        f.write('{"fila": 2, "huel')  # cierre abrupto a mitad de línea
+
+    journal = ProgresoJournal(tmp_path / "p.jsonl", fsync=False)
+    assert set(journal.entradas()) == {0, 1}
+    assert list(journal.publicadas()) == [0]
+    assert journal.publicadas()[0]["link"] == "https://example.com/0"
+    journal.cerrar()
+
+
+def test_vaciar_conserva_entradas_indicadas(tmp_path):
+    journal = ProgresoJournal(tmp_path / "p.jsonl", fsync=False)
+    journal.registrar(0, "h0")
+    journal.registrar(1, "h1", estado="fallido", motivo="timeout")
+    fallidas = [e for e in journal.entradas().values() if e["estado"] == "fallido"]
+    journal.vaciar(conservar=fallidas)
+    assert journal.entradas() == {1: fallidas[0]}
+    journal.registrar(2, "h2")
+    assert set(journal.entradas()) == {1, 2}
+    journal.vaciar()
+    assert journal.vacio()
+    assert not (tmp_path / "p.jsonl.tmp").exists()
+    journal.cerrar()
+
+
+def test_vaciar_interrumpido_conserva_el_diario(tmp_path, monkeypatch):
+    journal = ProgresoJournal(tmp_path / "p.jsonl", fsync=False)
+    journal.registrar(0, "h0")
+    journal.registrar(1, "h1", estado="fallido", motivo="timeout")
+
+    def fallo(*_):
+        raise OSError("disco lleno")
+
+    monkeypatch.setattr(os, "replace", fallo)
+    with pytest.raises(OSError):
+        journal.vaciar(conservar=[])
+    monkeypatch.undo()
+    # El diario sigue intacto y abierto para añadir
+    journal.registrar(2, "h2")
+    assert set(journal.entradas()) == {0, 1, 2}
+    journal.cerrar()
+
+
+def test_resolver_publicadas_por_indice_y_por_contenido():
+    entradas = {0: {"huella": "a"}, 1: {"huella": "b"}, 2: {"huella": "c"}}
+    # Se borró la fila 0: "b" y "c" subieron una posición y entró una fila nueva "d"
+    resultado = resolver_publicadas(entradas, [(0, "b"), (1, "c"), (2, "d")])
+    assert resultado == {0: {"huella": "b"}, 1: {"huella": "c"}}
+
+
+def test_resolver_publicadas_contenido_repetido_una_vez_por_entrada():
+    entradas = {3: {"huella": "x"}}
+    resultado = resolver_publicadas(entradas, [(0, "x"), (1, "x")])
+    assert list(resultado) == [0]
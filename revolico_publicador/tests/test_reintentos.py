@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import pytest
+
+from utils.reintentos import (
+    INCIERTO,
+    PERMANENTE,
+    TRANSITORIO,
+    ColaReintentos,
+    EnvioIncierto,
+    ErrorPermanente,
+    clasificar,
+)
+
+
+class _Reloj:
+    def __init__(self) -> None:
+        self.t = 0.0
+
+    def __call__(self) -> float:
+        return self.t
+
+
+def test_clasificar():
+    assert clasificar(TimeoutError("selector")) == TRANSITORIO
+    assert clasificar(ErrorPermanente("rechazado")) == PERMANENTE
+    assert clasificar(EnvioIncierto("sin confirmación")) == INCIERTO
+
+
+def test_espera_exponencial_con_tope_y_maximo_de_intentos():
+    cola: ColaReintentos[str] = ColaReintentos(max_intentos=4, base=10, maximo=25, reloj=_Reloj())
+    assert [cola.programar("a", "a") for _ in range(4)] == [10, 20, 25, None]
+    assert cola.intentos("a") == 4
+
+
+def test_listos_solo_devuelve_vencidos_en_orden():
+    reloj = _Reloj()
+    cola: ColaReintentos[str] = ColaReintentos(max_intentos=5, base=10, maximo=100, reloj=reloj)
+    cola.programar("a", "a1")
+    cola.programar("a", "a2")  # segundo fallo: vence a los 20s
+    cola.programar("b", "b1")
+    cola.programar("c", "c1")
+    assert cola.listos() == []
+    assert cola.proximo() == 10
+    reloj.t = 10
+    assert cola.listos() == ["a1", "b1", "c1"]
+    assert cola.proximo() == 10
+    reloj.t = 30
+    assert cola.listos() == ["a2"]
+    assert len(cola) == 0 and cola.proximo() is None
+
+
+def test_parametros_invalidos():
+    with pytest.raises(ValueError):
+        ColaReintentos(max_intentos=0)
+    with pytest.raises(ValueError):
+        ColaReintentos(base=10, maximo=5)
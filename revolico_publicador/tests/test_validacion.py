@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import pandas as pd
+
+from utils.progreso import CONTENT_COLUMNS
+from utils.validacion import escribir_rechazos, pendientes, validar
+
+
+def _df(*filas: dict) -> pd.DataFrame:
+    base = {
+        "Categoria": "Compra/Venta",
+        "Subcategoria": "Celulares",
+        "Fotos": None,
+        "Precio": "100",
+        "Moneda": "USD",
+        "Titulo": "Teléfono",
+        "Descripcion": "Casi nuevo",
+        "Provincia": "La Habana",
+        "Municipio": "Playa",
+        "Telefono": "52000000",
+        "Email": None,
+    }
+    return pd.DataFrame([{**base, **f} for f in filas], columns=CONTENT_COLUMNS)
+
+
+def test_normaliza_valores_validos():
+    df = _df(
+        {
+            "Precio": "1,500",
+            "Moneda": "dólares",
+            "Provincia": "la habana",
+            "Municipio": "habana vieja",
+            "Telefono": "+53 5200 0000",
+        }
+    )
+    resultado = validar(df)
+    assert resultado.rechazos.empty
+    fila = resultado.anuncios.iloc[0]
+    assert (fila["Precio"], fila["Moneda"], fila["Telefono"]) == ("1500", "USD", "52000000")
+    assert (fila["Provincia"], fila["Municipio"]) == ("La Habana", "La Habana Vieja")
+    assert fila["Email"] is None and fila["Fotos"] is None
+
+
+def test_precio_con_coma_solo_como_separador_de_miles():
+    df = _df(*({"Precio": p} for p in ["1,250,000.50", "$ 2,000", "99.5", "12,5", "1,50", "1,5000", ",500", "1.500,00"]))
+    resultado = validar(df)
+    assert list(resultado.anuncios["Precio"]) == ["1250000.5", "2000", "99.5"]
+    assert set(resultado.rechazos["motivos"]) == {"Precio no numérico"}
+    assert len(resultado.rechazos) == 5
+
+
+def test_telefonos_fijos_y_moviles():
+    df = _df({"Telefono": "72001234"}, {"Telefono": "53 5 2000000"}, {"Telefono": "7200123"})
+    resultado = validar(df)
+    assert list(resultado.anuncios["Telefono"]) == ["72001234", "52000000"]
+    assert list(resultado.rechazos["motivos"]) == ["Telefono inválido"]
+
+
+def test_rechazos_con_fila_del_excel_y_motivos():
+    df = _df(
+        {},
+        {"Titulo": None},
+        {"Precio": "barato", "Moneda": "BTC"},
+        {"Telefono": "123", "Email": "no-es-email"},
+        {"Telefono": None, "Email": None},
+        {"Titulo": "x" * 101},
+        {"Provincia": "Atlantis"},
+        {"Municipio": "Viñales"},
+    )
+    resultado = validar(df)
+    assert list(resultado.anuncios.index) == [0]
+    motivos = dict(zip(resultado.rechazos["fila"], resultado.rechazos["motivos"]))
+    assert motivos == {
+        3: "Titulo vacío",
+        4: "Precio no numérico; Moneda no reconocida",
+        5: "Telefono inválido; Email inválido",
+        6: "Sin Telefono ni Email",
+        7: "Titulo supera 100 caracteres",
+        8: "Provincia desconocida",
+        9: "Municipio no pertenece a la Provincia",
+    }
+
+
+def test_pendientes_y_informe_de_rechazos(tmp_path):
+    df = pd.DataFrame({"Publicado": ["S", " s ", "N", None], "Titulo": list("abcd")})
+    assert list(pendientes(df)["Titulo"]) == ["c", "d"]
+
+    informe = tmp_path / "rechazos.csv"
+    rechazos = validar(_df({"Titulo": None})).rechazos
+    escribir_rechazos(rechazos, informe)
+    escribir_rechazos(rechazos, informe)
+    assert informe.read_text(encoding="utf-8").splitlines()[0] == "fila,Titulo,motivos"
+    assert len(pd.read_csv(informe)) == 2
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from utils.progreso import CONTENT_COLUMNS, _texto_celda
+
+# Separadores admitidos entre las URLs de la columna Fotos: salto de línea, ";", "|" o ","
+_SEPARADOR_FOTOS = re.compile(r"\s*[\n;|,]\s*")
+
+
+def separar_fotos(valor: Optional[str]) -> List[str]:
+    """Lista de fotos (URLs o rutas) de una celda ``Fotos``, en su orden y sin vacíos."""
+    if not valor:
+        return []
+    return [f for f in _SEPARADOR_FOTOS.split(valor.strip()) if f]
+
+
+@dataclass(frozen=True, slots=True)
+class Anuncio:
+    """Un anuncio listo para el formulario.
+
+    Cada campo es una columna de contenido del Excel en minúsculas (``Titulo`` ->
+    ``titulo``), en el mismo orden que ``CONTENT_COLUMNS``; los vacíos son None.
+    ``fila`` es el índice de la fila en la hoja. ``fotos`` puede contener varias
+    URLs (ver ``separar_fotos``); ``fotos_locales`` son las rutas ya descargadas
+    (None mientras no se hayan resuelto).
+    """
+
+    fila: int
+    categoria: Optional[str] = None
+    subcategoria: Optional[str] = None
+    fotos: Optional[str] = None
+    precio: Optional[str] = None
+    moneda: Optional[str] = None
+    titulo: Optional[str] = None
+    descripcion: Optional[str] = None
+    provincia: Optional[str] = None
+    municipio: Optional[str] = None
+    telefono: Optional[str] = None
+    email: Optional[str] = None
+    fotos_locales: Optional[Tuple[str, ...]] = None
+
+    def valor(self, columna: str) -> Optional[str]:
+        """Valor por nombre de columna del Excel (``"Titulo"``, ``"Fotos"``...)."""
+        return getattr(self, columna.lower())
+
+    def lista_fotos(self) -> List[str]:
+        """Fotos del anuncio (URLs o rutas locales) en el orden de la celda."""
+        return separar_fotos(self.fotos)
+
+    def fotos_a_subir(self) -> List[str]:
+        """Rutas locales si las fotos ya se descargaron; si no, las de la celda."""
+        if self.fotos_locales is not None:
+            return list(self.fotos_locales)
+        return self.lista_fotos()
+
+    def con_fotos(self, paths: Iterable[str | Path | None]) -> Anuncio:
+        """Copia con ``fotos_locales`` apuntando a las imágenes descargadas, en orden.
+
+        Las que no se pudieron descargar (None) se omiten; ``fotos`` conserva la celda.
+        """
+        return replace(self, fotos_locales=tuple(str(p) for p in paths if p is not None))
+
+
+def desde_df(df: pd.DataFrame) -> List[Anuncio]:
+    """Construye los anuncios a partir de las columnas del DataFrame, sin ``iterrows``.
+
+    Cada columna se convierte a lista de una vez; las celdas se normalizan como
+    en ``huella_fila`` (NaN/"" -> None, 123.0 -> "123").
+    """
+    columnas = [[_texto_celda(v) or None for v in df[col].tolist()] for col in CONTENT_COLUMNS]
+    return [Anuncio(int(idx), *valores) for idx, *valores in zip(df.index, *columnas)]
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Sequence
+from urllib.parse import urlsplit
+
+from utils.metricas import METRICAS
+
+TIPOS_BLOQUEADOS = ("image", "font", "media")
+DOMINIOS_BLOQUEADOS = (
+    "doubleclick.net",
+    "googlesyndication.com",
+    "googleadservices.com",
+    "adservice.google.com",
+    "google-analytics.com",
+    "googletagmanager.com",
+    "facebook.net",
+    "connect.facebook.com",
+    "hotjar.com",
+    "scorecardresearch.com",
+    "taboola.com",
+    "outbrain.com",
+    "criteo.com",
+    "criteo.net",
+    "adnxs.com",
+    "amazon-adsystem.com",
+)
+# Nunca se bloquean (el captcha debe poder cargarse y resolverse)
+PERMITIDOS = ("google.com/recaptcha", "gstatic.com/recaptcha", "recaptcha.net")
+
+# Tipos que se sustituyen por una respuesta vacía en lugar de abortarse: así los
+# scripts de la página que dependen de ellos no fallan ni quedan esperando.
+_TIPOS_STUB: Dict[str, str] = {
+    "script": "application/javascript",
+    "stylesheet": "text/css",
+    "xhr": "application/json",
+    "fetch": "application/json",
+}
+# Tamaño medio supuesto por tipo. El ahorro es solo una estimación: una petición
+# abortada no llega a devolver cabeceras, así que no hay Content-Length que medir
+_BYTES_ESTIMADOS: Dict[str, int] = {
+    "image": 60_000,
+    "media": 500_000,
+    "font": 40_000,
+    "script": 50_000,
+    "stylesheet": 20_000,
+}
+_BYTES_ESTIMADOS_OTROS = 5_000
+
+
+@dataclass
+class FiltroRecursos:
+    """Decide qué peticiones del formulario se bloquean y lleva la cuenta por ejecución.
+
+    Una petición se bloquea si su tipo está en ``tipos`` o su host coincide con
+    ``dominios``, salvo que la URL contenga algún patrón de ``permitidos``.
+    ``bytes_estimados`` suma el tamaño medio supuesto de cada tipo bloqueado.
+    """
+
+    tipos: Sequence[str] = TIPOS_BLOQUEADOS
+    dominios: Sequence[str] = DOMINIOS_BLOQUEADOS
+    permitidos: Sequence[str] = PERMITIDOS
+    bloqueadas: Counter = field(default_factory=Counter)
+    bytes_estimados: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def _dominio_bloqueado(self, url: str) -> bool:
+        host = (urlsplit(url).hostname or "").lower()
+        return any(host == d or host.endswith("." + d) for d in self.dominios)
+
+    def decidir(self, url: str, tipo: str) -> Optional[str]:
+        """Devuelve None (dejar pasar), "stub" (respuesta vacía) o "abort"."""
+        if url.startswith(("data:", "blob:")) or any(p in url for p in self.permitidos):
+            return None
+        if tipo not in self.tipos and not self._dominio_bloqueado(url):
+            return None
+        estimados = _BYTES_ESTIMADOS.get(tipo, _BYTES_ESTIMADOS_OTROS)
+        with self._lock:
+            self.bloqueadas[tipo] += 1
+            self.bytes_estimados += estimados
+        METRICAS.contar("recursos_bloqueados", por_anuncio=False)
+        METRICAS.contar("bytes_ahorrados_estimados", estimados, por_anuncio=False)
+        return "stub" if tipo in _TIPOS_STUB else "abort"
+
+    @staticmethod
+    def content_type(tipo: str) -> str:
+        return _TIPOS_STUB.get(tipo, "text/plain")
+
+    def resumen(self) -> str:
+        total = sum(self.bloqueadas.values())
+        detalle = ", ".join(f"{t}={n}" for t, n in self.bloqueadas.most_common())
+        return (
+            f"Peticiones bloqueadas: {total} ({detalle or 'ninguna'}); "
+            f"ahorro estimado (tamaño medio por tipo, no medido): {self.bytes_estimados / (1024 * 1024):.1f} MB"
+        )
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from utils.drive_downloader import sha1_of_file
+
+# Optional pyarrow import. Without it every launch parses the xlsx with openpyxl
+try:  # pragma: no cover - best effort
+    import pyarrow as pa  # type: ignore
+    import pyarrow.parquet as pq  # type: ignore
+except Exception:  # pragma: no cover
+    pa = None
+    pq = None
+
+# Clave de la caché dentro de los metadatos del esquema Parquet
+_META_CLAVE = b"revolico_hoja"
+# Índice de fila original (el mismo que en cargar_anuncios)
+COLUMNA_FILA = "_fila"
+FILAS_POR_GRUPO = 10_000
+
+
+def disponible() -> bool:
+    return pq is not None
+
+
+def ruta_cache(excel_path: str | Path) -> Path:
+    """Ruta de la caché Parquet asociada a un Excel (junto al archivo)."""
+    p = Path(excel_path)
+    return p.with_name(p.name + ".cache.parquet")
+
+
+def _clave(excel_path: Path, sha1: Optional[str] = None) -> Dict[str, object]:
+    st = excel_path.stat()
+    return {
+        "ruta": str(excel_path.resolve()),
+        "mtime_ns": st.st_mtime_ns,
+        "tamano": st.st_size,
+        "sha1": sha1 or sha1_of_file(excel_path),
+    }
+
+
+def _clave_guardada(cache: Path) -> Optional[Dict[str, object]]:
+    try:
+        meta = pq.read_schema(cache).metadata or {}
+        return json.loads(meta[_META_CLAVE])
+    except Exception:
+        return None
+
+
+def valida(excel_path: str | Path) -> bool:
+    """Indica si la caché corresponde al Excel actual.
+
+    Si ruta, mtime y tamaño coinciden no se lee el Excel. Si solo cambió el
+    mtime (copia, ``touch``), se compara el SHA-1 del archivo.
+    """
+    excel_path = Path(excel_path)
+    cache = ruta_cache(excel_path)
+    if not disponible() or not cache.exists() or not excel_path.exists():
+        return False
+    guardada = _clave_guardada(cache)
+    if guardada is None:
+        return False
+    st = excel_path.stat()
+    if guardada.get("tamano") != st.st_size:
+        return False
+    if guardada.get("ruta") == str(excel_path.resolve()) and guardada.get("mtime_ns") == st.st_mtime_ns:
+        return True
+    return guardada.get("sha1") == sha1_of_file(excel_path)
+
+
+def _tabla(df: pd.DataFrame) -> "pa.Table":
+    datos = df.reset_index(drop=True)
+    for col in datos.columns:
+        if isinstance(datos[col].dtype, pd.CategoricalDtype):
+            datos[col] = datos[col].astype(object)
+        if datos[col].dtype != object:
+            continue
+        tipos = {type(v) for v in datos[col].dropna()}
+        if len(tipos) > 1:
+            # Arrow no admite columnas mixtas (p. ej. teléfonos numéricos y de texto)
+            datos[col] = datos[col].map(lambda v: None if pd.isna(v) else str(v))
+    datos.insert(0, COLUMNA_FILA, df.index.to_numpy())
+    return pa.Table.from_pandas(datos, preserve_index=False)
+
+
+def escribir(df: pd.DataFrame, excel_path: str | Path) -> bool:
+    """Guarda ``df`` como caché del Excel en su estado actual (escritura atómica).
+
+    Returns:
+        False si pyarrow no está instalado.
+    """
+    if not disponible():
+        return False
+    excel_path = Path(excel_path)
+    tabla = _tabla(df)
+    meta = dict(tabla.schema.metadata or {})
+    meta[_META_CLAVE] = json.dumps(_clave(excel_path)).encode("utf-8")
+    tabla = tabla.replace_schema_metadata(meta)
+    destino = ruta_cache(excel_path)
+    tmp = destino.with_name(destino.name + ".tmp")
+    pq.write_table(tabla, tmp, row_group_size=FILAS_POR_GRUPO)
+    os.replace(tmp, destino)
+    return True
+
+
+def _texto(valor: object) -> Optional[str]:
+    # Mismo texto que huella_fila/cargar_anuncios: 52000000.0 se guarda como "52000000"
+    if valor is None:
+        return None
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor)
+
+
+class EscritorFilas:
+    """Construye la caché a partir de filas de openpyxl, un grupo de filas cada vez.
+
+    Sin un DataFrame no se conocen los tipos de antemano, así que cada celda se
+    guarda como texto (vacías como nulo). Las filas vacías del final se omiten,
+    como en ``pd.read_excel``. Nada es visible hasta ``cerrar``, que reemplaza
+    la caché atómicamente; ``descartar`` borra lo escrito.
+    """
+
+    def __init__(self, excel_path: str | Path, columnas: List[str]) -> None:
+        excel_path = Path(excel_path)
+        self._destino = ruta_cache(excel_path)
+        self._tmp = self._destino.with_name(self._destino.name + ".tmp")
+        clave = json.dumps(_clave(excel_path)).encode("utf-8")
+        campos = [(COLUMNA_FILA, pa.int64())] + [(c, pa.string()) for c in columnas]
+        self._schema = pa.schema(campos, metadata={_META_CLAVE: clave})
+        self._ancho = len(columnas)
+        self._writer = pq.ParquetWriter(self._tmp, self._schema)
+        self._grupo: List[Tuple[int, tuple]] = []
+        self._vacias: List[Tuple[int, tuple]] = []
+
+    def agregar(self, idx: int, valores: tuple) -> None:
+        valores = tuple(valores[: self._ancho]) + (None,) * (self._ancho - len(valores))
+        if all(v is None for v in valores):
+            self._vacias.append((idx, valores))
+            return
+        self._grupo.extend(self._vacias)
+        self._vacias.clear()
+        self._grupo.append((idx, valores))
+        if len(self._grupo) >= FILAS_POR_GRUPO:
+            self._volcar()
+
+    def _volcar(self) -> None:
+        if not self._grupo:
+            return
+        indices = [idx for idx, _ in self._grupo]
+        columnas = zip(*(valores for _, valores in self._grupo))
+        arrays = [pa.array(indices, pa.int64())]
+        arrays += [pa.array([_texto(v) for v in col], pa.string()) for col in columnas]
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self._schema))
+        self._grupo.clear()
+
+    def cerrar(self) -> None:
+        self._volcar()
+        self._writer.close()
+        os.replace(self._tmp, self._destino)
+
+    def descartar(self) -> None:
+        try:
+            self._writer.close()
+        finally:
+            self._tmp.unlink(missing_ok=True)
+
+
+def leer(excel_path: str | Path) -> pd.DataFrame:
+    """Carga la hoja completa desde la caché, indexada como en ``cargar_anuncios``."""
+    df = pq.read_table(ruta_cache(excel_path)).to_pandas()
+    df = df.set_index(COLUMNA_FILA)
+    df.index.name = None
+    return df
+
+
+def iterar_filas(excel_path: str | Path) -> Tuple[List[str], Iterator[Tuple[int, tuple]]]:
+    """Columnas y filas ``(idx, valores)`` de la caché, leída por grupos de filas.
+
+    Los valores vacíos son ``None``, como en openpyxl en modo solo lectura.
+    """
+    archivo = pq.ParquetFile(ruta_cache(excel_path))
+    columnas = [c for c in archivo.schema_arrow.names if c != COLUMNA_FILA]
+
+    def filas() -> Iterator[Tuple[int, tuple]]:
+        try:
+            for lote in archivo.iter_batches(batch_size=FILAS_POR_GRUPO):
+                datos = lote.to_pydict()
+                yield from zip(datos.pop(COLUMNA_FILA), zip(*(datos[c] for c in columnas)))
+        finally:
+            archivo.close()
+
+    return columnas, filas()
@@ -1,10 +1,17 @@
 from __future__ import annotations
 
+import os
+from collections import Counter
+from contextlib import contextmanager, suppress
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 
 import pandas as pd
+from openpyxl import load_workbook
+
+from utils import cache_hoja
+from utils.progreso import ESTADO_PUBLICADO, ProgresoJournal, huella_fila, resolver_publicadas
 
 REQUIRED_COLUMNS: List[str] = [
     "Categoria",
@@ -22,6 +29,9 @@ REQUIRED_COLUMNS: List[str] = [
     "Link",
 ]
 
+# Columnas con pocos valores distintos: como category cada celda es un código entero
+COLUMNAS_CATEGORICAS: List[str] = ["Categoria", "Subcategoria", "Moneda", "Provincia", "Municipio", "Publicado"]
+
 
 @dataclass(frozen=True)
 class SchemaValidationError(Exception):
@@ -31,11 +41,15 @@ class SchemaValidationError(Exception):
         return f"Faltan columnas obligatorias: {', '.join(self.missing_columns)}"
 
 
-def cargar_anuncios(path: str | Path) -> pd.DataFrame:
+def cargar_anuncios(path: str | Path, journal: Optional[ProgresoJournal] = None) -> pd.DataFrame:
     """Carga el Excel de anuncios y valida el esquema.
 
+    Si la caché Parquet del Excel (``utils.cache_hoja``) es válida se carga de
+    ella sin abrir el .xlsx; si no, se lee el Excel y se regenera la caché.
+
     Args:
         path: Ruta al archivo .xlsx.
+        journal: Diario de progreso cuyas filas publicadas se fusionan al cargar.
 
     Returns:
         DataFrame con las columnas esperadas.
@@ -47,18 +61,239 @@ def cargar_anuncios(path: str | Path) -> pd.DataFrame:
     if not excel_path.exists():
         raise FileNotFoundError(f"No existe el archivo: {excel_path}")
 
-    df = pd.read_excel(excel_path, engine="openpyxl")
+    df = _leer_cache(excel_path)
+    desde_excel = df is None
+    if df is None:
+        df = pd.read_excel(excel_path, engine="openpyxl")
 
-    # Normalizar encabezados (sin tildes ya provistas por requerimiento)
-    df.columns = [str(c).strip() for c in df.columns]
+        # Normalizar encabezados (sin tildes ya provistas por requerimiento)
+        df.columns = [str(c).strip() for c in df.columns]
 
     missing = [col for col in REQUIRED_COLUMNS if col not in df.columns]
     if missing:
         raise SchemaValidationError(missing_columns=missing)
+    if desde_excel:
+        _escribir_cache(df, excel_path)
+    categorizar(df)
+
+    if journal is not None:
+        aplicar_journal(df, journal)
+
+    return df
+
+
+def categorizar(df: pd.DataFrame) -> pd.DataFrame:
+    """Convierte en el sitio las columnas de ``COLUMNAS_CATEGORICAS`` a category.
 
+    ``Publicado`` siempre admite "S" y ``Link`` es object (aunque esté vacía y
+    pandas la haya leído como float64) para que ``marcar_publicado`` pueda asignarlos.
+    """
+    if "Link" in df.columns and df["Link"].dtype != object:
+        df["Link"] = df["Link"].astype(object)
+    for col in COLUMNAS_CATEGORICAS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    if "Publicado" in df.columns and "S" not in df["Publicado"].cat.categories:
+        df["Publicado"] = df["Publicado"].cat.add_categories("S")
     return df
 
 
+def _leer_cache(excel_path: Path) -> Optional[pd.DataFrame]:
+    try:
+        return cache_hoja.leer(excel_path) if cache_hoja.valida(excel_path) else None
+    except Exception:
+        # Caché dañada: se ignora y se regenera desde el Excel
+        return None
+
+
+def _escribir_cache(df: pd.DataFrame, excel_path: Path) -> None:
+    # La caché es solo una aceleración: si no se puede escribir se sigue sin ella
+    try:
+        cache_hoja.escribir(df, excel_path)
+    except Exception:
+        pass
+
+
+def aplicar_journal(df: pd.DataFrame, journal: ProgresoJournal) -> int:
+    """Fusiona en el DataFrame las filas publicadas registradas en el diario.
+
+    Returns:
+        Número de filas marcadas como publicadas.
+    """
+    aplicadas = _resolver_journal(df, journal)
+    for idx, entry in aplicadas.items():
+        df.loc[idx, "Publicado"] = "S"
+        link = entry.get("link")
+        if link:
+            df.loc[idx, "Link"] = link
+    return len(aplicadas)
+
+
+def _resolver_journal(df: pd.DataFrame, journal: ProgresoJournal) -> Dict[int, Dict[str, object]]:
+    entradas = journal.publicadas()
+    if not entradas:
+        return {}
+    filas = ((idx, huella_fila(row)) for idx, row in zip(df.index, df.to_dict("records")))
+    return resolver_publicadas(entradas, filas)  # type: ignore[return-value]
+
+
+def iterar_pendientes(
+    path: str | Path,
+    tamano: int = 100,
+    journal: Optional[ProgresoJournal] = None,
+) -> Iterator[pd.DataFrame]:
+    """Recorre el Excel en streaming y produce lotes de filas pendientes.
+
+    Lee la caché Parquet del Excel por grupos de filas si es válida; si no,
+    usa openpyxl en modo solo lectura y escribe la caché mientras recorre la
+    hoja (queda válida si el recorrido llega al final). En ambos casos nunca se mantiene la hoja
+    completa en memoria: solo el lote en curso. Las filas con ``Publicado = "S"``
+    (o registradas como publicadas en el diario) se descartan al vuelo. Con
+    diario se hace antes una pasada rápida que solo calcula la huella de las
+    filas con entrada, para emparejar el diario igual que ``cargar_anuncios``.
+
+    Args:
+        path: Ruta al archivo .xlsx.
+        tamano: Tamaño del lote.
+        journal: Diario de progreso a fusionar al vuelo.
+
+    Yields:
+        DataFrames de como máximo ``tamano`` filas, indexados igual que en
+        ``cargar_anuncios`` (índice 0 = primera fila de datos).
+
+    Raises:
+        SchemaValidationError: Si faltan columnas requeridas.
+    """
+    if tamano <= 0:
+        raise ValueError("El tamaño de partición debe ser > 0")
+
+    excel_path = Path(path)
+    if not excel_path.exists():
+        raise FileNotFoundError(f"No existe el archivo: {excel_path}")
+
+    publicadas = journal.publicadas() if journal is not None else {}
+    directas: Set[int] = set()
+    sueltas: Counter[str] = Counter()
+    if publicadas:
+        directas, sueltas = _emparejar_journal(excel_path, publicadas)
+
+    with _filas_hoja(excel_path) as (columns, rows):
+        pos_publicado = columns.index("Publicado")
+        width = len(columns)
+        batch: List[tuple] = []
+        index: List[int] = []
+        for idx, values in rows:
+            if all(v is None for v in values):
+                continue
+            if len(values) < width:
+                values = tuple(values) + (None,) * (width - len(values))
+            if idx in directas:
+                continue
+            ya_publicada = str(values[pos_publicado] or "").strip().upper() == "S"
+            if sueltas:
+                # Como en resolver_publicadas: la primera fila con el mismo contenido
+                # (publicada o no) recibe la entrada del diario que perdió su fila
+                h = huella_fila(dict(zip(columns, values)))
+                if sueltas.get(h, 0) > 0:
+                    sueltas[h] -= 1
+                    continue
+            if ya_publicada:
+                continue
+            batch.append(values[:width])
+            index.append(idx)
+            if len(batch) >= tamano:
+                yield categorizar(pd.DataFrame.from_records(batch, columns=columns, index=index))
+                batch, index = [], []
+        if batch:
+            yield categorizar(pd.DataFrame.from_records(batch, columns=columns, index=index))
+
+
+@contextmanager
+def _filas_hoja(excel_path: Path) -> Iterator[Tuple[List[str], Iterator[Tuple[int, tuple]]]]:
+    # Columnas y filas (idx, valores) de la caché Parquet si es válida; si no, de openpyxl en
+    # solo lectura, construyendo la caché al vuelo si la hoja se recorre entera
+    wb = None
+    escritor = None
+    completa = False
+    try:
+        if cache_hoja.valida(excel_path):
+            columns, rows = cache_hoja.iterar_filas(excel_path)
+        else:
+            wb = load_workbook(excel_path, read_only=True, data_only=True)
+            filas_hoja = wb.worksheets[0].iter_rows(values_only=True)
+            header_row = next(filas_hoja, None) or ()
+            columns = [str(c).strip() for c in header_row]
+            rows = enumerate(filas_hoja)
+
+        missing = [col for col in REQUIRED_COLUMNS if col not in columns]
+        if missing:
+            raise SchemaValidationError(missing_columns=missing)
+        if wb is not None and cache_hoja.disponible():
+            escritor = _abrir_escritor(excel_path, columns)
+        if escritor is not None:
+
+            def rows_con_cache(filas: Iterator[Tuple[int, tuple]]) -> Iterator[Tuple[int, tuple]]:
+                nonlocal escritor, completa
+                for idx, values in filas:
+                    if escritor is not None:
+                        try:
+                            escritor.agregar(idx, values)
+                        except Exception:
+                            escritor.descartar()
+                            escritor = None
+                    yield idx, values
+                completa = True
+
+            rows = rows_con_cache(rows)
+        yield columns, rows
+    finally:
+        if wb is not None:
+            wb.close()
+        if escritor is not None:
+            _cerrar_escritor(escritor, completa)
+
+
+def _abrir_escritor(excel_path: Path, columns: List[str]) -> Optional[cache_hoja.EscritorFilas]:
+    # Como _escribir_cache: sin caché se sigue igual, solo que el próximo arranque volverá a usar openpyxl
+    try:
+        return cache_hoja.EscritorFilas(excel_path, columns)
+    except Exception:
+        return None
+
+
+def _cerrar_escritor(escritor: cache_hoja.EscritorFilas, completa: bool) -> None:
+    # Solo una hoja recorrida entera da una caché válida; un recorrido cortado se descarta
+    with suppress(Exception):
+        if completa:
+            escritor.cerrar()
+            return
+    with suppress(Exception):
+        escritor.descartar()
+
+
+def _emparejar_journal(
+    excel_path: Path, publicadas: Dict[int, Dict[str, object]]
+) -> Tuple[Set[int], Counter[str]]:
+    """Primera pasada en streaming: filas cuya entrada del diario coincide y huellas sueltas.
+
+    Solo se calcula la huella de las filas que tienen entrada en el diario. Las
+    entradas cuya fila ya no tiene ese contenido (la hoja se editó y las filas se
+    desplazaron en cualquier sentido) se devuelven como multiconjunto de huellas.
+    """
+    directas: Set[int] = set()
+    with _filas_hoja(excel_path) as (columns, rows):
+        for idx, values in rows:
+            entry = publicadas.get(idx)
+            if entry is None:
+                continue
+            if len(values) < len(columns):
+                values = tuple(values) + (None,) * (len(columns) - len(values))
+            if huella_fila(dict(zip(columns, values))) == entry.get("huella"):
+                directas.add(idx)
+    sueltas = Counter(str(e.get("huella")) for idx, e in publicadas.items() if idx not in directas)
+    return directas, sueltas
+
+
 def particionar(df: pd.DataFrame, tamano: int = 100) -> List[pd.DataFrame]:
     """Divide el DataFrame en bloques del tamaño indicado.
 
@@ -76,17 +311,28 @@ def particionar(df: pd.DataFrame, tamano: int = 100) -> List[pd.DataFrame]:
     return [df.iloc[i : i + tamano].copy() for i in range(0, num_rows, tamano)]
 
 
-def marcar_publicado(df: pd.DataFrame, idx: int) -> None:
+def marcar_publicado(
+    df: pd.DataFrame,
+    idx: int,
+    journal: Optional[ProgresoJournal] = None,
+    link: Optional[str] = None,
+) -> None:
     """Marca una fila como publicada (L = "S").
 
     Args:
         df: DataFrame sobre el que se actualiza.
         idx: Índice de la fila en el DataFrame original.
+        journal: Si se indica, el progreso se registra también en disco (O(1)).
+        link: URL del anuncio publicado (columna M = Link), si se conoce.
     """
     if "Publicado" not in df.columns:
         raise ValueError("La columna 'Publicado' no existe en el DataFrame")
 
     df.loc[idx, "Publicado"] = "S"
+    if link:
+        df.loc[idx, "Link"] = link
+    if journal is not None:
+        journal.registrar(idx, huella_fila(df.loc[idx]), link=link)
 
 
 def guardar(df: pd.DataFrame, path: str | Path) -> None:
@@ -96,4 +342,55 @@ def guardar(df: pd.DataFrame, path: str | Path) -> None:
     """
     out_path = Path(path)
     out_path.parent.mkdir(parents=True, exist_ok=True)
-    df.to_excel(out_path, index=False, engine="openpyxl")
\ No newline at end of file
+    df.to_excel(out_path, index=False, engine="openpyxl")
+
+
+def compactar(path: str | Path, journal: ProgresoJournal) -> int:
+    """Vuelca el diario de progreso al Excel y lo vacía.
+
+    Las entradas que no son publicaciones (fallidas, duplicadas) se conservan
+    en el diario con su motivo; si no hay publicaciones el Excel no se toca.
+    Solo se escriben las celdas ``Publicado``/``Link`` de las filas publicadas;
+    el resto del libro (tipos de celda, formatos, otras hojas) queda intacto.
+    La caché Parquet se reescribe con el estado volcado, de modo que el
+    siguiente arranque no necesita volver a leer el Excel.
+
+    Returns:
+        Número de filas actualizadas en el Excel.
+    """
+    if journal.vacio():
+        return 0
+    entradas = journal.entradas()
+    otras = [e for e in entradas.values() if e.get("estado") != ESTADO_PUBLICADO]
+    if len(otras) == len(entradas):
+        return 0
+    excel_path = Path(path)
+    df = cargar_anuncios(excel_path)
+    aplicadas = _resolver_journal(df, journal)
+    if aplicadas:
+        _escribir_estado(excel_path, aplicadas)
+        for idx, entry in aplicadas.items():
+            df.loc[idx, "Publicado"] = "S"
+            if entry.get("link"):
+                df.loc[idx, "Link"] = entry["link"]
+        _escribir_cache(df, excel_path)
+    journal.vaciar(conservar=otras)
+    return len(aplicadas)
+
+
+def _escribir_estado(excel_path: Path, aplicadas: Dict[int, Dict[str, object]]) -> None:
+    # Parchea Publicado/Link celda a celda (fila del Excel = idx + 2) y reemplaza el archivo atómicamente
+    wb = load_workbook(excel_path)
+    try:
+        ws = wb.worksheets[0]
+        cabecera = {str(c.value).strip(): c.column for c in ws[1] if c.value is not None}
+        col_publicado, col_link = cabecera["Publicado"], cabecera["Link"]
+        for idx, entry in aplicadas.items():
+            ws.cell(row=idx + 2, column=col_publicado, value="S")
+            if entry.get("link"):
+                ws.cell(row=idx + 2, column=col_link, value=str(entry["link"]))
+        tmp = excel_path.with_name(excel_path.name + ".tmp")
+        wb.save(tmp)
+    finally:
+        wb.close()
+    os.replace(tmp, excel_path)
@@ -1,25 +1,138 @@
 from __future__ import annotations
 
+import asyncio
 import hashlib
+import mimetypes
+import os
 import random
+import re
+import tempfile
+import threading
 import time
+from dataclasses import dataclass
+from html.parser import HTMLParser
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-# Optional gdown import. If not available, we fall back to requests
-try:  # pragma: no cover - best effort
-    import gdown  # type: ignore
-except Exception:  # pragma: no cover
-    gdown = None
+from utils.metricas import METRICAS
+
+if TYPE_CHECKING:  # pragma: no cover
+    from utils.image_cache import ImageCache
 
 MAX_FILE_SIZE_BYTES = 10 * 1024 * 1024  # 10 MB (hard limit)
 DEFAULT_TIMEOUT_SECONDS = 30
 DEFAULT_MAX_RETRIES = 3
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 1024 * 1024
+DEFAULT_POOL_SIZE = 8
+DEFAULT_HTTP_RETRIES = 2
+# Sobrescribible para apuntar a un servidor local (bench/)
+DRIVE_DOWNLOAD_URL = os.getenv("DRIVE_DOWNLOAD_URL", "https://drive.google.com/uc")
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+class DriveError(RuntimeError):
+    """Drive respondió con una página HTML en lugar del archivo."""
+
+
+class ArchivoDemasiadoGrande(ValueError):
+    """El archivo supera MAX_FILE_SIZE_BYTES (no tiene sentido reintentar)."""
+
+    def __init__(self) -> None:
+        super().__init__(f"Archivo excede el límite de {MAX_FILE_SIZE_BYTES // (1024 * 1024)} MB")
+
+
+def configurar_sesion(
+    *,
+    pool_size: int = DEFAULT_POOL_SIZE,
+    reintentos: int = DEFAULT_HTTP_RETRIES,
+    backoff: float = 0.5,
+) -> requests.Session:
+    """Crea (o reemplaza) la sesión HTTP compartida por todas las descargas.
+
+    La sesión reutiliza conexiones keep-alive contra Drive, de modo que cada
+    imagen (y cada reintento) no paga un nuevo handshake TCP+TLS.
+
+    Args:
+        pool_size: Conexiones por host mantenidas en el pool (>= hilos de descarga).
+        reintentos: Reintentos a nivel de transporte (conexión, 429 y 5xx).
+        backoff: Factor de espera entre reintentos de transporte.
+    """
+    global _session
+    retry = Retry(
+        total=reintentos,
+        connect=reintentos,
+        read=reintentos,
+        status=reintentos,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        backoff_factor=backoff,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Connection"] = "keep-alive"
+    with _session_lock:
+        old, _session = _session, session
+    if old is not None:
+        old.close()
+    return session
+
+
+def obtener_sesion() -> requests.Session:
+    """Devuelve la sesión HTTP compartida, creándola con valores por defecto."""
+    with _session_lock:
+        session = _session
+    return session if session is not None else configurar_sesion()
+
+
+@dataclass
+class _Descarga:
+    path: Path
+    sha1: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
 
 
-def _sha1_of_file(path: Path) -> str:
+# uc?id=ID, uc?export=download&id=ID, open?id=ID, /file/d/ID/view, /d/ID, usercontent download?id=ID
+_DRIVE_HOSTS = {"drive.google.com", "docs.google.com", "drive.usercontent.google.com"}
+_DRIVE_ID_RE = re.compile(r"^[A-Za-z0-9_-]{10,}$")
+_DRIVE_PATH_ID_RE = re.compile(r"/d/([A-Za-z0-9_-]{10,})(?:/|$)")
+_CD_FILENAME_RE = re.compile(r"filename\*?=(?:UTF-8'')?\"?([^\";]+)\"?", re.IGNORECASE)
+_CONFIRM_RE = re.compile(r"confirm=([0-9A-Za-z_-]+)")
+
+
+def extraer_drive_id(url: str) -> Optional[str]:
+    """Extrae el FILE_ID de una URL de Google Drive, o None si no lo es.
+
+    Solo se aceptan los hosts de Drive: ``https://example.com/?u=drive.google.com&id=...``
+    no es una URL de Drive.
+    """
+    try:
+        partes = urlsplit(url.strip())
+    except ValueError:
+        return None
+    if partes.scheme not in ("http", "https") or partes.hostname not in _DRIVE_HOSTS:
+        return None
+    file_id = parse_qs(partes.query).get("id", [""])[0]
+    if _DRIVE_ID_RE.match(file_id):
+        return file_id
+    m = _DRIVE_PATH_ID_RE.search(partes.path)
+    return m.group(1) if m else None
+
+
+def sha1_of_file(path: Path) -> str:
+    """SHA-1 del contenido de un archivo, leído por bloques."""
     sha1 = hashlib.sha1()
     with path.open("rb") as f:
         for chunk in iter(lambda: f.read(8192), b""):
@@ -27,47 +140,178 @@ def _sha1_of_file(path: Path) -> str:
     return sha1.hexdigest()
 
 
+def _filename_from_content_disposition(response: requests.Response) -> Optional[str]:
+    cd = response.headers.get("Content-Disposition")
+    if not cd:
+        return None
+    matches = _CD_FILENAME_RE.findall(cd)
+    # Si hay filename y filename*, el último (RFC 5987) es el más fiel
+    name = Path(requests.utils.unquote(matches[-1])).name if matches else ""
+    return name or None
+
+
 def _safe_filename_from_headers(url: str, response: requests.Response) -> str:
     # Try to parse filename from Content-Disposition; fallback to URL id
-    cd = response.headers.get("content-disposition") or response.headers.get(
-        "Content-Disposition"
-    )
-    if cd and "filename=" in cd:
-        filename = cd.split("filename=")[-1].strip("\";")
+    filename = _filename_from_content_disposition(response)
+    if filename:
         return filename
     # Fallback: last part of URL or a generic name
-    tail = url.rstrip("/").split("/")[-1]
+    tail = url.split("?")[0].rstrip("/").split("/")[-1]
     if tail:
         return tail
     return f"download_{int(time.time())}.bin"
 
 
-def _requests_download(url: str, dest_path: Path, timeout: int) -> Path:
-    with requests.get(url, stream=True, allow_redirects=True, timeout=timeout) as r:
-        r.raise_for_status()
-        # Determine filename if not provided
-        filename = _safe_filename_from_headers(url, r)
-        final_path = dest_path / filename
-        with final_path.open("wb") as f:
-            for chunk in r.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-        return final_path
-
-
-def _gdown_download(url: str, dest_path: Path, timeout: int) -> Optional[Path]:  # pragma: no cover - external
-    if gdown is None:
-        return None
-    dest_path.mkdir(parents=True, exist_ok=True)
-    # gdown can take Google Drive links directly
-    out = dest_path / f"gdown_{int(time.time())}.bin"
+def _drive_filename(file_id: str, response: requests.Response) -> str:
+    # <FILE_ID><ext>, con la extensión del nombre original o del Content-Type
+    original = _filename_from_content_disposition(response)
+    ext = Path(original).suffix.lower() if original else ""
+    if not ext:
+        content_type = response.headers.get("Content-Type", "").split(";")[0].strip()
+        ext = mimetypes.guess_extension(content_type) or ".bin"
+    return f"{file_id}{ext}"
+
+
+def _chunk_size(content_length: Optional[int]) -> int:
+    # ~8 lecturas por archivo cuando se conoce el tamaño, acotado a [64 KB, 1 MB]
+    if not content_length:
+        return MIN_CHUNK_SIZE * 4
+    return max(MIN_CHUNK_SIZE, min(MAX_CHUNK_SIZE, content_length // 8))
+
+
+def _stream_to_file(response: requests.Response, dest_path: Path, filename: str, renombrar: bool = True) -> _Descarga:
+    """Escribe el cuerpo en una sola pasada: valida tamaño, calcula SHA-1 y renombra atómicamente.
+
+    El cuerpo se escribe en un temporal del mismo directorio y solo se renombra
+    al nombre final cuando la descarga termina bien; un fallo nunca deja un
+    archivo parcial con el nombre definitivo. Con ``renombrar=False`` (descargas
+    que van a la caché) el archivo conserva su nombre temporal único, con la
+    extensión de ``filename``: dos URLs con el mismo nombre de archivo descargadas
+    a la vez nunca se pisan.
+    """
     try:
-        gdown.download(url=url, output=str(out), quiet=True)
-        if out.exists() and out.stat().st_size > 0:
-            return out
-        return None
-    except Exception:
-        return None
+        content_length: Optional[int] = int(response.headers.get("Content-Length", ""))
+    except ValueError:
+        content_length = None
+    if content_length is not None and content_length > MAX_FILE_SIZE_BYTES:
+        raise ArchivoDemasiadoGrande()
+
+    sha1 = hashlib.sha1()
+    written = 0
+    fd, tmp_name = tempfile.mkstemp(dir=dest_path, prefix=".descarga_", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in response.iter_content(chunk_size=_chunk_size(content_length)):
+                if not chunk:
+                    continue
+                written += len(chunk)
+                if written > MAX_FILE_SIZE_BYTES:
+                    raise ArchivoDemasiadoGrande()
+                sha1.update(chunk)
+                f.write(chunk)
+        final_path = dest_path / filename if renombrar else Path(tmp_name).with_suffix(Path(filename).suffix)
+        os.replace(tmp_name, final_path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+    METRICAS.contar("bytes_descargados", written, por_anuncio=False)
+    return _Descarga(
+        path=final_path,
+        sha1=sha1.hexdigest(),
+        etag=response.headers.get("ETag"),
+        last_modified=response.headers.get("Last-Modified"),
+    )
+
+
+def _requests_download(
+    url: str,
+    dest_path: Path,
+    timeout: int,
+    headers: Optional[Dict[str, str]] = None,
+    renombrar: bool = True,
+) -> Optional[_Descarga]:
+    """Descarga genérica por HTTP(S).
+
+    Returns:
+        La descarga, o None si el servidor respondió 304 a una petición condicional.
+    """
+    with obtener_sesion().get(url, stream=True, allow_redirects=True, timeout=timeout, headers=headers) as r:
+        if r.status_code == 304:
+            return None
+        r.raise_for_status()
+        return _stream_to_file(r, dest_path, _safe_filename_from_headers(url, r), renombrar)
+
+
+class _DriveFormParser(HTMLParser):
+    # Extrae el formulario de confirmación ("download-form") de la página de aviso de virus
+    def __init__(self) -> None:
+        super().__init__()
+        self.action: Optional[str] = None
+        self.inputs: Dict[str, str] = {}
+        self._in_form = False
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        a = {k: v or "" for k, v in attrs}
+        if tag == "form" and (a.get("id") == "download-form" or "download" in a.get("action", "")):
+            self._in_form = True
+            self.action = a.get("action") or None
+        elif tag == "input" and self._in_form and a.get("name"):
+            self.inputs[a["name"]] = a.get("value", "")
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "form":
+            self._in_form = False
+
+
+def _drive_confirmation(response: requests.Response, file_id: str) -> Optional[Tuple[str, Dict[str, str]]]:
+    """Siguiente petición para superar la página intermedia de Drive (archivos grandes)."""
+    for name, value in response.cookies.items():
+        if name.startswith("download_warning"):
+            return DRIVE_DOWNLOAD_URL, {"export": "download", "id": file_id, "confirm": value}
+    html = response.text
+    parser = _DriveFormParser()
+    parser.feed(html)
+    if parser.action:
+        params = dict(parser.inputs)
+        params.setdefault("id", file_id)
+        return requests.compat.urljoin(response.url, parser.action), params
+    m = _CONFIRM_RE.search(html)
+    if m:
+        return DRIVE_DOWNLOAD_URL, {"export": "download", "id": file_id, "confirm": m.group(1)}
+    return None
+
+
+def _drive_download(
+    file_id: str,
+    dest_path: Path,
+    timeout: int,
+    headers: Optional[Dict[str, str]] = None,
+    renombrar: bool = True,
+) -> Optional[_Descarga]:
+    """Descarga nativa de Google Drive sobre la sesión compartida.
+
+    Resuelve en la misma sesión la página de confirmación que Drive muestra para
+    archivos grandes (aviso de antivirus) y nombra el archivo ``<FILE_ID><ext>``.
+
+    Returns:
+        La descarga, o None si el servidor respondió 304 a una petición condicional.
+    """
+    session = obtener_sesion()
+    url, params = DRIVE_DOWNLOAD_URL, {"export": "download", "id": file_id}
+    # Como mucho una o dos páginas intermedias antes del archivo
+    for _ in range(3):
+        with session.get(url, params=params, stream=True, allow_redirects=True, timeout=timeout, headers=headers) as r:
+            if r.status_code == 304:
+                return None
+            r.raise_for_status()
+            content_type = r.headers.get("Content-Type", "")
+            if not content_type.startswith("text/html"):
+                return _stream_to_file(r, dest_path, _drive_filename(file_id, r), renombrar)
+            siguiente = _drive_confirmation(r, file_id)
+        if siguiente is None:
+            raise DriveError(f"Drive no devolvió el archivo {file_id} (¿no está compartido públicamente?)")
+        url, params = siguiente
+    raise DriveError(f"Drive no devolvió el archivo {file_id} tras la confirmación")
 
 
 def _exponential_backoff(retry_index: int) -> None:
@@ -77,52 +321,89 @@ def _exponential_backoff(retry_index: int) -> None:
     time.sleep(sleep_s)
 
 
-def descargar(url: str, carpeta_destino: str | Path, *, timeout: int = DEFAULT_TIMEOUT_SECONDS) -> Path:
+def descargar(
+    url: str,
+    carpeta_destino: str | Path,
+    *,
+    timeout: int = DEFAULT_TIMEOUT_SECONDS,
+    cache: Optional[ImageCache] = None,
+) -> Path:
     """Descarga un archivo desde URL (Drive o http), con reintentos y límites.
 
     - Soporta redirecciones 302 y content-disposition.
+    - URLs de Drive (uc?id=, open?id=, /file/d/ID/view) se descargan por la vía
+      nativa, resolviendo la página de confirmación de archivos grandes.
     - 3 intentos exponenciales, timeout configurable (30 s por defecto).
-    - Fallback a gdown si está disponible.
-    - Devuelve ruta local; borra archivos > 10 MB automáticamente.
+    - Devuelve ruta local; rechaza archivos > 10 MB por Content-Length o en
+      cuanto la descarga supera el límite (sin reintentos).
+    - Con ``cache``, un acierto se devuelve sin tráfico de red y cada descarga
+      se guarda en la caché indexada por su SHA-1. Las entradas que requieren
+      revalidación se piden con If-None-Match/If-Modified-Since (304 = reutilizar).
     """
     if not url or not isinstance(url, str):
         raise ValueError("URL inválida para descarga")
+    # Corre en hilos del prefetcher: se mide por etapa, no por anuncio
+    with METRICAS.etapa("descarga", por_anuncio=False):
+        return _descargar(url, Path(carpeta_destino), timeout, cache)
+
+
+def _descargar(url: str, dest_dir: Path, timeout: int, cache: Optional[ImageCache]) -> Path:
+    condicional: Optional[Dict[str, str]] = None
+    if cache is not None:
+        hit = cache.obtener(url)
+        if hit is not None:
+            METRICAS.contar("cache_aciertos", por_anuncio=False)
+            return hit
+        condicional = cache.cabeceras_condicionales(url)
 
-    dest_dir = Path(carpeta_destino)
     dest_dir.mkdir(parents=True, exist_ok=True)
+    drive_id = extraer_drive_id(url)
 
     last_error: Optional[Exception] = None
     for attempt in range(DEFAULT_MAX_RETRIES):
         try:
-            # Primary: requests
-            path = _requests_download(url, dest_dir, timeout=timeout)
-
-            # Size limit check
-            try:
-                if path.stat().st_size > MAX_FILE_SIZE_BYTES:
-                    path.unlink(missing_ok=True)
-                    raise ValueError("Archivo excede el límite de 10 MB")
-            except FileNotFoundError:
-                pass
-
-            # Compute SHA-1 (optional auditing - not returned, but we could log it)
-            _ = _sha1_of_file(path)
-            return path
+            # Tamaño y SHA-1 se validan durante la descarga. Con caché, el temporal único pasa
+            # directamente a cache.guardar sin tomar un nombre compartido por el camino
+            renombrar = cache is None
+            if drive_id is not None:
+                descarga = _drive_download(drive_id, dest_dir, timeout, condicional, renombrar)
+            else:
+                descarga = _requests_download(url, dest_dir, timeout, condicional, renombrar)
+            if descarga is None:
+                assert cache is not None
+                revalidado = cache.revalidado(url)
+                if revalidado is not None:
+                    METRICAS.contar("cache_revalidadas", por_anuncio=False)
+                    return revalidado
+                # La entrada desapareció entre tanto: descarga completa
+                condicional = None
+                raise RuntimeError("Entrada de caché no disponible tras 304")
+            if cache is not None:
+                return cache.guardar(
+                    url, descarga.path, descarga.sha1, etag=descarga.etag, last_modified=descarga.last_modified
+                )
+            return descarga.path
+        except (ArchivoDemasiadoGrande, DriveError):
+            raise
         except Exception as exc:
             last_error = exc
-            # Fallback to gdown only for Google Drive URLs or after failures
-            if attempt == DEFAULT_MAX_RETRIES - 1:
-                alt = _gdown_download(url, dest_dir, timeout)
-                if alt is not None:
-                    try:
-                        if alt.stat().st_size > MAX_FILE_SIZE_BYTES:
-                            alt.unlink(missing_ok=True)
-                            raise ValueError("Archivo excede el límite de 10 MB")
-                        _ = _sha1_of_file(alt)
-                        return alt
-                    except Exception as e2:
-                        last_error = e2
             if attempt < DEFAULT_MAX_RETRIES - 1:
+                METRICAS.contar("descarga_reintentos", por_anuncio=False)
                 _exponential_backoff(attempt)
     assert last_error is not None
-    raise last_error
\ No newline at end of file
+    raise last_error
+
+
+async def descargar_async(
+    url: str,
+    carpeta_destino: str | Path,
+    *,
+    timeout: int = DEFAULT_TIMEOUT_SECONDS,
+    cache: Optional[ImageCache] = None,
+) -> Path:
+    """Versión asíncrona de ``descargar``.
+
+    La descarga corre en un hilo sobre la misma sesión HTTP compartida (pool
+    keep-alive, reintentos, caché), sin bloquear el bucle de eventos.
+    """
+    return await asyncio.to_thread(descargar, url, carpeta_destino, timeout=timeout, cache=cache)
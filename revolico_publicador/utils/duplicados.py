@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Mapping, Optional, Sequence
+
+import pandas as pd
+
+from utils.anuncio import Anuncio, desde_df
+from utils.drive_downloader import sha1_of_file
+from utils.imagenes import SHA1_RE
+from utils.localidades import normalizar_nombre
+
+# Campos que identifican un anuncio a efectos de duplicado (además de la foto)
+CAMPOS_HUELLA = ["Titulo", "Descripcion", "Precio", "Telefono"]
+DEFAULT_VENTANA_DIAS = 30.0
+
+
+def sha1_foto(path: str | Path | None) -> str:
+    """SHA-1 del contenido de la foto local ("" si no hay).
+
+    En la caché de imágenes el nombre ya es el SHA-1 del original (también en las
+    variantes preprocesadas ``<sha1>.<ajustes><ext>``), así que no se relee el archivo.
+    """
+    if not path:
+        return ""
+    p = Path(path)
+    prefijo = p.name.split(".")[0]
+    if SHA1_RE.fullmatch(prefijo):
+        return prefijo
+    try:
+        return sha1_of_file(p)
+    except OSError:
+        return ""
+
+
+def sha1_fotos(paths: Sequence[str | Path]) -> str:
+    """``sha1_foto`` de cada foto, en orden y unidos por ``+`` (con una foto, igual que ``sha1_foto``)."""
+    return "+".join(sha1_foto(p) for p in paths)
+
+
+def huella_anuncio(anuncio: Anuncio, foto: str = "") -> str:
+    """Huella normalizada (sin tildes, mayúsculas ni espacios repetidos) de un anuncio."""
+    partes = [normalizar_nombre(anuncio.valor(c) or "") for c in CAMPOS_HUELLA]
+    partes.append(foto)
+    return hashlib.sha1("\x1f".join(partes).encode("utf-8")).hexdigest()
+
+
+def huellas(df: pd.DataFrame, fotos: Optional[pd.Series] = None) -> pd.Series:
+    """``huella_anuncio`` para todas las filas de un DataFrame (mismo índice)."""
+    fotos = fotos if fotos is not None else pd.Series("", index=df.index)
+    return pd.Series([huella_anuncio(a, f) for a, f in zip(desde_df(df), fotos)], index=df.index, dtype=object)
+
+
+class IndiceDuplicados:
+    """Índice persistente de huellas de anuncios publicados.
+
+    Vive en un JSONL append-only (una línea por publicación) y se carga en un
+    dict al arrancar, de modo que comprobar un anuncio es O(1). Solo cuentan las
+    publicaciones dentro de la ventana de ``ventana_dias``; al cerrar se
+    reescribe el archivo sin las entradas caducadas.
+    """
+
+    def __init__(self, path: str | Path, *, ventana_dias: float = DEFAULT_VENTANA_DIAS) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ventana_seconds = ventana_dias * 24 * 3600
+        self._lock = threading.Lock()
+        self._entradas: Dict[str, Dict[str, object]] = {}
+        self._cargar()
+        self._fh = self.path.open("a", encoding="utf-8")
+
+    def _vigente(self, entry: Mapping[str, object], now: float) -> bool:
+        return now - float(entry.get("ts", 0)) <= self.ventana_seconds  # type: ignore[arg-type]
+
+    def _cargar(self) -> None:
+        if not self.path.exists():
+            return
+        now = time.time()
+        with self.path.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    if self._vigente(entry, now):
+                        self._entradas[str(entry["huella"])] = entry
+                except (ValueError, KeyError, TypeError):
+                    continue
+
+    def buscar(self, huella: str) -> Optional[Dict[str, object]]:
+        """Publicación previa con la misma huella dentro de la ventana, si existe."""
+        entry = self._entradas.get(huella)
+        if entry is None or not self._vigente(entry, time.time()):
+            return None
+        return entry
+
+    def contiene(self, huella: str) -> bool:
+        return self.buscar(huella) is not None
+
+    def filtrar(self, huellas: Iterable[str]) -> Dict[str, Dict[str, object]]:
+        """Subconjunto de ``huellas`` ya publicadas dentro de la ventana."""
+        return {h: e for h in huellas if (e := self.buscar(h)) is not None}
+
+    def registrar(self, huella: str, **extra: object) -> None:
+        entry: Dict[str, object] = {"huella": huella, "ts": time.time()}
+        entry.update({k: v for k, v in extra.items() if v is not None})
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._entradas[huella] = entry
+            self._fh.write(line)
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+
+    def cerrar(self) -> None:
+        """Cierra el índice descartando en disco las entradas fuera de la ventana."""
+        with self._lock:
+            self._fh.close()
+            now = time.time()
+            vigentes = [e for e in self._entradas.values() if self._vigente(e, now)]
+            tmp = self.path.with_suffix(".tmp")
+            with tmp.open("w", encoding="utf-8") as f:
+                for entry in vigentes:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            os.replace(tmp, self.path)
@@ -0,0 +1,307 @@
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from utils.anuncio import Anuncio
+from utils.bloqueo import DOMINIOS_BLOQUEADOS, PERMITIDOS, TIPOS_BLOQUEADOS, FiltroRecursos
+
+MOBILE_USER_AGENTS = [
+    "Mozilla/5.0 (Linux; Android 10; SM-G973F) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Mobile Safari/537.36",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 16_2 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.0 Mobile/15E148 Safari/604.1",
+    "Mozilla/5.0 (Linux; Android 11; Pixel 5) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Mobile Safari/537.36",
+    "Mozilla/5.0 (Linux; Android 9; Mi A2 Lite) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0.0.0 Mobile Safari/537.36",
+    "Mozilla/5.0 (iPad; CPU OS 15_5 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.5 Mobile/15E148 Safari/604.1",
+]
+VIEWPORT = {"width": 390, "height": 844}
+
+
+# Selectores del formulario. Son placeholders robustos; ajústalos según el DOM real.
+# Preferimos data-testid si existe; si no, usamos labels o name/id.
+CAMPOS_SELECTORES: Dict[str, str] = {
+    "Categoria": "select[name='category'], [data-testid='category-select']",
+    "Subcategoria": "select[name='subcategory'], [data-testid='subcategory-select']",
+    "Titulo": "input[name='title'], [data-testid='title-input']",
+    "Descripcion": "textarea[name='description'], [data-testid='description-textarea']",
+    "Precio": "input[name='price'], [data-testid='price-input']",
+    "Moneda": "select[name='currency'], [data-testid='currency-select']",
+    "Provincia": "select[name='province'], [data-testid='province-select']",
+    "Municipio": "select[name='municipality'], [data-testid='municipality-select']",
+    "Telefono": "input[name='phone'], [data-testid='phone-input']",
+    "Email": "input[name='email'], [data-testid='email-input']",
+}
+# Imagen: input type=file
+FOTOS_SELECTOR = "input[type='file'][name='image'], input[type='file'][data-testid='image-input']"
+SUBMIT_SELECTOR = "button[type='submit'], [data-testid='submit-button']"
+# Heuristic: recaptcha or captcha iframe/div, probados en una sola consulta
+CAPTCHA_SELECTORES = [
+    "iframe[src*='recaptcha']",
+    "div.g-recaptcha",
+    "div[id*='recaptcha']",
+    "div[class*='captcha']",
+]
+
+EXITO_SELECTOR = "[data-testid='publish-success']"
+EXITO_TEXTO = "Publicado|Éxito|Success|Gracias"
+ERROR_SELECTOR = ".error, [data-testid='publish-error']"
+ERROR_TEXTO = "Error|falló"
+LINK_SELECTOR = "[data-testid='publish-success'] a[href], a[data-testid='ad-link']"
+
+# Antes del clic: marca los indicadores de éxito/error/captcha ya visibles y anota
+# la URL y si los textos de éxito/error ya aparecen en la página del formulario.
+JS_MARCAR_PREVIOS = """
+(o) => {
+    const visible = (el) => !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
+    for (const sel of [o.captcha, o.exito, o.error]) {
+        document.querySelectorAll(sel).forEach((el) => { if (visible(el)) el.setAttribute('data-rp-previo', ''); });
+    }
+    const texto = document.body ? document.body.innerText : '';
+    return {
+        href: location.href,
+        exitoTexto: new RegExp(o.exitoTexto, 'i').test(texto),
+        errorTexto: new RegExp(o.errorTexto, 'i').test(texto),
+    };
+}
+"""
+
+# Resultado del envío: se evalúa en el navegador en cada mutación/frame hasta que
+# aparece éxito, error, captcha o la URL pasa a ser la de un anuncio publicado.
+# Solo cuentan los indicadores que se hicieron visibles tras el clic (o.previo,
+# de JS_MARCAR_PREVIOS) o un cambio de URL: un contenedor .error oculto o un
+# "Error" en el pie del formulario no se toman por el resultado.
+JS_RESULTADO_ENVIO = """
+(o) => {
+    const href = location.href;
+    const previo = o.previo || {};
+    const navego = previo.href !== undefined && href !== previo.href;
+    if (o.patronUrl && (navego || previo.href === undefined) && new RegExp(o.patronUrl).test(href)) {
+        return { estado: 'exito', link: href };
+    }
+    const visible = (el) => !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
+    const nuevo = (sel) => Array.from(document.querySelectorAll(sel)).some(
+        (el) => visible(el) && !el.hasAttribute('data-rp-previo')
+    );
+    const texto = document.body ? document.body.innerText : '';
+    const textoNuevo = (re, antes) => (navego || !antes) && new RegExp(re, 'i').test(texto);
+    if (nuevo(o.captcha)) return { estado: 'captcha' };
+    if (nuevo(o.error) || textoNuevo(o.errorTexto, previo.errorTexto)) return { estado: 'error' };
+    if (nuevo(o.exito) || textoNuevo(o.exitoTexto, previo.exitoTexto)) {
+        const a = document.querySelector(o.link);
+        return { estado: 'exito', link: a ? a.href : null };
+    }
+    return null;
+}
+"""
+
+# Resuelve en una sola llamada qué campos existen y su tipo (tag)
+JS_RESOLVER_CAMPOS = """
+(selectores) => {
+    const out = {};
+    for (const [key, sel] of Object.entries(selectores)) {
+        const el = document.querySelector(sel);
+        if (el) out[key] = el.tagName.toLowerCase();
+    }
+    return out;
+}
+"""
+
+# Rellena inputs/textarea en bloque con el setter nativo (compatible con React/Vue)
+# y dispara input/change como haría el teclado. Devuelve los campos no encontrados
+# o que no son un input/textarea (p. ej. el selector apunta a un contenedor).
+JS_RELLENAR_CAMPOS = """
+(campos) => {
+    const faltan = [];
+    for (const [key, [sel, value]] of Object.entries(campos)) {
+        const el = document.querySelector(sel);
+        const proto = el instanceof HTMLTextAreaElement ? HTMLTextAreaElement.prototype
+            : el instanceof HTMLInputElement ? HTMLInputElement.prototype : null;
+        if (!proto) { faltan.push(key); continue; }
+        Object.getOwnPropertyDescriptor(proto, 'value').set.call(el, value);
+        el.dispatchEvent(new Event('input', { bubbles: true }));
+        el.dispatchEvent(new Event('change', { bubbles: true }));
+    }
+    return faltan;
+}
+"""
+
+
+# Deja el formulario ya cargado listo para otro anuncio: form.reset(), vacía los
+# inputs de archivo y retira los mensajes de resultado. Devuelve false si no hay formulario.
+JS_RESET_FORMULARIO = """
+(o) => {
+    const submit = document.querySelector(o.submit);
+    const form = submit ? submit.closest('form') : null;
+    if (!form) return false;
+    form.reset();
+    form.querySelectorAll("input[type='file']").forEach((el) => { el.value = ''; });
+    document.querySelectorAll(o.resultado).forEach((el) => el.remove());
+    return true;
+}
+"""
+OPCIONES_RESET = {"submit": SUBMIT_SELECTOR, "resultado": f"{EXITO_SELECTOR}, {ERROR_SELECTOR}"}
+
+
+class CaptchaDetected(Exception):
+    pass
+
+
+def user_agent_perfil(perfil: Path) -> str:
+    """User agent de un perfil persistente: se elige una vez y se conserva."""
+    ua_file = perfil / "user_agent.txt"
+    try:
+        return ua_file.read_text(encoding="utf-8").strip() or random.choice(MOBILE_USER_AGENTS)
+    except FileNotFoundError:
+        ua = random.choice(MOBILE_USER_AGENTS)
+        perfil.mkdir(parents=True, exist_ok=True)
+        ua_file.write_text(ua, encoding="utf-8")
+        return ua
+
+
+@dataclass
+class PublicadorConfig:
+    headless: bool = False
+    delay_min: int = 3
+    delay_max: int = 7
+    base_url: str = "https://www.revolico.com/publicar"
+    # Ritmo "humano" explícito: pausa entre campos (0 = rellenar en bloque) y tras subir la imagen
+    pausa_campo_min: float = 0.0
+    pausa_campo_max: float = 0.0
+    pausa_imagen: float = 2.0
+    # Tiempo máximo esperando el resultado del envío y URL de un anuncio ya publicado
+    timeout_envio_ms: int = 15000
+    patron_url_anuncio: str = r"revolico\.com/item/"
+    # Filtro de recursos no esenciales (fuentes, imágenes, anuncios, trackers)
+    bloquear_recursos: bool = True
+    bloquear_tipos: Tuple[str, ...] = TIPOS_BLOQUEADOS
+    bloquear_dominios: Tuple[str, ...] = DOMINIOS_BLOQUEADOS
+    permitir: Tuple[str, ...] = PERMITIDOS
+    # Arranque en caliente: perfil persistente (cookies, caché HTTP y de service workers)
+    # o solo storage_state (cookies/localStorage) en un JSON.
+    perfil_dir: Optional[str] = None
+    storage_state: Optional[str] = None
+    # Tras un envío correcto, reutilizar el formulario cargado en lugar de navegar de nuevo
+    reset_en_sitio: bool = False
+
+
+def crear_filtro(config: PublicadorConfig) -> Optional[FiltroRecursos]:
+    # Interceptar peticiones (context.route) desactiva la caché HTTP del navegador:
+    # con un perfil persistente se prefiere la caché, que ya evita las descargas repetidas
+    if not config.bloquear_recursos or config.perfil_dir:
+        return None
+    return FiltroRecursos(tipos=config.bloquear_tipos, dominios=config.bloquear_dominios, permitidos=config.permitir)
+
+
+def opciones_contexto(config: PublicadorConfig) -> Dict[str, object]:
+    """Argumentos de ``launch_persistent_context`` (con perfil) o de ``new_context``."""
+    if config.perfil_dir:
+        perfil = Path(config.perfil_dir)
+        return {
+            "user_data_dir": str(perfil),
+            "headless": config.headless,
+            "user_agent": user_agent_perfil(perfil),
+            "viewport": VIEWPORT,
+        }
+    state = config.storage_state
+    return {
+        "user_agent": random.choice(MOBILE_USER_AGENTS),
+        "viewport": VIEWPORT,
+        "storage_state": state if state and Path(state).exists() else None,
+    }
+
+
+def opciones_resultado(config: PublicadorConfig, previo: Optional[Dict[str, object]] = None) -> Dict[str, object]:
+    """Argumento de ``JS_MARCAR_PREVIOS`` / ``JS_RESULTADO_ENVIO``."""
+    return {
+        "previo": previo,
+        "patronUrl": config.patron_url_anuncio,
+        "captcha": ", ".join(CAPTCHA_SELECTORES),
+        "exito": EXITO_SELECTOR,
+        "exitoTexto": EXITO_TEXTO,
+        "error": ERROR_SELECTOR,
+        "errorTexto": ERROR_TEXTO,
+        "link": LINK_SELECTOR,
+    }
+
+
+def es_error_navegacion(e: Exception) -> bool:
+    """El contexto JS se destruyó porque la página navegó (se puede reintentar en la nueva)."""
+    msg = str(e)
+    return "context was destroyed" in msg or "navigat" in msg.lower()
+
+
+def plan_relleno(
+    config: PublicadorConfig, layout: Dict[str, str], anuncio: Anuncio
+) -> Tuple[List[Tuple[str, str]], List[Dict[str, List[str]]]]:
+    """Separa los campos en selects (uno a uno) y lotes de texto para rellenar en bloque.
+
+    Con pausa entre campos configurada, cada campo de texto va en su propio lote.
+    """
+    selects: List[Tuple[str, str]] = []
+    texto: Dict[str, List[str]] = {}
+    for key, selector in CAMPOS_SELECTORES.items():
+        value = anuncio.valor(key)
+        tag = layout.get(key)
+        if value is None or tag is None:
+            continue
+        if tag == "select":
+            selects.append((selector, str(value)))
+        else:
+            texto[key] = [selector, str(value)]
+    if config.pausa_campo_max > 0:
+        return selects, [{k: v} for k, v in texto.items()]
+    return selects, [texto] if texto else []
+
+
+class PublicadorBase:
+    """Configuración, estado y decisiones comunes a ``Publicador`` y ``PublicadorAsync``.
+
+    Aquí no hay llamadas al navegador: cada motor implementa solo la E/S con
+    Playwright (síncrona o asíncrona) y delega en estos métodos el resto.
+    """
+
+    def __init__(
+        self,
+        headless: bool = False,
+        delay_min: int = 3,
+        delay_max: int = 7,
+        base_url: Optional[str] = None,
+        **opciones: object,
+    ) -> None:
+        self.config = PublicadorConfig(
+            headless=headless,
+            delay_min=delay_min,
+            delay_max=delay_max,
+            base_url=base_url or PublicadorConfig.base_url,
+            **opciones,  # type: ignore[arg-type]
+        )
+        # Tipos de campo resueltos para la URL actual del formulario (caché de layout)
+        self._layout: Optional[Dict[str, str]] = None
+        self._layout_url: Optional[str] = None
+        # URL del último anuncio publicado (columna Link), si se pudo capturar
+        self.ultimo_link: Optional[str] = None
+        self.filtro = crear_filtro(self.config)
+        self._formulario_listo = False
+
+    def _layout_vigente(self, url: str) -> Optional[Dict[str, str]]:
+        return self._layout if self._layout is not None and self._layout_url == url else None
+
+    def _guardar_layout(self, url: str, layout: Dict[str, str]) -> Dict[str, str]:
+        self._layout, self._layout_url = layout, url
+        return layout
+
+    def _segundos_pausa_campo(self) -> float:
+        if self.config.pausa_campo_max <= 0:
+            return 0.0
+        return random.uniform(self.config.pausa_campo_min, self.config.pausa_campo_max)
+
+    def _registrar_resultado(self, resultado: Optional[Mapping[str, Optional[str]]]) -> bool:
+        """Interpreta la respuesta de ``JS_RESULTADO_ENVIO``: True si se publicó."""
+        estado = resultado.get("estado") if resultado else None
+        if estado == "captcha":
+            raise CaptchaDetected("CAPTCHA DETECTADO – PAUSADO")
+        if estado == "exito":
+            self.ultimo_link = resultado.get("link")  # type: ignore[union-attr]
+            return True
+        return False
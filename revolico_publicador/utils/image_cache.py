@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+from utils.drive_downloader import extraer_drive_id
+
+INDEX_FILENAME = "index.json"
+DEFAULT_MAX_BYTES = 500 * 1024 * 1024  # 500 MB
+DEFAULT_MAX_AGE_SECONDS = 30 * 24 * 3600  # 30 días
+DEFAULT_REVALIDATE_SECONDS = 24 * 3600  # 1 día
+DEFAULT_PERSISTIR_CADA = 20  # cambios entre escrituras de index.json
+
+
+@dataclass
+class _Blob:
+    ext: str
+    size: int
+    creado: float
+    acceso: float
+
+
+class ImageCache:
+    """Caché persistente de imágenes direccionada por contenido (SHA-1).
+
+    Las URLs (o el FILE_ID de Drive) apuntan a un SHA-1 y cada SHA-1 a un único
+    archivo ``<sha1><ext>``, así que la misma foto usada por varios anuncios se
+    guarda una sola vez. El índice vive en ``index.json`` dentro del directorio
+    y la expulsión es LRU con límite de tamaño y de antigüedad.
+
+    Pasado ``revalidate_seconds`` una entrada deja de servirse directamente y
+    se revalida contra el servidor con su ETag/Last-Modified (304 = sigue valiendo).
+
+    El índice se escribe cada ``persistir_cada`` altas o revalidaciones y al
+    expulsar o cerrar, no en cada cambio. Si el proceso muere antes, las fotos
+    sin entrada en el índice se borran como huérfanas en la siguiente expulsión
+    y se vuelven a descargar cuando hagan falta.
+    """
+
+    def __init__(
+        self,
+        directorio: str | Path,
+        *,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_age_seconds: float = DEFAULT_MAX_AGE_SECONDS,
+        revalidate_seconds: Optional[float] = DEFAULT_REVALIDATE_SECONDS,
+        persistir_cada: int = DEFAULT_PERSISTIR_CADA,
+    ) -> None:
+        self.directorio = Path(directorio)
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.revalidate_seconds = revalidate_seconds
+        self.persistir_cada = max(1, persistir_cada)
+        self._index_path = self.directorio / INDEX_FILENAME
+        self._lock = threading.Lock()
+        self._claves: Dict[str, str] = {}
+        self._blobs: Dict[str, _Blob] = {}
+        self._validadores: Dict[str, Dict[str, str]] = {}
+        self._dirty = False
+        self._cambios = 0
+        self._cargar_indice()
+
+    @staticmethod
+    def clave(url: str) -> str:
+        """Clave de caché: el FILE_ID para Drive, la URL normalizada en otro caso."""
+        drive_id = extraer_drive_id(url)
+        return f"drive:{drive_id}" if drive_id else url.strip()
+
+    def _ruta_blob(self, sha1: str, blob: _Blob) -> Path:
+        return self.directorio / f"{sha1}{blob.ext}"
+
+    def _cargar_indice(self) -> None:
+        try:
+            data = json.loads(self._index_path.read_text(encoding="utf-8"))
+            self._claves = {str(k): str(v) for k, v in data.get("claves", {}).items()}
+            self._blobs = {str(k): _Blob(**v) for k, v in data.get("blobs", {}).items()}
+            self._validadores = {str(k): dict(v) for k, v in data.get("validadores", {}).items()}
+        except FileNotFoundError:
+            return
+        except (ValueError, TypeError, AttributeError):
+            # Índice corrupto: se empieza de cero y los archivos huérfanos se limpian al expulsar
+            self._claves, self._blobs, self._validadores = {}, {}, {}
+
+    def persistir(self) -> None:
+        """Escribe el índice de forma atómica si hubo cambios."""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {
+                "claves": self._claves,
+                "blobs": {sha1: asdict(b) for sha1, b in self._blobs.items()},
+                "validadores": self._validadores,
+            }
+            tmp = self._index_path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(data), encoding="utf-8")
+            os.replace(tmp, self._index_path)
+            self._dirty = False
+            self._cambios = 0
+
+    def cerrar(self) -> None:
+        """Escribe los cambios del índice que aún no se han persistido."""
+        self.persistir()
+
+    def _anotar_cambio(self) -> bool:
+        # Con el lock tomado. True cuando toca escribir el índice
+        self._dirty = True
+        self._cambios += 1
+        return self._cambios >= self.persistir_cada
+
+    def _entrada(self, url: str) -> Optional[tuple[str, _Blob, Path]]:
+        sha1 = self._claves.get(self.clave(url))
+        blob = self._blobs.get(sha1) if sha1 else None
+        if sha1 is None or blob is None:
+            return None
+        path = self._ruta_blob(sha1, blob)
+        if time.time() - blob.creado > self.max_age_seconds or not path.exists():
+            return None
+        return sha1, blob, path
+
+    def obtener(self, url: str) -> Optional[Path]:
+        """Devuelve la ruta local de la imagen si está en caché (sin E/S de red).
+
+        Las entradas pendientes de revalidación no se devuelven.
+        """
+        now = time.time()
+        with self._lock:
+            entrada = self._entrada(url)
+            if entrada is None:
+                return None
+            _, blob, path = entrada
+            if self.revalidate_seconds is not None and now - blob.creado > self.revalidate_seconds:
+                return None
+            blob.acceso = now
+            self._dirty = True
+            return path
+
+    def cabeceras_condicionales(self, url: str) -> Optional[Dict[str, str]]:
+        """Cabeceras If-None-Match/If-Modified-Since para revalidar una entrada."""
+        with self._lock:
+            validadores = self._validadores.get(self.clave(url))
+            if not validadores or self._entrada(url) is None:
+                return None
+            headers: Dict[str, str] = {}
+            if validadores.get("etag"):
+                headers["If-None-Match"] = validadores["etag"]
+            if validadores.get("last_modified"):
+                headers["If-Modified-Since"] = validadores["last_modified"]
+            return headers or None
+
+    def revalidado(self, url: str) -> Optional[Path]:
+        """Marca una entrada como vigente tras un 304 y devuelve su ruta."""
+        now = time.time()
+        with self._lock:
+            entrada = self._entrada(url)
+            if entrada is None:
+                return None
+            _, blob, path = entrada
+            blob.creado = now
+            blob.acceso = now
+            escribir = self._anotar_cambio()
+        if escribir:
+            self.persistir()
+        return path
+
+    def sha1(self, url: str) -> Optional[str]:
+        """SHA-1 del contenido asociado a una URL, si se conoce."""
+        with self._lock:
+            return self._claves.get(self.clave(url))
+
+    def guardar(
+        self,
+        url: str,
+        path: Path,
+        sha1: str,
+        *,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> Path:
+        """Incorpora un archivo descargado a la caché y devuelve su ruta definitiva.
+
+        Si ya existe un archivo con el mismo contenido, el nuevo se descarta.
+        """
+        now = time.time()
+        with self._lock:
+            blob = self._blobs.get(sha1)
+            if blob is not None and self._ruta_blob(sha1, blob).exists():
+                if path.resolve() != self._ruta_blob(sha1, blob).resolve():
+                    path.unlink(missing_ok=True)
+                blob.creado = now
+                blob.acceso = now
+            else:
+                blob = _Blob(ext=path.suffix.lower(), size=path.stat().st_size, creado=now, acceso=now)
+                os.replace(path, self._ruta_blob(sha1, blob))
+                self._blobs[sha1] = blob
+            key = self.clave(url)
+            self._claves[key] = sha1
+            validadores = {k: v for k, v in (("etag", etag), ("last_modified", last_modified)) if v}
+            if validadores:
+                self._validadores[key] = validadores
+            else:
+                self._validadores.pop(key, None)
+            escribir = self._anotar_cambio()
+            final = self._ruta_blob(sha1, blob)
+        if escribir:
+            self.persistir()
+        return final
+
+    def desalojar(self) -> int:
+        """Aplica los límites de antigüedad y tamaño (LRU) y limpia archivos huérfanos.
+
+        Returns:
+            Número de archivos eliminados.
+        """
+        now = time.time()
+        removed = 0
+        with self._lock:
+            expired = [s for s, b in self._blobs.items() if now - b.creado > self.max_age_seconds]
+            by_access = sorted(
+                (s for s in self._blobs if s not in expired), key=lambda s: self._blobs[s].acceso
+            )
+            total = sum(self._blobs[s].size for s in by_access)
+            victims = list(expired)
+            for sha1 in by_access:
+                if total <= self.max_bytes:
+                    break
+                victims.append(sha1)
+                total -= self._blobs[sha1].size
+            for sha1 in victims:
+                self._blobs.pop(sha1)
+                # El original y sus variantes procesadas (<sha1>.<ajustes><ext>)
+                for p in self.directorio.glob(f"{sha1}*"):
+                    p.unlink(missing_ok=True)
+                    removed += 1
+            if victims:
+                gone = set(victims)
+                self._claves = {k: v for k, v in self._claves.items() if v not in gone}
+                self._validadores = {k: v for k, v in self._validadores.items() if k in self._claves}
+                self._dirty = True
+
+            # Archivos que no pertenecen al índice (descargas interrumpidas, etc.)
+            for p in self.directorio.iterdir():
+                if p.is_file() and p.name != INDEX_FILENAME and p.name.split(".")[0] not in self._blobs:
+                    p.unlink(missing_ok=True)
+                    removed += 1
+        self.persistir()
+        return removed
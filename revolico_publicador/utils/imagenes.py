@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+import re
+import tempfile
+from concurrent.futures import Executor
+from dataclasses import astuple, dataclass
+from pathlib import Path
+from typing import Optional
+
+from utils.drive_downloader import sha1_of_file
+
+# Optional Pillow import. Without it images are uploaded as downloaded
+try:  # pragma: no cover - best effort
+    from PIL import Image, ImageOps  # type: ignore
+except Exception:  # pragma: no cover
+    Image = None
+    ImageOps = None
+
+_EXTENSIONES = {"JPEG": ".jpg", "WEBP": ".webp"}
+# Nombre de un archivo de la caché de imágenes: el SHA-1 de su contenido
+SHA1_RE = re.compile(r"[0-9a-f]{40}")
+
+
+@dataclass(frozen=True)
+class PreprocesadoConfig:
+    max_dim: int = 1600
+    formato: str = "JPEG"
+    max_bytes: int = 4 * 1024 * 1024  # Revolico acepta ~5 MB
+    calidad: int = 85
+    calidad_min: int = 50
+
+    def clave(self) -> str:
+        """Identificador corto de los ajustes (forma parte del nombre del archivo)."""
+        return hashlib.sha1(repr(astuple(self)).encode("utf-8")).hexdigest()[:8]
+
+
+def disponible() -> bool:
+    return Image is not None
+
+
+def _codificar(img: "Image.Image", config: PreprocesadoConfig) -> bytes:
+    # Baja la calidad y, si no basta, la resolución hasta caber en max_bytes
+    while True:
+        for calidad in range(config.calidad, config.calidad_min - 1, -10):
+            buf = io.BytesIO()
+            img.save(buf, format=config.formato, quality=calidad, optimize=True)
+            if buf.tell() <= config.max_bytes:
+                return buf.getvalue()
+        if max(img.size) <= 320:
+            return buf.getvalue()
+        img = img.resize((int(img.width * 0.8), int(img.height * 0.8)), Image.LANCZOS)
+
+
+def preprocesar(origen: str | Path, config: PreprocesadoConfig, sha1: Optional[str] = None) -> Path:
+    """Redimensiona, elimina metadatos y recomprime una imagen antes de subirla.
+
+    El resultado se guarda junto al original como ``<sha1>.<ajustes><ext>``, de
+    modo que cada imagen se procesa una sola vez por combinación de ajustes.
+    Sin Pillow, o si la imagen no se puede abrir, se devuelve el original.
+
+    Args:
+        origen: Ruta de la imagen descargada.
+        config: Ajustes de tamaño, formato y peso.
+        sha1: Hash del original si ya se conoce (evita releer el archivo).
+    """
+    src = Path(origen)
+    if Image is None:
+        return src
+    sha1 = sha1 or sha1_of_file(src)
+    dest = src.with_name(f"{sha1}.{config.clave()}{_EXTENSIONES.get(config.formato, '.jpg')}")
+    if dest.exists():
+        return dest
+
+    try:
+        with Image.open(src) as img:
+            # Aplicar la orientación EXIF antes de descartar los metadatos
+            img = ImageOps.exif_transpose(img)
+            img = img.convert("RGB")
+            img.thumbnail((config.max_dim, config.max_dim), Image.LANCZOS)
+            data = _codificar(img, config)
+    except (OSError, ValueError):
+        return src
+
+    fd, tmp_name = tempfile.mkstemp(dir=src.parent, prefix=".proc_", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_name, dest)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+    return dest
+
+
+class Preprocesador:
+    """Aplica ``preprocesar`` opcionalmente en un pool de procesos.
+
+    Pensado para usarse desde los hilos del prefetcher: el redimensionado (CPU)
+    corre en otro proceso y nunca bloquea el bucle de publicación.
+    """
+
+    def __init__(self, config: PreprocesadoConfig, pool: Optional[Executor] = None) -> None:
+        self.config = config
+        self._pool = pool
+
+    def procesar(self, origen: Path) -> Path:
+        # En la caché de imágenes el nombre del archivo ya es su SHA-1
+        sha1 = origen.stem if SHA1_RE.fullmatch(origen.stem) else None
+        if self._pool is None:
+            return preprocesar(origen, self.config, sha1)
+        return self._pool.submit(preprocesar, origen, self.config, sha1).result()
+
+    def cerrar(self) -> None:
+        # Se esperan los trabajos en curso: así no quedan procesos huérfanos ni temporales .part
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import unicodedata
+from typing import Dict, List, Tuple
+
+# División político-administrativa de Cuba (15 provincias + municipio especial, 168 municipios).
+# Los nombres son los que muestran los desplegables del formulario.
+MUNICIPIOS_POR_PROVINCIA: Dict[str, List[str]] = {
+    "Pinar del Río": [
+        "Consolación del Sur", "Guane", "La Palma", "Los Palacios", "Mantua", "Minas de Matahambre",
+        "Pinar del Río", "San Juan y Martínez", "San Luis", "Sandino", "Viñales",
+    ],
+    "Artemisa": [
+        "Alquízar", "Artemisa", "Bahía Honda", "Bauta", "Caimito", "Candelaria", "Guanajay",
+        "Güira de Melena", "Mariel", "San Antonio de los Baños", "San Cristóbal",
+    ],
+    "La Habana": [
+        "Arroyo Naranjo", "Boyeros", "Centro Habana", "Cerro", "Cotorro", "Diez de Octubre", "Guanabacoa",
+        "La Habana del Este", "La Habana Vieja", "La Lisa", "Marianao", "Playa", "Plaza de la Revolución",
+        "Regla", "San Miguel del Padrón",
+    ],
+    "Mayabeque": [
+        "Batabanó", "Bejucal", "Güines", "Jaruco", "Madruga", "Melena del Sur", "Nueva Paz", "Quivicán",
+        "San José de las Lajas", "San Nicolás", "Santa Cruz del Norte",
+    ],
+    "Matanzas": [
+        "Calimete", "Cárdenas", "Ciénaga de Zapata", "Colón", "Jagüey Grande", "Jovellanos", "Limonar",
+        "Los Arabos", "Martí", "Matanzas", "Pedro Betancourt", "Perico", "Unión de Reyes",
+    ],
+    "Cienfuegos": [
+        "Abreus", "Aguada de Pasajeros", "Cienfuegos", "Cruces", "Cumanayagua", "Lajas", "Palmira", "Rodas",
+    ],
+    "Villa Clara": [
+        "Caibarién", "Camajuaní", "Cifuentes", "Corralillo", "Encrucijada", "Manicaragua", "Placetas",
+        "Quemado de Güines", "Ranchuelo", "Remedios", "Sagua la Grande", "Santa Clara", "Santo Domingo",
+    ],
+    "Sancti Spíritus": [
+        "Cabaiguán", "Fomento", "Jatibonico", "La Sierpe", "Sancti Spíritus", "Taguasco", "Trinidad", "Yaguajay",
+    ],
+    "Ciego de Ávila": [
+        "Baraguá", "Bolivia", "Chambas", "Ciego de Ávila", "Ciro Redondo", "Florencia", "Majagua", "Morón",
+        "Primero de Enero", "Venezuela",
+    ],
+    "Camagüey": [
+        "Camagüey", "Carlos Manuel de Céspedes", "Esmeralda", "Florida", "Guáimaro", "Jimaguayú", "Minas",
+        "Najasa", "Nuevitas", "Santa Cruz del Sur", "Sibanicú", "Sierra de Cubitas", "Vertientes",
+    ],
+    "Las Tunas": [
+        "Amancio", "Colombia", "Jesús Menéndez", "Jobabo", "Las Tunas", "Majibacoa", "Manatí", "Puerto Padre",
+    ],
+    "Holguín": [
+        "Antilla", "Báguanos", "Banes", "Cacocum", "Calixto García", "Cueto", "Frank País", "Gibara", "Holguín",
+        "Mayarí", "Moa", "Rafael Freyre", "Sagua de Tánamo", "Urbano Noris",
+    ],
+    "Granma": [
+        "Bartolomé Masó", "Bayamo", "Buey Arriba", "Campechuela", "Cauto Cristo", "Guisa", "Jiguaní",
+        "Manzanillo", "Media Luna", "Niquero", "Pilón", "Río Cauto", "Yara",
+    ],
+    "Santiago de Cuba": [
+        "Contramaestre", "Guamá", "Mella", "Palma Soriano", "San Luis", "Santiago de Cuba", "Segundo Frente",
+        "Songo-La Maya", "Tercer Frente",
+    ],
+    "Guantánamo": [
+        "Baracoa", "Caimanera", "El Salvador", "Guantánamo", "Imías", "Maisí", "Manuel Tames", "Niceto Pérez",
+        "San Antonio del Sur", "Yateras",
+    ],
+    "Isla de la Juventud": ["Isla de la Juventud"],
+}
+
+# Nombres alternativos habituales en las hojas
+ALIAS_PROVINCIA: Dict[str, str] = {
+    "Habana": "La Habana",
+    "Ciudad de La Habana": "La Habana",
+    "Ciudad Habana": "La Habana",
+    "Isla de Pinos": "Isla de la Juventud",
+}
+ALIAS_MUNICIPIO: Dict[str, str] = {
+    "Habana del Este": "La Habana del Este",
+    "Habana Vieja": "La Habana Vieja",
+    "Plaza": "Plaza de la Revolución",
+    "10 de Octubre": "Diez de Octubre",
+    "Songo La Maya": "Songo-La Maya",
+}
+
+
+def normalizar_nombre(texto: str) -> str:
+    """Forma de comparación: sin tildes, minúsculas y espacios simples."""
+    sin_tildes = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii")
+    return " ".join(sin_tildes.casefold().split())
+
+
+def tabla_provincias() -> Dict[str, str]:
+    """Nombre normalizado (o alias) -> nombre canónico de la provincia."""
+    tabla = {normalizar_nombre(p): p for p in MUNICIPIOS_POR_PROVINCIA}
+    tabla.update({normalizar_nombre(a): p for a, p in ALIAS_PROVINCIA.items()})
+    return tabla
+
+
+def tabla_municipios() -> Dict[str, Tuple[str, str]]:
+    """Clave ``provincia|municipio`` normalizada -> (provincia, municipio) canónicos."""
+    tabla: Dict[str, Tuple[str, str]] = {}
+    for provincia, municipios in MUNICIPIOS_POR_PROVINCIA.items():
+        for municipio in municipios:
+            tabla[f"{normalizar_nombre(provincia)}|{normalizar_nombre(municipio)}"] = (provincia, municipio)
+    for alias, municipio in ALIAS_MUNICIPIO.items():
+        for provincia, municipios in MUNICIPIOS_POR_PROVINCIA.items():
+            if municipio in municipios:
+                tabla[f"{normalizar_nombre(provincia)}|{normalizar_nombre(alias)}"] = (provincia, municipio)
+    return tabla
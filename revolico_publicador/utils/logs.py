@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import json
+import logging
+import queue
+import sys
+from logging.handlers import MemoryHandler, QueueHandler, QueueListener
+from pathlib import Path
+from typing import List, Optional
+
+# Valor del campo estructurado ``evento`` (extra={"evento": ...}) de cada anuncio publicado
+EVENTO_PUBLICADO = "publicado"
+# Campos estructurados que se copian al log JSON cuando el registro los trae
+CAMPOS_EXTRA = ("evento", "fila", "titulo", "duracion", "link")
+DEFAULT_BUFFER = 50
+
+_FORMATO = logging.Formatter("%(asctime)s | %(levelname)s | %(message)s", datefmt="%Y-%m-%d %H:%M")
+
+
+class _SoloEvento(logging.Filter):
+    def __init__(self, evento: str) -> None:
+        super().__init__()
+        self.evento = evento
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return getattr(record, "evento", None) == self.evento
+
+
+class FormatoJSON(logging.Formatter):
+    """Una línea JSON por registro, con los campos estructurados que traiga."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {"ts": record.created, "nivel": record.levelname, "mensaje": record.getMessage()}
+        for campo in CAMPOS_EXTRA:
+            valor = getattr(record, campo, None)
+            if valor is not None:
+                data[campo] = valor
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def _archivo(path: Path, nivel: int, formato: logging.Formatter, buffer: int) -> MemoryHandler:
+    # Escritura en bloque: se vuelca cada ``buffer`` registros, ante un ERROR o al cerrar
+    destino = logging.FileHandler(path, encoding="utf-8", delay=True)
+    destino.setFormatter(formato)
+    memoria = MemoryHandler(buffer, flushLevel=logging.ERROR, target=destino)
+    memoria.setLevel(nivel)
+    return memoria
+
+
+def configurar_logging(
+    logger: logging.Logger,
+    errores: Path,
+    publicados: Path,
+    *,
+    json_path: Optional[Path] = None,
+    buffer: int = DEFAULT_BUFFER,
+) -> QueueListener:
+    """Conecta el logger a una cola atendida por un hilo propio.
+
+    El hilo que registra solo encola el registro; consola y archivos se escriben
+    desde el ``QueueListener``. Los archivos se escriben en bloque y el de
+    publicados recibe solo los registros con ``extra={"evento": EVENTO_PUBLICADO}``.
+
+    Returns:
+        El listener ya arrancado; llamar a ``detener_logging`` al terminar.
+    """
+    consola = logging.StreamHandler(sys.stdout)
+    consola.setLevel(logging.INFO)
+    consola.setFormatter(_FORMATO)
+
+    publicados_handler = _archivo(publicados, logging.INFO, _FORMATO, buffer)
+    publicados_handler.addFilter(_SoloEvento(EVENTO_PUBLICADO))
+    handlers: List[logging.Handler] = [consola, _archivo(errores, logging.WARNING, _FORMATO, buffer), publicados_handler]
+    if json_path is not None:
+        handlers.append(_archivo(json_path, logging.INFO, FormatoJSON(), buffer))
+
+    cola: queue.SimpleQueue = queue.SimpleQueue()
+    for h in list(logger.handlers):
+        logger.removeHandler(h)
+    logger.addHandler(QueueHandler(cola))
+    logger.propagate = False
+    listener = QueueListener(cola, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+def volcar_logs(listener: QueueListener) -> None:
+    """Fuerza la escritura de lo que haya en los búferes (p. ej. al terminar un lote)."""
+    for h in listener.handlers:
+        h.flush()
+
+
+def detener_logging(listener: QueueListener) -> None:
+    """Procesa lo pendiente en la cola, vuelca los búferes y cierra los archivos."""
+    listener.stop()
+    for h in listener.handlers:
+        destino = h.target if isinstance(h, MemoryHandler) else None
+        h.close()
+        if destino is not None:
+            destino.close()
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+
+PREFIJO_PROMETHEUS = "revolico"
+
+# Registro del anuncio en curso. ContextVar en lugar de threading.local: funciona
+# igual en el hilo de publicación y en cada tarea de asyncio.
+_anuncio_actual: ContextVar[Optional[Dict[str, object]]] = ContextVar("anuncio_actual", default=None)
+
+
+def percentiles(valores: Sequence[float]) -> Dict[str, float]:
+    """p50/p95/max (nearest-rank) de una serie de tiempos en segundos."""
+    if not valores:
+        return {"n": 0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+    orden = sorted(valores)
+
+    def rango(p: float) -> float:
+        return orden[max(0, math.ceil(p * len(orden)) - 1)]
+
+    return {"n": len(orden), "p50": rango(0.50), "p95": rango(0.95), "max": orden[-1]}
+
+
+class Metricas:
+    """Temporizadores y contadores por etapa, baratos para dejarlos siempre activos.
+
+    Cada medición cuesta dos ``perf_counter`` y un append bajo un lock. Las
+    duraciones se acumulan por lote (para el resumen p50/p95/max) y en totales
+    de la ejecución (para Prometheus). Si hay un anuncio en curso
+    (``anuncio()``), se suman también a su registro, que se escribe como una
+    línea JSONL al terminar el anuncio.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._lote: Dict[str, List[float]] = {}
+        self._suma: Dict[str, float] = {}
+        self._cuenta: Dict[str, int] = {}
+        self._contadores: Dict[str, float] = {}
+        self._jsonl = None
+        self._prometheus: Optional[Path] = None
+        self.activo = True
+
+    def configurar(self, *, jsonl: Optional[str | Path] = None, prometheus: Optional[str | Path] = None) -> None:
+        """Destinos de exportación: JSONL por anuncio y textfile de Prometheus (node_exporter)."""
+        self.cerrar()
+        if jsonl is not None:
+            Path(jsonl).parent.mkdir(parents=True, exist_ok=True)
+            self._jsonl = Path(jsonl).open("a", encoding="utf-8")
+        self._prometheus = Path(prometheus) if prometheus is not None else None
+
+    def registrar(self, nombre: str, segundos: float, *, por_anuncio: bool = True) -> None:
+        if not self.activo:
+            return
+        with self._lock:
+            self._lote.setdefault(nombre, []).append(segundos)
+            self._suma[nombre] = self._suma.get(nombre, 0.0) + segundos
+            self._cuenta[nombre] = self._cuenta.get(nombre, 0) + 1
+        actual = _anuncio_actual.get() if por_anuncio else None
+        if actual is not None:
+            etapas = actual["etapas"]
+            etapas[nombre] = etapas.get(nombre, 0.0) + segundos  # type: ignore[union-attr]
+
+    @contextmanager
+    def etapa(self, nombre: str, *, por_anuncio: bool = True) -> Iterator[None]:
+        """Mide la duración del bloque como etapa ``nombre`` (también si lanza excepción)."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar(nombre, time.perf_counter() - t0, por_anuncio=por_anuncio)
+
+    def contar(self, nombre: str, n: float = 1, *, por_anuncio: bool = True) -> None:
+        if not self.activo:
+            return
+        with self._lock:
+            self._contadores[nombre] = self._contadores.get(nombre, 0) + n
+        actual = _anuncio_actual.get() if por_anuncio else None
+        if actual is not None:
+            contadores = actual["contadores"]
+            contadores[nombre] = contadores.get(nombre, 0) + n  # type: ignore[union-attr]
+
+    @contextmanager
+    def anuncio(self, idx: object, titulo: str = "") -> Iterator[Dict[str, object]]:
+        """Abre el registro de un anuncio; ``registro["estado"]`` se puede fijar dentro del bloque."""
+        registro: Dict[str, object] = {"fila": idx, "titulo": titulo, "estado": "error", "etapas": {}, "contadores": {}}
+        token = _anuncio_actual.set(registro)
+        t0 = time.perf_counter()
+        try:
+            yield registro
+        finally:
+            _anuncio_actual.reset(token)
+            total = time.perf_counter() - t0
+            registro["total"] = total
+            registro["ts"] = time.time()
+            self.registrar("anuncio", total, por_anuncio=False)
+            self.contar(f"anuncios_{registro['estado']}", por_anuncio=False)
+            if self._jsonl is not None and self.activo:
+                line = json.dumps(registro, ensure_ascii=False, default=str) + "\n"
+                with self._lock:
+                    self._jsonl.write(line)
+
+    def resumen_lote(self) -> str:
+        """Resumen p50/p95/max por etapa desde el último resumen; exporta y reinicia las muestras del lote."""
+        with self._lock:
+            lote, self._lote = self._lote, {}
+        lineas = []
+        for nombre, valores in sorted(lote.items()):
+            p = percentiles(valores)
+            lineas.append(f"  {nombre:<16} p50={p['p50']:.3f}s p95={p['p95']:.3f}s max={p['max']:.3f}s (n={p['n']})")
+        self.exportar()
+        return "\n".join(["Tiempos por etapa del lote:", *lineas]) if lineas else "Sin mediciones en el lote"
+
+    def exportar(self) -> None:
+        """Vuelca el JSONL y reescribe (atómicamente) el textfile de Prometheus."""
+        with self._lock:
+            if self._jsonl is not None:
+                self._jsonl.flush()
+            if self._prometheus is None:
+                return
+            p = PREFIJO_PROMETHEUS
+            lineas = [f"# TYPE {p}_etapa_segundos summary"]
+            for nombre in sorted(self._suma):
+                lineas.append(f'{p}_etapa_segundos_sum{{etapa="{nombre}"}} {self._suma[nombre]:.6f}')
+                lineas.append(f'{p}_etapa_segundos_count{{etapa="{nombre}"}} {self._cuenta[nombre]}')
+            lineas.append(f"# TYPE {p}_eventos_total counter")
+            for nombre in sorted(self._contadores):
+                lineas.append(f'{p}_eventos_total{{evento="{nombre}"}} {self._contadores[nombre]:g}')
+            lineas.append(f"# TYPE {p}_ultima_exportacion_segundos gauge")
+            lineas.append(f"{p}_ultima_exportacion_segundos {time.time():.0f}")
+            destino = self._prometheus
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        tmp = destino.with_suffix(".tmp")
+        tmp.write_text("\n".join(lineas) + "\n", encoding="utf-8")
+        os.replace(tmp, destino)
+
+    def cerrar(self) -> None:
+        if self._jsonl is not None:
+            self.exportar()
+            self._jsonl.close()
+            self._jsonl = None
+
+
+# Instancia compartida por main, el publicador y el descargador
+METRICAS = Metricas()
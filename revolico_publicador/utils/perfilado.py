@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import cProfile
+import functools
+import io
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Raíz del proyecto: su tiempo se agrupa por módulo (main, utils.csv_parser...) y el de terceros por paquete
+_RAIZ = Path(__file__).resolve().parent.parent
+_FILTRO_MEMORIA = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def _paquete(archivo: str) -> str:
+    # "…/site-packages/pandas/core/frame.py" -> "pandas"; "…/utils/csv_parser.py" -> "utils.csv_parser"
+    if archivo.startswith("~") or archivo.startswith("<"):
+        return "builtins"
+    p = Path(archivo)
+    partes = p.parts
+    for marca in ("site-packages", "dist-packages"):
+        if marca in partes:
+            resto = partes[partes.index(marca) + 1 :]
+            return resto[0].removesuffix(".py") if resto else marca
+    try:
+        relativo = p.resolve().relative_to(_RAIZ)
+    except (OSError, ValueError):
+        return "stdlib"
+    return ".".join(relativo.with_suffix("").parts[:2])
+
+
+class Perfilador:
+    """Perfilado opcional de una ejecución (``--profile``); inactivo no cuesta nada.
+
+    - CPU: cProfile en el hilo principal y en cada hilo que ejecute una función
+      ``envolver``-ada (las descargas del prefetcher); en Python 3.12+ solo puede
+      haber un cProfile activo y el del hilo principal ya ve todos los hilos, así
+      que no se crean más. El tiempo de pared de esas funciones se cronometra
+      siempre. Al terminar se escribe un
+      ``.prof`` combinado (``python -m pstats`` / snakeviz) y un resumen con el
+      top por tiempo acumulado y el tiempo propio agrupado por paquete.
+    - Memoria: tracemalloc con una instantánea al cerrar cada ``fase`` (lotes y
+      guardado); se anota el top de diferencias respecto a la instantánea anterior.
+    - Navegador: ``navegador()`` separa el tiempo de pared de cada llamada a
+      Playwright en CPU de Python (``thread_time``) y espera al navegador; las
+      pausas deliberadas del formulario (``pausa()``) se descuentan de la espera.
+    """
+
+    def __init__(self) -> None:
+        self.cpu = False
+        self.memoria = False
+        self.top = 25
+        self._directorio = Path("logs")
+        self._sello = ""
+        self._lock = threading.Lock()
+        self._principal: Optional[cProfile.Profile] = None
+        self._hilos: List[cProfile.Profile] = []
+        self._por_hilo = True
+        self._trabajo: Dict[str, float] = {"pared": 0.0, "llamadas": 0}
+        self._local = threading.local()
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+        self._navegador: Dict[str, float] = {"pared": 0.0, "cpu": 0.0, "pausas": 0.0, "llamadas": 0}
+        self._inicio = (0.0, 0.0)
+
+    @property
+    def activo(self) -> bool:
+        return self.cpu or self.memoria
+
+    def configurar(self, directorio: str | Path, *, cpu: bool = False, memoria: bool = False, top: int = 25) -> None:
+        self.cpu = cpu
+        self.memoria = memoria
+        self.top = top
+        self._directorio = Path(directorio)
+        self._sello = f"{datetime.now():%Y%m%d_%H%M%S}"
+
+    @property
+    def ruta_prof(self) -> Path:
+        return self._directorio / f"perfil_{self._sello}.prof"
+
+    @property
+    def ruta_resumen(self) -> Path:
+        return self._directorio / f"perfil_{self._sello}.txt"
+
+    @property
+    def ruta_memoria(self) -> Path:
+        return self._directorio / f"memoria_{self._sello}.txt"
+
+    def iniciar(self) -> None:
+        if not self.activo:
+            return
+        self._directorio.mkdir(parents=True, exist_ok=True)
+        self._inicio = (time.perf_counter(), time.process_time())
+        if self.memoria:
+            # Un marco por asignación basta para agrupar por línea y abarata cada instantánea
+            tracemalloc.start(1)
+            self._snapshot = tracemalloc.take_snapshot().filter_traces(_FILTRO_MEMORIA)
+        if self.cpu:
+            self._por_hilo = True
+            self._principal = cProfile.Profile()
+            self._principal.enable()
+
+    def envolver(self, fn: Callable[..., T]) -> Callable[..., T]:
+        """Perfila ``fn`` en el hilo donde se ejecute (un cProfile por hilo) y cronometra cada llamada."""
+        if not self.cpu:
+            return fn
+
+        @functools.wraps(fn)
+        def perfilada(*args: object, **kwargs: object) -> T:
+            perfil = self._perfil_hilo()
+            if perfil is not None:
+                perfil.enable()
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                if perfil is not None:
+                    perfil.disable()
+                with self._lock:
+                    self._trabajo["pared"] += time.perf_counter() - t0
+                    self._trabajo["llamadas"] += 1
+
+        return perfilada
+
+    def _perfil_hilo(self) -> Optional[cProfile.Profile]:
+        # En el hilo principal ya está activo _principal: un segundo perfil lo desactivaría
+        if not self._por_hilo or threading.current_thread() is threading.main_thread():
+            return None
+        perfil = getattr(self._local, "perfil", None)
+        if perfil is None:
+            perfil = cProfile.Profile()
+            try:
+                perfil.enable()
+            except ValueError:
+                # "Another profiling tool is already active": cProfile sobre sys.monitoring
+                # (3.12+). El perfil del hilo principal ya registra este hilo.
+                self._por_hilo = False
+                return None
+            perfil.disable()
+            self._local.perfil = perfil
+            with self._lock:
+                self._hilos.append(perfil)
+        return perfil
+
+    @contextmanager
+    def navegador(self) -> Iterator[None]:
+        """Cuenta el bloque como llamada a Playwright: pared y CPU de Python por separado."""
+        if not self.activo:
+            yield
+            return
+        t0, c0 = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._navegador["pared"] += time.perf_counter() - t0
+                self._navegador["cpu"] += time.thread_time() - c0
+                self._navegador["llamadas"] += 1
+
+    @contextmanager
+    def pausa(self) -> Iterator[None]:
+        """Marca una espera deliberada (ritmo humano) dentro de ``navegador()``."""
+        if not self.activo:
+            yield
+            return
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._navegador["pausas"] += time.perf_counter() - t0
+
+    @contextmanager
+    def fase(self, nombre: str) -> Iterator[None]:
+        """Al salir del bloque, anota el top-N de asignaciones nuevas desde la fase anterior."""
+        try:
+            yield
+        finally:
+            if self.memoria and tracemalloc.is_tracing():
+                self._anotar_memoria(nombre)
+
+    def _anotar_memoria(self, nombre: str) -> None:
+        # La instantánea no debe aparecer en el perfil de CPU
+        if self._principal is not None:
+            self._principal.disable()
+        try:
+            snapshot = tracemalloc.take_snapshot().filter_traces(_FILTRO_MEMORIA)
+        finally:
+            if self._principal is not None:
+                self._principal.enable()
+        actual, pico = tracemalloc.get_traced_memory()
+        lineas = [f"== {nombre} ({datetime.now():%H:%M:%S}) actual={actual / 2**20:.1f} MiB pico={pico / 2**20:.1f} MiB"]
+        if self._snapshot is not None:
+            for diff in snapshot.compare_to(self._snapshot, "lineno")[: self.top]:
+                lineas.append(f"  {diff}")
+        self._snapshot = snapshot
+        with self.ruta_memoria.open("a", encoding="utf-8") as f:
+            f.write("\n".join(lineas) + "\n\n")
+
+    def detener(self) -> Optional[str]:
+        """Cierra el perfilado, escribe los archivos en ``logs/`` y devuelve el resumen."""
+        if not self.activo:
+            return None
+        pared = time.perf_counter() - self._inicio[0]
+        cpu = time.process_time() - self._inicio[1]
+        navegador = dict(self._navegador)
+        espera = navegador["pared"] - navegador["cpu"] - navegador["pausas"]
+        lineas = [
+            f"Pared total: {pared:.1f}s | CPU del proceso (todos los hilos): {cpu:.1f}s",
+            f"Playwright: {int(navegador['llamadas'])} llamadas, {navegador['pared']:.1f}s de pared = "
+            f"{espera:.1f}s esperando al navegador + {navegador['cpu']:.1f}s de CPU de Python"
+            f" + {navegador['pausas']:.1f}s de pausas del formulario",
+        ]
+        if self._trabajo["llamadas"]:
+            lineas.append(
+                f"Hilos de trabajo (descargas, preprocesado, escrituras): {int(self._trabajo['llamadas'])} llamadas, "
+                f"{self._trabajo['pared']:.1f}s de pared"
+            )
+        if self.memoria and tracemalloc.is_tracing():
+            self._anotar_memoria("fin")
+            tracemalloc.stop()
+            lineas.append(f"Diferencias de memoria por fase: {self.ruta_memoria}")
+        if self._principal is not None:
+            self._principal.disable()
+            stats = pstats.Stats(self._principal)
+            with self._lock:
+                hilos, self._hilos = self._hilos, []
+            for perfil in hilos:
+                stats.add(perfil)
+            stats.dump_stats(self.ruta_prof)
+            lineas.append(f"Perfil de CPU: {self.ruta_prof}")
+            self._escribir_resumen(stats, lineas)
+            self._principal = None
+        return "\n".join(lineas)
+
+    def _escribir_resumen(self, stats: pstats.Stats, lineas: List[str]) -> None:
+        por_paquete: Dict[str, float] = {}
+        for (archivo, _, _), (_, _, tottime, _, _) in stats.stats.items():  # type: ignore[attr-defined]
+            clave = _paquete(archivo)
+            por_paquete[clave] = por_paquete.get(clave, 0.0) + tottime
+        orden = sorted(por_paquete.items(), key=lambda kv: -kv[1])[: self.top]
+        tabla = [f"  {k:<28} {v:8.2f}s" for k, v in orden]
+        salida = io.StringIO()
+        stats.stream = salida  # type: ignore[attr-defined]
+        stats.sort_stats("cumulative").print_stats(self.top)
+        texto = "\n".join([*lineas, "", "Tiempo propio por paquete:", *tabla, "", salida.getvalue()])
+        self.ruta_resumen.write_text(texto, encoding="utf-8")
+        lineas.append("Tiempo propio por paquete: " + ", ".join(f"{k} {v:.2f}s" for k, v in orden[:5]))
+        lineas.append(f"Resumen: {self.ruta_resumen}")
+
+
+# Instancia compartida: main la configura con --profile
+PERFIL = Perfilador()
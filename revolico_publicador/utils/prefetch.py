@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Awaitable, Callable, Deque, Dict, Generic, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+from utils.drive_downloader import MAX_FILE_SIZE_BYTES
+from utils.image_cache import ImageCache
+
+T = TypeVar("T")
+
+
+@dataclass
+class ResultadoDescarga:
+    """Resultado de la descarga de una foto."""
+
+    path: Optional[Path] = None
+    error: Optional[BaseException] = None
+
+
+class ImagePrefetcher(Generic[T]):
+    """Descarga en segundo plano las fotos de las próximas filas pendientes.
+
+    Mientras el navegador publica la fila actual, un pool de hilos acotado ya
+    descarga las fotos de las ``profundidad`` filas siguientes. Las fotos de una
+    misma fila se descargan a la vez (hasta ``workers``), así que un anuncio con
+    varias fotos tarda casi lo mismo que uno con una. Los resultados se entregan
+    en el mismo orden de entrada y los fallos se reportan por foto (nunca cortan
+    la iteración). La misma foto pedida por varias filas mientras su descarga
+    sigue en curso (misma ``ImageCache.clave``) se descarga una sola vez.
+    """
+
+    def __init__(
+        self,
+        descargar_fn: Callable[[str], Path],
+        *,
+        workers: int = 2,
+        profundidad: int = 4,
+        max_bytes_en_vuelo: Optional[int] = None,
+    ) -> None:
+        if workers <= 0 or profundidad <= 0:
+            raise ValueError("workers y profundidad deben ser > 0")
+        self.profundidad = profundidad
+        # Cada descarga puede ocupar hasta MAX_FILE_SIZE_BYTES en disco
+        self._max_descargas = (
+            max(1, max_bytes_en_vuelo // MAX_FILE_SIZE_BYTES) if max_bytes_en_vuelo is not None else None
+        )
+        self._descargar = descargar_fn
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self._en_vuelo: Dict[str, Future[Path]] = {}
+
+    def iterar(self, items: Iterable[Tuple[T, Sequence[str]]]) -> Iterator[Tuple[T, List[ResultadoDescarga]]]:
+        """Recorre pares (item, urls) devolviendo (item, resultados) en orden.
+
+        Hay un resultado por URL, en el mismo orden; las filas sin URL producen
+        una lista vacía. Con ``max_bytes_en_vuelo`` se limita además el número
+        de descargas pendientes (la fila actual siempre se descarga).
+        """
+        it = iter(items)
+        pending: Deque[Tuple[T, List[Future[Path]]]] = deque()
+        en_vuelo = 0
+
+        def fill() -> None:
+            nonlocal en_vuelo
+            while len(pending) < self.profundidad:
+                if pending and self._max_descargas is not None and en_vuelo >= self._max_descargas:
+                    return
+                try:
+                    item, urls = next(it)
+                except StopIteration:
+                    return
+                futs = [self._enviar(url) for url in urls]
+                en_vuelo += len(futs)
+                pending.append((item, futs))
+
+        try:
+            fill()
+            while pending:
+                item, futs = pending.popleft()
+                en_vuelo -= len(futs)
+                # Mantener la cola llena antes de bloquear en la fila actual
+                fill()
+                yield item, [self._resultado(fut) for fut in futs]
+        finally:
+            for _, futs in pending:
+                for fut in futs:
+                    fut.cancel()
+
+    def _enviar(self, url: str) -> Future[Path]:
+        clave = ImageCache.clave(url)
+        with self._lock:
+            fut = self._en_vuelo.get(clave)
+            if fut is not None:
+                return fut
+            fut = self._en_vuelo[clave] = self._pool.submit(self._descargar, url)
+        # Fuera del lock: si ya terminó, el callback se ejecuta aquí mismo
+        fut.add_done_callback(functools.partial(self._terminada, clave))
+        return fut
+
+    def _terminada(self, clave: str, fut: Future[Path]) -> None:
+        with self._lock:
+            if self._en_vuelo.get(clave) is fut:
+                del self._en_vuelo[clave]
+
+    @staticmethod
+    def _resultado(fut: Future[Path]) -> ResultadoDescarga:
+        try:
+            return ResultadoDescarga(path=fut.result())
+        except Exception as e:  # noqa: BLE001
+            return ResultadoDescarga(error=e)
+
+    def cerrar(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def unir_descargas_async(descargar_fn: Callable[[str], Awaitable[Path]]) -> Callable[[str], Awaitable[Path]]:
+    """Equivalente asíncrono: las peticiones simultáneas de la misma foto comparten una tarea."""
+    en_vuelo: Dict[str, asyncio.Future[Path]] = {}
+
+    def terminada(clave: str, tarea: asyncio.Future[Path]) -> None:
+        if en_vuelo.get(clave) is tarea:
+            del en_vuelo[clave]
+        if not tarea.cancelled():
+            # Marca la excepción como recogida aunque todos los anuncios que la esperaban se hayan cancelado
+            tarea.exception()
+
+    def obtener(url: str) -> Awaitable[Path]:
+        clave = ImageCache.clave(url)
+        tarea = en_vuelo.get(clave)
+        if tarea is None:
+            tarea = en_vuelo[clave] = asyncio.ensure_future(descargar_fn(url))
+            tarea.add_done_callback(functools.partial(terminada, clave))
+        # shield: cancelar la espera de un anuncio no cancela la descarga que comparte con otro
+        return asyncio.shield(tarea)
+
+    return obtener
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Mapping
+
+# Columnas que definen el contenido de un anuncio (excluye el estado de publicación)
+CONTENT_COLUMNS = [
+    "Categoria",
+    "Subcategoria",
+    "Fotos",
+    "Precio",
+    "Moneda",
+    "Titulo",
+    "Descripcion",
+    "Provincia",
+    "Municipio",
+    "Telefono",
+    "Email",
+]
+
+ESTADO_PUBLICADO = "publicado"
+
+
+def _texto_celda(value: object) -> str:
+    # Normaliza el valor de una celda para que pandas y openpyxl produzcan el mismo texto
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        if math.isnan(value):
+            return ""
+        if value.is_integer():
+            return str(int(value))
+    return str(value).strip()
+
+
+def huella_fila(row: Mapping[str, object]) -> str:
+    """Calcula el hash de contenido (SHA-1) de una fila del Excel."""
+    sha1 = hashlib.sha1()
+    sha1.update("\x1f".join(_texto_celda(row.get(col)) for col in CONTENT_COLUMNS).encode("utf-8"))
+    return sha1.hexdigest()
+
+
+def ruta_journal(excel_path: str | Path) -> Path:
+    """Ruta del diario de progreso asociado a un Excel (junto al archivo)."""
+    p = Path(excel_path)
+    return p.with_name(p.name + ".progreso.jsonl")
+
+
+class ProgresoJournal:
+    """Diario append-only (JSONL) con el progreso de publicación por fila.
+
+    Cada anuncio publicado añade una línea con el índice de fila y el hash de su
+    contenido, de modo que el coste por anuncio es O(1) y nada se pierde ante un
+    cierre abrupto. El Excel solo se reescribe al compactar.
+    """
+
+    def __init__(self, path: str | Path, *, fsync: bool = True) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fsync = fsync
+        self._lock = threading.Lock()
+        self._fh = self.path.open("a", encoding="utf-8")
+
+    def registrar(self, idx: int, huella: str, *, estado: str = ESTADO_PUBLICADO, **extra: object) -> None:
+        entry: Dict[str, object] = {"fila": int(idx), "huella": huella, "estado": estado, "ts": time.time()}
+        entry.update({k: v for k, v in extra.items() if v is not None})
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._fh.write(line)
+            self._fh.flush()
+            if self._fsync:
+                os.fsync(self._fh.fileno())
+
+    def entradas(self) -> Dict[int, Dict[str, object]]:
+        """Devuelve la última entrada registrada por fila."""
+        result: Dict[int, Dict[str, object]] = {}
+        if not self.path.exists():
+            return result
+        with self.path.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    result[int(entry["fila"])] = entry
+                except (ValueError, KeyError, TypeError):
+                    # Línea truncada por un cierre abrupto: se ignora
+                    continue
+        return result
+
+    def publicadas(self) -> Dict[int, Dict[str, object]]:
+        return {idx: e for idx, e in self.entradas().items() if e.get("estado") == ESTADO_PUBLICADO}
+
+    def vacio(self) -> bool:
+        return not self.path.exists() or self.path.stat().st_size == 0
+
+    def vaciar(self, conservar: Iterable[Mapping[str, object]] = ()) -> None:
+        """Trunca el diario (tras volcar su contenido al Excel), dejando solo ``conservar``.
+
+        El nuevo contenido se escribe en un temporal que reemplaza al diario de forma
+        atómica: un cierre abrupto deja el diario anterior o el nuevo, nunca uno a medias.
+        """
+        lineas = "".join(json.dumps(dict(entry), ensure_ascii=False) + "\n" for entry in conservar)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with self._lock:
+            with tmp.open("w", encoding="utf-8") as f:
+                f.write(lineas)
+                f.flush()
+                if self._fsync:
+                    os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            self._fh.close()
+            self._fh = self.path.open("a", encoding="utf-8")
+
+    def cerrar(self) -> None:
+        with self._lock:
+            self._fh.close()
+
+
+def resolver_publicadas(
+    entradas: Mapping[int, Mapping[str, object]],
+    filas: Iterable[tuple[int, str]],
+) -> Dict[int, Mapping[str, object]]:
+    """Empareja entradas del diario con filas (idx, huella) del Excel.
+
+    Una entrada se aplica a su fila si el hash coincide. Si la hoja se editó y las
+    filas se desplazaron, se aplica a la primera fila con el mismo contenido.
+    """
+    pendientes_por_huella: Dict[str, list[Mapping[str, object]]] = {}
+    result: Dict[int, Mapping[str, object]] = {}
+    huellas: Dict[int, str] = dict(filas)
+    for idx, entry in entradas.items():
+        if huellas.get(idx) == entry.get("huella"):
+            result[idx] = entry
+        else:
+            pendientes_por_huella.setdefault(str(entry.get("huella")), []).append(entry)
+    if pendientes_por_huella:
+        for idx, h in huellas.items():
+            if idx in result:
+                continue
+            candidates = pendientes_por_huella.get(h)
+            if candidates:
+                result[idx] = candidates.pop(0)
+    return result
+
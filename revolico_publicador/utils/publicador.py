@@ -1,44 +1,40 @@
 from __future__ import annotations
 
-import random
 import time
-from dataclasses import dataclass
-from pathlib import Path
 from typing import Dict, Optional
 
-from playwright.sync_api import Browser, BrowserContext, Page, Playwright, sync_playwright
-
-MOBILE_USER_AGENTS = [
-    "Mozilla/5.0 (Linux; Android 10; SM-G973F) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Mobile Safari/537.36",
-    "Mozilla/5.0 (iPhone; CPU iPhone OS 16_2 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.0 Mobile/15E148 Safari/604.1",
-    "Mozilla/5.0 (Linux; Android 11; Pixel 5) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Mobile Safari/537.36",
-    "Mozilla/5.0 (Linux; Android 9; Mi A2 Lite) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0.0.0 Mobile Safari/537.36",
-    "Mozilla/5.0 (iPad; CPU OS 15_5 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.5 Mobile/15E148 Safari/604.1",
-]
-
-
-class CaptchaDetected(Exception):
-    pass
-
-
-@dataclass
-class PublicadorConfig:
-    headless: bool = False
-    delay_min: int = 3
-    delay_max: int = 7
-    base_url: str = "https://www.revolico.com/publicar"
-
-
-class Publicador:
+from playwright.sync_api import Browser, BrowserContext, Page, Playwright, Route, sync_playwright
+from playwright.sync_api import Error as PlaywrightError
+
+from utils.anuncio import Anuncio
+from utils.formulario import (
+    CAMPOS_SELECTORES,
+    CAPTCHA_SELECTORES,
+    FOTOS_SELECTOR,
+    JS_MARCAR_PREVIOS,
+    JS_RELLENAR_CAMPOS,
+    JS_RESET_FORMULARIO,
+    JS_RESOLVER_CAMPOS,
+    JS_RESULTADO_ENVIO,
+    OPCIONES_RESET,
+    SUBMIT_SELECTOR,
+    CaptchaDetected,
+    PublicadorBase,
+    es_error_navegacion,
+    opciones_contexto,
+    opciones_resultado,
+    plan_relleno,
+)
+from utils.metricas import METRICAS
+from utils.perfilado import PERFIL
+from utils.reintentos import EnvioIncierto
+
+
+class Publicador(PublicadorBase):
     """Encapsula la automatización con Playwright para publicar un anuncio."""
 
-    def __init__(self, headless: bool = False, delay_min: int = 3, delay_max: int = 7, base_url: Optional[str] = None) -> None:
-        self.config = PublicadorConfig(
-            headless=headless,
-            delay_min=delay_min,
-            delay_max=delay_max,
-            base_url=base_url or PublicadorConfig.base_url,
-        )
+    def __init__(self, *args: object, **kwargs: object) -> None:
+        super().__init__(*args, **kwargs)  # type: ignore[arg-type]
         self._playwright: Optional[Playwright] = None
         self._browser: Optional[Browser] = None
         self._context: Optional[BrowserContext] = None
@@ -49,106 +45,150 @@ class Publicador:
         if self._page is not None:
             return
         self._playwright = sync_playwright().start()
-        ua = random.choice(MOBILE_USER_AGENTS)
-        self._browser = self._playwright.chromium.launch(headless=self.config.headless)
-        self._context = self._browser.new_context(user_agent=ua, viewport={"width": 390, "height": 844})
-        self._page = self._context.new_page()
-
-    def _rand_sleep(self) -> None:
-        delay = random.uniform(self.config.delay_min, self.config.delay_max)
-        time.sleep(delay)
+        opciones = opciones_contexto(self.config)
+        if self.config.perfil_dir:
+            self._context = self._playwright.chromium.launch_persistent_context(**opciones)
+        else:
+            self._browser = self._playwright.chromium.launch(headless=self.config.headless)
+            self._context = self._browser.new_context(**opciones)
+        if self.filtro is not None:
+            self._context.route("**/*", self._route)
+        pages = self._context.pages
+        self._page = pages[0] if pages else self._context.new_page()
+
+    def _route(self, route: Route) -> None:
+        assert self.filtro is not None
+        request = route.request
+        accion = self.filtro.decidir(request.url, request.resource_type)
+        if accion is None:
+            route.continue_()
+        elif accion == "stub":
+            route.fulfill(status=200, body="", content_type=self.filtro.content_type(request.resource_type))
+        else:
+            route.abort("blockedbyclient")
+
+    def _pausa_campo(self) -> None:
+        segundos = self._segundos_pausa_campo()
+        if segundos > 0:
+            with PERFIL.pausa():
+                time.sleep(segundos)
 
     def _check_captcha(self, page: Page) -> None:
-        # Heuristic: check for recaptcha or captcha iframe/div
-        selectors = [
-            "iframe[src*='recaptcha']",
-            "div.g-recaptcha",
-            "div[id*='recaptcha']",
-            "div[class*='captcha']",
-        ]
-        for sel in selectors:
+        try:
+            el = page.query_selector(", ".join(CAPTCHA_SELECTORES))
+        except Exception:
+            return
+        if el is not None:
+            raise CaptchaDetected("CAPTCHA DETECTADO – PAUSADO")
+
+    def _resolver_campos(self, page: Page) -> Dict[str, str]:
+        layout = self._layout_vigente(page.url)
+        if layout is None:
+            layout = self._guardar_layout(page.url, page.evaluate(JS_RESOLVER_CAMPOS, CAMPOS_SELECTORES))
+        return layout
+
+    def _rellenar(self, page: Page, anuncio: Anuncio) -> None:
+        selects, lotes = plan_relleno(self.config, self._resolver_campos(page), anuncio)
+        for selector, label in selects:
+            # select_option espera a que la opción exista (p.ej. subcategorías dependientes)
+            page.select_option(selector, label=label)
+            self._pausa_campo()
+        for lote in lotes:
+            faltan = page.evaluate(JS_RELLENAR_CAMPOS, lote)
+            if faltan:
+                # El DOM cambió respecto al layout cacheado: se resolverá de nuevo
+                self._layout = None
+            self._pausa_campo()
+
+    def _esperar_resultado(self, page: Page, previo: Dict[str, object]) -> Dict[str, Optional[str]]:
+        """Espera el primer resultado del envío (éxito, error, captcha o URL del anuncio).
+
+        Reacciona en cuanto cualquiera aparece, sin esperar a que la red quede
+        inactiva. Si la página navega, la comprobación se reanuda en el nuevo documento.
+        ``previo`` es el estado anotado antes del clic (``JS_MARCAR_PREVIOS``).
+        """
+        opciones = opciones_resultado(self.config, previo)
+        deadline = time.monotonic() + self.config.timeout_envio_ms / 1000
+        while True:
+            restante_ms = max(1.0, (deadline - time.monotonic()) * 1000)
             try:
-                el = page.query_selector(sel)
-                if el is not None:
-                    raise CaptchaDetected("CAPTCHA DETECTADO – PAUSADO")
-            except Exception:
-                continue
-
-    def publicar(self, anuncio: Dict[str, object]) -> bool:
+                handle = page.wait_for_function(JS_RESULTADO_ENVIO, arg=opciones, timeout=restante_ms, polling="raf")
+                return handle.json_value()
+            except PlaywrightError as e:
+                # Navegación en curso: el contexto JS se destruyó, se reintenta en la nueva página
+                if not es_error_navegacion(e):
+                    raise
+                if time.monotonic() >= deadline:
+                    raise
+
+    def _resetear_formulario(self, page: Page) -> bool:
+        """Limpia en sitio el formulario tras un envío correcto, si la página lo permite."""
+        try:
+            ok = page.evaluate(JS_RESET_FORMULARIO, OPCIONES_RESET)
+            if not ok:
+                return False
+            # Si aún queda rastro del resultado anterior, el próximo envío no sería fiable
+            return page.evaluate(JS_RESULTADO_ENVIO, opciones_resultado(self.config)) is None
+        except PlaywrightError:
+            return False
+
+    def publicar(self, anuncio: Anuncio) -> bool:
         if self._page is None:
             raise RuntimeError("Browser no inicializado")
         page = self._page
+        self.ultimo_link = None
 
-        page.goto(self.config.base_url, wait_until="domcontentloaded")
+        if not self._formulario_listo:
+            with METRICAS.etapa("goto"):
+                page.goto(self.config.base_url, wait_until="domcontentloaded")
+        self._formulario_listo = False
         self._check_captcha(page)
 
-        # Rellenar campos. Los selectores son placeholders robustos; ajústalos según el DOM real.
-        # Preferimos data-testid si existe; si no, usamos labels o name/id.
-        mappings = {
-            "Categoria": "select[name='category'], [data-testid='category-select']",
-            "Subcategoria": "select[name='subcategory'], [data-testid='subcategory-select']",
-            "Titulo": "input[name='title'], [data-testid='title-input']",
-            "Descripcion": "textarea[name='description'], [data-testid='description-textarea']",
-            "Precio": "input[name='price'], [data-testid='price-input']",
-            "Moneda": "select[name='currency'], [data-testid='currency-select']",
-            "Provincia": "select[name='province'], [data-testid='province-select']",
-            "Municipio": "select[name='municipality'], [data-testid='municipality-select']",
-            "Telefono": "input[name='phone'], [data-testid='phone-input']",
-            "Email": "input[name='email'], [data-testid='email-input']",
-            # Imagen: input type=file
-            "Fotos": "input[type='file'][name='image'], input[type='file'][data-testid='image-input']",
-        }
-
-        # Imagen primero para detectar preview OK
-        foto_path = anuncio.get("Fotos")
-        if isinstance(foto_path, (str, Path)) and str(foto_path).strip():
-            file_input = page.query_selector(mappings["Fotos"])  # type: ignore[arg-type]
+        # Imágenes primero para detectar preview OK
+        fotos = anuncio.fotos_a_subir()
+        if fotos:
+            file_input = page.query_selector(FOTOS_SELECTOR)
             if file_input is None:
                 raise RuntimeError("No se encontró input de archivo para la imagen")
-            file_input.set_input_files(str(foto_path))
-            self._rand_sleep()
+            # Todas las fotos en una sola llamada, en el orden de la hoja
+            with METRICAS.etapa("foto"):
+                file_input.set_input_files(fotos)
+            if self.config.pausa_imagen > 0:
+                with PERFIL.pausa():
+                    time.sleep(self.config.pausa_imagen)
 
         # Campos de texto/selects
-        def fill_selector(selector: str, value: object) -> None:
-            if value is None:
-                return
-            el = page.query_selector(selector)
-            if el is None:
-                return
-            tag = el.evaluate("el => el.tagName.toLowerCase()")
-            if tag == "select":
-                el.select_option(label=str(value))
-            else:
-                el.fill(str(value))
-
-        for key, selector in mappings.items():
-            if key == "Fotos":
-                continue
-            if key in anuncio:
-                fill_selector(selector, anuncio[key])
-                self._rand_sleep()
-
-        # Enviar formulario
-        submit_selector = "button[type='submit'], [data-testid='submit-button']"
-        submit = page.query_selector(submit_selector)
+        with METRICAS.etapa("relleno"):
+            self._rellenar(page, anuncio)
+
+        # Enviar formulario y esperar resultado: lo primero que ocurra entre éxito,
+        # error, captcha o navegación al anuncio
+        submit = page.query_selector(SUBMIT_SELECTOR)
         if submit is None:
             raise RuntimeError("No se encontró botón de envío")
-        submit.click()
-
-        # Esperar resultado
-        page.wait_for_load_state("networkidle", timeout=15000)
-        self._check_captcha(page)
-
-        # Detectar éxito/error
-        success = page.query_selector("text=/Publicado|Éxito|Success|Gracias/i, [data-testid='publish-success']")
-        error = page.query_selector(".error, [data-testid='publish-error'], text=/Error|falló/i")
-        if success is not None and error is None:
-            return True
-        return False
+        with METRICAS.etapa("envio"):
+            previo = page.evaluate(JS_MARCAR_PREVIOS, opciones_resultado(self.config))
+            try:
+                submit.click()
+                resultado = self._esperar_resultado(page, previo)
+            except PlaywrightError as e:
+                # El formulario pudo llegar a enviarse: no se sabe si el anuncio quedó publicado
+                raise EnvioIncierto(f"Resultado del envío desconocido: {e}") from e
+        if not self._registrar_resultado(resultado):
+            return False
+        if self.config.reset_en_sitio:
+            with METRICAS.etapa("reset"):
+                self._formulario_listo = self._resetear_formulario(page)
+        return True
 
     def cerrar(self) -> None:
         try:
             if self._context is not None:
+                if self.config.storage_state and not self.config.perfil_dir:
+                    try:
+                        self._context.storage_state(path=self.config.storage_state)
+                    except PlaywrightError:
+                        pass
                 self._context.close()
             if self._browser is not None:
                 self._browser.close()
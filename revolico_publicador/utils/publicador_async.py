@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Dict, Optional
+
+from playwright.async_api import Browser, BrowserContext, Page, Playwright, Route, async_playwright
+from playwright.async_api import Error as PlaywrightError
+
+from utils.anuncio import Anuncio
+from utils.formulario import (
+    CAMPOS_SELECTORES,
+    CAPTCHA_SELECTORES,
+    FOTOS_SELECTOR,
+    JS_MARCAR_PREVIOS,
+    JS_RELLENAR_CAMPOS,
+    JS_RESET_FORMULARIO,
+    JS_RESOLVER_CAMPOS,
+    JS_RESULTADO_ENVIO,
+    OPCIONES_RESET,
+    SUBMIT_SELECTOR,
+    CaptchaDetected,
+    PublicadorBase,
+    es_error_navegacion,
+    opciones_contexto,
+    opciones_resultado,
+    plan_relleno,
+)
+from utils.metricas import METRICAS
+from utils.perfilado import PERFIL
+from utils.reintentos import EnvioIncierto
+
+
+class PublicadorAsync(PublicadorBase):
+    """Variante asíncrona de ``Publicador`` sobre ``playwright.async_api``.
+
+    Misma configuración y mismas decisiones (``PublicadorBase``); solo cambian
+    las llamadas al navegador, que ceden el bucle de eventos de modo que
+    descargas, escrituras de progreso y logging avanzan mientras tanto. Se crea
+    con ``await PublicadorAsync.crear(...)``.
+    """
+
+    def __init__(self, *args: object, **kwargs: object) -> None:
+        super().__init__(*args, **kwargs)  # type: ignore[arg-type]
+        self._playwright: Optional[Playwright] = None
+        self._browser: Optional[Browser] = None
+        self._context: Optional[BrowserContext] = None
+        self._page: Optional[Page] = None
+
+    @classmethod
+    async def crear(cls, *args: object, **kwargs: object) -> "PublicadorAsync":
+        publicador = cls(*args, **kwargs)  # type: ignore[arg-type]
+        await publicador._ensure_browser()
+        return publicador
+
+    async def _ensure_browser(self) -> None:
+        if self._page is not None:
+            return
+        self._playwright = await async_playwright().start()
+        opciones = opciones_contexto(self.config)
+        if self.config.perfil_dir:
+            self._context = await self._playwright.chromium.launch_persistent_context(**opciones)
+        else:
+            self._browser = await self._playwright.chromium.launch(headless=self.config.headless)
+            self._context = await self._browser.new_context(**opciones)
+        if self.filtro is not None:
+            await self._context.route("**/*", self._route)
+        pages = self._context.pages
+        self._page = pages[0] if pages else await self._context.new_page()
+
+    async def _route(self, route: Route) -> None:
+        assert self.filtro is not None
+        request = route.request
+        accion = self.filtro.decidir(request.url, request.resource_type)
+        if accion is None:
+            await route.continue_()
+        elif accion == "stub":
+            await route.fulfill(status=200, body="", content_type=self.filtro.content_type(request.resource_type))
+        else:
+            await route.abort("blockedbyclient")
+
+    async def _pausa_campo(self) -> None:
+        segundos = self._segundos_pausa_campo()
+        if segundos > 0:
+            with PERFIL.pausa():
+                await asyncio.sleep(segundos)
+
+    async def _check_captcha(self, page: Page) -> None:
+        try:
+            el = await page.query_selector(", ".join(CAPTCHA_SELECTORES))
+        except Exception:
+            return
+        if el is not None:
+            raise CaptchaDetected("CAPTCHA DETECTADO – PAUSADO")
+
+    async def _resolver_campos(self, page: Page) -> Dict[str, str]:
+        layout = self._layout_vigente(page.url)
+        if layout is None:
+            layout = self._guardar_layout(page.url, await page.evaluate(JS_RESOLVER_CAMPOS, CAMPOS_SELECTORES))
+        return layout
+
+    async def _rellenar(self, page: Page, anuncio: Anuncio) -> None:
+        selects, lotes = plan_relleno(self.config, await self._resolver_campos(page), anuncio)
+        for selector, label in selects:
+            await page.select_option(selector, label=label)
+            await self._pausa_campo()
+        for lote in lotes:
+            faltan = await page.evaluate(JS_RELLENAR_CAMPOS, lote)
+            if faltan:
+                self._layout = None
+            await self._pausa_campo()
+
+    async def _esperar_resultado(self, page: Page, previo: Dict[str, object]) -> Dict[str, Optional[str]]:
+        opciones = opciones_resultado(self.config, previo)
+        deadline = time.monotonic() + self.config.timeout_envio_ms / 1000
+        while True:
+            restante_ms = max(1.0, (deadline - time.monotonic()) * 1000)
+            try:
+                handle = await page.wait_for_function(
+                    JS_RESULTADO_ENVIO, arg=opciones, timeout=restante_ms, polling="raf"
+                )
+                return await handle.json_value()
+            except PlaywrightError as e:
+                if not es_error_navegacion(e) or time.monotonic() >= deadline:
+                    raise
+
+    async def _resetear_formulario(self, page: Page) -> bool:
+        try:
+            if not await page.evaluate(JS_RESET_FORMULARIO, OPCIONES_RESET):
+                return False
+            return await page.evaluate(JS_RESULTADO_ENVIO, opciones_resultado(self.config)) is None
+        except PlaywrightError:
+            return False
+
+    async def publicar(self, anuncio: Anuncio) -> bool:
+        if self._page is None:
+            raise RuntimeError("Browser no inicializado")
+        page = self._page
+        self.ultimo_link = None
+
+        if not self._formulario_listo:
+            with METRICAS.etapa("goto"):
+                await page.goto(self.config.base_url, wait_until="domcontentloaded")
+        self._formulario_listo = False
+        await self._check_captcha(page)
+
+        fotos = anuncio.fotos_a_subir()
+        if fotos:
+            file_input = await page.query_selector(FOTOS_SELECTOR)
+            if file_input is None:
+                raise RuntimeError("No se encontró input de archivo para la imagen")
+            # Todas las fotos en una sola llamada, en el orden de la hoja
+            with METRICAS.etapa("foto"):
+                await file_input.set_input_files(fotos)
+            if self.config.pausa_imagen > 0:
+                with PERFIL.pausa():
+                    await asyncio.sleep(self.config.pausa_imagen)
+
+        with METRICAS.etapa("relleno"):
+            await self._rellenar(page, anuncio)
+
+        submit = await page.query_selector(SUBMIT_SELECTOR)
+        if submit is None:
+            raise RuntimeError("No se encontró botón de envío")
+        with METRICAS.etapa("envio"):
+            previo = await page.evaluate(JS_MARCAR_PREVIOS, opciones_resultado(self.config))
+            try:
+                await submit.click()
+                resultado = await self._esperar_resultado(page, previo)
+            except PlaywrightError as e:
+                raise EnvioIncierto(f"Resultado del envío desconocido: {e}") from e
+        if not self._registrar_resultado(resultado):
+            return False
+        if self.config.reset_en_sitio:
+            with METRICAS.etapa("reset"):
+                self._formulario_listo = await self._resetear_formulario(page)
+        return True
+
+    async def cerrar(self) -> None:
+        try:
+            if self._context is not None:
+                if self.config.storage_state and not self.config.perfil_dir:
+                    try:
+                        await self._context.storage_state(path=self.config.storage_state)
+                    except PlaywrightError:
+                        pass
+                await self._context.close()
+            if self._browser is not None:
+                await self._browser.close()
+        finally:
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+                self._browser = None
+                self._context = None
+                self._page = None
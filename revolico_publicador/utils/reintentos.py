@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import time
+from typing import Callable, Dict, Generic, Hashable, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+TRANSITORIO = "transitorio"
+PERMANENTE = "permanente"
+INCIERTO = "incierto"
+
+
+class ErrorPermanente(Exception):
+    """Fallo que no se arregla reintentando (p. ej. el formulario rechazó los datos)."""
+
+
+class EnvioIncierto(Exception):
+    """Fallo después de enviar el formulario: el anuncio pudo quedar publicado.
+
+    No se reintenta; reenviarlo podría duplicar el anuncio.
+    """
+
+
+def clasificar(error: BaseException) -> str:
+    """``PERMANENTE`` para ``ErrorPermanente``, ``INCIERTO`` para ``EnvioIncierto``;
+    el resto (timeouts, red, selector no encontrado antes de enviar, navegador)
+    es ``TRANSITORIO``."""
+    if isinstance(error, ErrorPermanente):
+        return PERMANENTE
+    if isinstance(error, EnvioIncierto):
+        return INCIERTO
+    return TRANSITORIO
+
+
+class ColaReintentos(Generic[T]):
+    """Reintentos diferidos de filas fallidas dentro de la misma ejecución.
+
+    Cada fila con un fallo transitorio vuelve a la cola con espera exponencial
+    (``base``, ``2*base``... hasta ``maximo`` segundos) y como mucho
+    ``max_intentos`` intentos en total. ``listos`` devuelve solo las que ya
+    vencieron, de modo que se intercalan con las filas nuevas sin bloquear el bucle.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_intentos: int = 3,
+        base: float = 30.0,
+        maximo: float = 300.0,
+        reloj: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if max_intentos <= 0 or base < 0 or maximo < base:
+            raise ValueError("max_intentos debe ser > 0 y 0 <= base <= maximo")
+        self.max_intentos = max_intentos
+        self.base = base
+        self.maximo = maximo
+        self._reloj = reloj
+        self._heap: List[Tuple[float, int, Hashable, T]] = []
+        self._orden = itertools.count()
+        self._intentos: Dict[Hashable, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def intentos(self, clave: Hashable) -> int:
+        """Intentos fallidos registrados para ``clave``."""
+        return self._intentos.get(clave, 0)
+
+    def programar(self, clave: Hashable, item: T) -> Optional[float]:
+        """Registra un fallo de ``clave`` y la reprograma.
+
+        Returns:
+            Segundos hasta el próximo intento, o None si ya agotó ``max_intentos``.
+        """
+        n = self._intentos.get(clave, 0) + 1
+        self._intentos[clave] = n
+        if n >= self.max_intentos:
+            return None
+        espera = min(self.maximo, self.base * 2 ** (n - 1))
+        heapq.heappush(self._heap, (self._reloj() + espera, next(self._orden), clave, item))
+        return espera
+
+    def listos(self) -> List[T]:
+        """Saca de la cola los reintentos ya vencidos, del más antiguo al más reciente."""
+        ahora = self._reloj()
+        salida: List[T] = []
+        while self._heap and self._heap[0][0] <= ahora:
+            salida.append(heapq.heappop(self._heap)[3])
+        return salida
+
+    def proximo(self) -> Optional[float]:
+        """Segundos hasta que venza el siguiente reintento (None si la cola está vacía)."""
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - self._reloj())
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.localidades import tabla_municipios, tabla_provincias
+from utils.progreso import CONTENT_COLUMNS
+
+CAMPOS_OBLIGATORIOS = ["Categoria", "Subcategoria", "Titulo", "Descripcion", "Precio", "Moneda", "Provincia", "Municipio"]
+LONGITUD_MAXIMA: Dict[str, int] = {"Titulo": 100, "Descripcion": 5000}
+
+# Valor normalizado (mayúsculas, sin tildes ni espacios) -> moneda del formulario
+MONEDAS: Dict[str, str] = {
+    "CUP": "CUP",
+    "MN": "CUP",
+    "PESO": "CUP",
+    "PESOS": "CUP",
+    "USD": "USD",
+    "US$": "USD",
+    "DOLAR": "USD",
+    "DOLARES": "USD",
+    "MLC": "MLC",
+    "EUR": "EUR",
+    "EURO": "EUR",
+    "EUROS": "EUR",
+}
+
+_EMAIL_RE = r"^[^@\s]+@[^@\s]+\.[A-Za-z]{2,}$"
+# Números cubanos: 8 dígitos tanto móviles (5XXXXXXX) como fijos con código de zona
+# (7XXXXXXX en La Habana), con o sin prefijo 53
+_TELEFONO_RE = r"^\d{8}$"
+# La coma solo como separador de miles: 1,500 o 1,250,000.50
+_PRECIO_MILES_RE = r"^\d{1,3}(?:,\d{3})+(?:\.\d+)?$"
+
+COLUMNAS_RECHAZO = ["fila", "Titulo", "motivos"]
+
+
+@dataclass
+class ResultadoValidacion:
+    """Salida de ``validar``.
+
+    Attributes:
+        anuncios: Filas válidas con las columnas de contenido ya normalizadas
+            (vacíos como None), con el mismo índice que el DataFrame de entrada.
+        rechazos: Una fila por anuncio rechazado (``fila`` del Excel, título y motivos).
+    """
+
+    anuncios: pd.DataFrame
+    rechazos: pd.DataFrame
+
+
+def _texto(serie: pd.Series) -> pd.Series:
+    # Igual que progreso._texto_celda pero vectorizado: NaN -> "", 123.0 -> "123"
+    s = serie.astype("string").fillna("").str.strip()
+    return s.str.replace(r"^(-?\d+)\.0$", r"\1", regex=True)
+
+
+def _clave(serie: pd.Series) -> pd.Series:
+    s = serie.str.normalize("NFKD").str.encode("ascii", "ignore").str.decode("ascii")
+    return s.str.casefold().str.replace(r"\s+", " ", regex=True).str.strip()
+
+
+def _precio(serie: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    # El punto es el decimal. Una coma que no separa grupos de 3 dígitos ("12,5") se
+    # rechaza en lugar de quitarla, que daría 125
+    limpio = serie.str.replace(r"[\s$]", "", regex=True)
+    coma_invalida = limpio.str.contains(",", regex=False) & ~limpio.str.match(_PRECIO_MILES_RE)
+    valor = pd.to_numeric(limpio.str.replace(",", "", regex=False), errors="coerce")
+    invalido = valor.isna() | (valor < 0) | coma_invalida
+    v = valor.fillna(0)
+    entero = (v % 1 == 0) & (v.abs() < 2**53)
+    texto = np.where(entero, v.round().astype("int64").astype(str), v.round(2).astype(str))
+    return pd.Series(texto, index=serie.index).where(~invalido, serie), invalido
+
+
+def validar(df: pd.DataFrame) -> ResultadoValidacion:
+    """Valida y normaliza las columnas de contenido de todas las filas a la vez.
+
+    Comprueba campos obligatorios, precio numérico, moneda conocida, formato de
+    teléfono y email (al menos un contacto), longitudes máximas y que el par
+    Provincia/Municipio exista. Los valores válidos se devuelven en su forma
+    canónica (p. ej. ``"habana vieja"`` -> ``"La Habana Vieja"``, ``"1,500"`` -> ``"1500"``).
+
+    Args:
+        df: Filas a validar (por ejemplo, un lote de ``iterar_pendientes``).
+
+    Returns:
+        ResultadoValidacion con las filas válidas normalizadas y los rechazos.
+    """
+    norm = pd.DataFrame({col: _texto(df[col]) for col in CONTENT_COLUMNS}, index=df.index)
+    errores: List[Tuple[pd.Series, str]] = []
+
+    for col in CAMPOS_OBLIGATORIOS:
+        errores.append((norm[col] == "", f"{col} vacío"))
+
+    precio, precio_invalido = _precio(norm["Precio"])
+    norm["Precio"] = precio
+    errores.append((precio_invalido & (norm["Precio"] != ""), "Precio no numérico"))
+
+    moneda = _clave(norm["Moneda"]).str.upper().str.replace(" ", "", regex=False).map(MONEDAS)
+    errores.append((moneda.isna() & (norm["Moneda"] != ""), "Moneda no reconocida"))
+    norm["Moneda"] = moneda.fillna(norm["Moneda"])
+
+    telefono = norm["Telefono"].str.replace(r"\D", "", regex=True)
+    telefono = telefono.where(~((telefono.str.len() == 10) & telefono.str.startswith("53")), telefono.str[2:])
+    errores.append(((norm["Telefono"] != "") & ~telefono.str.match(_TELEFONO_RE), "Telefono inválido"))
+    norm["Telefono"] = telefono.where(norm["Telefono"] != "", "")
+
+    errores.append(((norm["Email"] != "") & ~norm["Email"].str.match(_EMAIL_RE), "Email inválido"))
+    errores.append(((norm["Telefono"] == "") & (norm["Email"] == ""), "Sin Telefono ni Email"))
+
+    for col, maximo in LONGITUD_MAXIMA.items():
+        errores.append((norm[col].str.len() > maximo, f"{col} supera {maximo} caracteres"))
+
+    prov_key = _clave(norm["Provincia"])
+    provincia = prov_key.map(tabla_provincias())
+    errores.append((provincia.isna() & (norm["Provincia"] != ""), "Provincia desconocida"))
+    par = (_clave(provincia.fillna("")) + "|" + _clave(norm["Municipio"])).map(tabla_municipios())
+    errores.append((par.isna() & provincia.notna() & (norm["Municipio"] != ""), "Municipio no pertenece a la Provincia"))
+    valido_par = par.notna()
+    norm.loc[valido_par, "Provincia"] = par[valido_par].str[0]
+    norm.loc[valido_par, "Municipio"] = par[valido_par].str[1]
+
+    motivos = pd.Series("", index=df.index, dtype="string")
+    for mascara, texto in errores:
+        mascara = mascara.fillna(False).astype(bool)
+        motivos = motivos.where(~mascara, motivos + np.where(motivos == "", "", "; ") + texto)
+
+    rechazada = motivos != ""
+    rechazos = pd.DataFrame(
+        {
+            # Fila en el Excel: cabecera en la fila 1 y el índice 0 es la primera fila de datos
+            "fila": (df.index[rechazada.to_numpy()] + 2) if len(df) else [],
+            "Titulo": norm.loc[rechazada, "Titulo"].to_numpy(),
+            "motivos": motivos[rechazada].to_numpy(),
+        },
+        columns=COLUMNAS_RECHAZO,
+    )
+    # Campos opcionales vacíos -> None: el publicador no los toca
+    anuncios = norm.loc[~rechazada].astype(object)
+    return ResultadoValidacion(anuncios=anuncios.where(anuncios != "", None), rechazos=rechazos)
+
+
+def pendientes(df: pd.DataFrame) -> pd.DataFrame:
+    """Filas cuyo estado no es ``Publicado = "S"``."""
+    return df[df["Publicado"].astype("string").fillna("").str.strip().str.upper() != "S"]
+
+
+def escribir_rechazos(rechazos: pd.DataFrame, path: str | Path) -> None:
+    """Añade los rechazos al informe CSV (crea el archivo con cabecera si no existe)."""
+    if rechazos.empty:
+        return
+    out = Path(path)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    rechazos.to_csv(out, mode="a", header=not out.exists(), index=False, encoding="utf-8")